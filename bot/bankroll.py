@@ -1,17 +1,70 @@
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Optional
-from config import DB_PATH
+from config import DB_PATH, DB_BUSY_TIMEOUT_SEC, STARTING_BANKROLL
+from metrics import DB_QUERY_SECONDS
+import tracing
 
 
 class BankrollManager:
+    """Bankroll + answer history store.
+
+    Safe to share between several bot processes: the database runs in WAL
+    mode with a busy timeout, and every update is a single SQL statement
+    (``bankroll = bankroll + ?``) inside a ``BEGIN IMMEDIATE`` transaction,
+    so concurrent writers serialize instead of losing updates.
+
+    ``users.last_answered_seq`` is the replay guard for signed question
+    tokens: an answer is only recorded if its seq is newer, checked in
+    the same UPDATE that scores it. ``answer_history.answer_key`` makes
+    recording idempotent: an answer whose key is already stored (the same
+    question tapped twice, a redelivered update, a group round closed
+    twice) is not scored again.
+    """
+
     def __init__(self, db_path=None):
         self.db_path = db_path or DB_PATH
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        # isolation_level=None: no implicit transactions, we issue BEGIN ourselves
+        self.conn = sqlite3.connect(
+            str(self.db_path), timeout=DB_BUSY_TIMEOUT_SEC,
+            isolation_level=None, check_same_thread=False,
+        )
         self.conn.row_factory = sqlite3.Row
+        self.conn.execute(f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_SEC * 1000)}")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.RLock()
         self._init_db()
 
+    def stats(self) -> dict:
+        """Connection state and WAL size (no queries)."""
+        try:
+            in_txn, is_open = self.conn.in_transaction, True
+        except sqlite3.ProgrammingError:       # closed
+            in_txn, is_open = False, False
+        wal = self.db_path.with_name(self.db_path.name + "-wal")
+        return {"path": str(self.db_path), "open": is_open, "in_transaction": in_txn,
+                "wal_bytes": wal.stat().st_size if wal.exists() else 0}
+
+    def ping(self) -> bool:
+        with self._lock:
+            return self.conn.execute("SELECT 1").fetchone()[0] == 1
+
+    @contextmanager
+    def _write_txn(self):
+        """Take the database write lock up front so read-then-write can't race."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
     def _init_db(self):
         self.conn.executescript("""
             CREATE TABLE IF NOT EXISTS users (
@@ -40,78 +93,160 @@ class BankrollManager:
                 was_correct INTEGER,
                 timestamp TEXT
             );
+
+            -- Covers per-user history lookups and ledger replay scans
+            CREATE INDEX IF NOT EXISTS idx_answer_history_ledger
+                ON answer_history (user_id, id, chosen_ev, was_correct);
+            DROP INDEX IF EXISTS idx_answer_history_user;
         """)
-        self.conn.commit()
+        # Workers starting together (router, prefork) must not both add a column
+        with self._write_txn() as conn:
+            columns = {r["name"] for r in conn.execute("PRAGMA table_info(users)")}
+            if "last_answered_seq" not in columns:
+                conn.execute(
+                    "ALTER TABLE users ADD COLUMN last_answered_seq INTEGER NOT NULL DEFAULT 0"
+                )
+            columns = {r["name"] for r in conn.execute("PRAGMA table_info(answer_history)")}
+            if "answer_key" not in columns:
+                conn.execute("ALTER TABLE answer_history ADD COLUMN answer_key TEXT")
+            conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_answer_history_key "
+                "ON answer_history (answer_key) WHERE answer_key IS NOT NULL"
+            )
 
+    @DB_QUERY_SECONDS.labels("get_or_create_user").time()
+    @tracing.traced("db.get_or_create_user")
     def get_or_create_user(self, user_id: int, username: str) -> dict:
         now = datetime.now().isoformat()
-        row = self.conn.execute(
-            "SELECT * FROM users WHERE user_id = ?", (user_id,)
-        ).fetchone()
-
-        if row:
-            self.conn.execute(
-                "UPDATE users SET username = ?, last_active = ? WHERE user_id = ?",
-                (username, now, user_id)
-            )
-            self.conn.commit()
-            return dict(row)
-
-        self.conn.execute(
-            "INSERT INTO users (user_id, username, bankroll, total_questions, "
-            "correct_count, streak, best_streak, best_bankroll, created_at, last_active) "
-            "VALUES (?, ?, 100.0, 0, 0, 0, 0, 100.0, ?, ?)",
-            (user_id, username, now, now)
-        )
-        self.conn.commit()
-        return dict(self.conn.execute(
-            "SELECT * FROM users WHERE user_id = ?", (user_id,)
-        ).fetchone())
+        with self._lock:
+            return dict(self.conn.execute(
+                "INSERT INTO users (user_id, username, bankroll, total_questions, "
+                "correct_count, streak, best_streak, best_bankroll, created_at, last_active) "
+                "VALUES (?, ?, ?, 0, 0, 0, 0, ?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET "
+                "username = excluded.username, last_active = excluded.last_active "
+                "RETURNING *",
+                (user_id, username, STARTING_BANKROLL, STARTING_BANKROLL, now, now)
+            ).fetchone())
 
+    @DB_QUERY_SECONDS.labels("record_answer").time()
+    @tracing.traced("db.record_answer")
     def record_answer(
         self, user_id: int, username: str,
         scenario_id: str, hand: str,
         chosen_action: str, chosen_ev_normalized: float,
         best_action: str, ev_vs_best: float,
-        was_correct: bool
-    ) -> dict:
+        was_correct: bool, seq: int = None, answer_key: str = None,
+    ) -> Optional[dict]:
+        """Score one answer. Returns None (and records nothing) if `answer_key`
+        was recorded before, or with `seq`, unless seq is newer than the
+        user's last answered question."""
+        now = datetime.now().isoformat()
+        with self._write_txn() as conn:
+            return self._score(
+                conn, now, user_id, username, scenario_id, hand, chosen_action,
+                chosen_ev_normalized, best_action, ev_vs_best, was_correct, seq, answer_key,
+            )
+
+    @DB_QUERY_SECONDS.labels("record_answers").time()
+    @tracing.traced("db.record_answers")
+    def record_answers(self, answers: list[dict]) -> dict[int, dict]:
+        """Score many answers (record_answer keyword dicts) in one transaction.
+
+        Used when a group round closes: one commit for every answerer
+        instead of one per tap. Returns user_id -> the same result dict
+        record_answer gives (answers rejected by seq or key are left out).
+        """
         now = datetime.now().isoformat()
-        user = self.get_or_create_user(user_id, username)
-
-        new_bankroll = user["bankroll"] + chosen_ev_normalized
-        new_total = user["total_questions"] + 1
-        new_correct = user["correct_count"] + (1 if was_correct else 0)
-        new_streak = (user["streak"] + 1) if was_correct else 0
-        new_best_streak = max(user["best_streak"], new_streak)
-        new_best_bankroll = max(user["best_bankroll"], new_bankroll)
-
-        self.conn.execute(
-            "UPDATE users SET bankroll = ?, total_questions = ?, correct_count = ?, "
-            "streak = ?, best_streak = ?, best_bankroll = ?, last_active = ? "
-            "WHERE user_id = ?",
-            (new_bankroll, new_total, new_correct, new_streak,
-             new_best_streak, new_best_bankroll, now, user_id)
+        results = {}
+        with self._write_txn() as conn:
+            for a in answers:
+                result = self._score(
+                    conn, now, a["user_id"], a["username"], a["scenario_id"], a["hand"],
+                    a["chosen_action"], a["chosen_ev_normalized"], a["best_action"],
+                    a["ev_vs_best"], a["was_correct"], a.get("seq"), a.get("answer_key"),
+                )
+                if result is not None:
+                    results[a["user_id"]] = result
+        return results
+
+    def _score(self, conn, now: str, user_id, username, scenario_id, hand, chosen_action,
+               chosen_ev_normalized, best_action, ev_vs_best, was_correct, seq,
+               answer_key=None) -> Optional[dict]:
+        if answer_key is not None and conn.execute(
+            "SELECT 1 FROM answer_history WHERE answer_key = ?", (answer_key,)
+        ).fetchone():
+            return None  # already recorded
+        correct = 1 if was_correct else 0
+        conn.execute(
+            "INSERT OR IGNORE INTO users (user_id, username, bankroll, total_questions, "
+            "correct_count, streak, best_streak, best_bankroll, created_at, last_active) "
+            "VALUES (?, ?, ?, 0, 0, 0, 0, ?, ?, ?)",
+            (user_id, username, STARTING_BANKROLL, STARTING_BANKROLL, now, now)
         )
+        # All right-hand sides see the pre-update row, so this is one
+        # atomic increment no matter how many processes are writing.
+        row = conn.execute(
+            "UPDATE users SET "
+            "bankroll = bankroll + :ev, "
+            "total_questions = total_questions + 1, "
+            "correct_count = correct_count + :ok, "
+            "streak = CASE WHEN :ok THEN streak + 1 ELSE 0 END, "
+            "best_streak = MAX(best_streak, CASE WHEN :ok THEN streak + 1 ELSE 0 END), "
+            "best_bankroll = MAX(best_bankroll, bankroll + :ev), "
+            "username = :username, last_active = :now, "
+            "last_answered_seq = COALESCE(:seq, last_answered_seq) "
+            "WHERE user_id = :user_id "
+            "AND (:seq IS NULL OR last_answered_seq < :seq) "
+            "RETURNING bankroll, total_questions, correct_count, streak, best_streak",
+            {"ev": chosen_ev_normalized, "ok": correct, "username": username,
+             "now": now, "user_id": user_id, "seq": seq}
+        ).fetchone()
+        if row is None:
+            return None  # replayed or superseded question
 
-        self.conn.execute(
+        conn.execute(
             "INSERT INTO answer_history "
             "(user_id, scenario_id, hand, chosen_action, chosen_ev, "
-            "best_action, ev_vs_best, bankroll_after, was_correct, timestamp) "
-            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            "best_action, ev_vs_best, bankroll_after, was_correct, timestamp, answer_key) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
             (user_id, scenario_id, hand, chosen_action, chosen_ev_normalized,
-             best_action, ev_vs_best, new_bankroll, 1 if was_correct else 0, now)
+             best_action, ev_vs_best, row["bankroll"], correct, now, answer_key)
         )
-        self.conn.commit()
-
         return {
-            "bankroll": new_bankroll,
-            "total_questions": new_total,
-            "correct_count": new_correct,
-            "streak": new_streak,
-            "best_streak": new_best_streak,
+            "bankroll": row["bankroll"],
+            "total_questions": row["total_questions"],
+            "correct_count": row["correct_count"],
+            "streak": row["streak"],
+            "best_streak": row["best_streak"],
             "was_correct": was_correct,
         }
 
+    @DB_QUERY_SECONDS.labels("answer_recorded").time()
+    @tracing.traced("db.answer_recorded")
+    def answer_recorded(self, answer_key: str) -> bool:
+        """Whether an answer with this key has been scored (why record_answer refused it)."""
+        return self.conn.execute(
+            "SELECT 1 FROM answer_history WHERE answer_key = ?", (answer_key,)
+        ).fetchone() is not None
+
+    @DB_QUERY_SECONDS.labels("last_answered_seqs").time()
+    @tracing.traced("db.last_answered_seqs")
+    def last_answered_seqs(self, user_ids: list[int]) -> dict[int, int]:
+        """user_id -> last answered question seq (users without a row are omitted)."""
+        out = {}
+        for i in range(0, len(user_ids), 500):
+            chunk = user_ids[i:i + 500]
+            rows = self.conn.execute(
+                "SELECT user_id, last_answered_seq FROM users "
+                f"WHERE user_id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            out.update((r[0], r[1]) for r in rows)
+        return out
+
+    @DB_QUERY_SECONDS.labels("get_user_stats").time()
+    @tracing.traced("db.get_user_stats")
     def get_user_stats(self, user_id: int) -> Optional[dict]:
         row = self.conn.execute(
             "SELECT * FROM users WHERE user_id = ?", (user_id,)
@@ -123,6 +258,8 @@ class BankrollManager:
                          if d["total_questions"] > 0 else 0)
         return d
 
+    @DB_QUERY_SECONDS.labels("get_leaderboard").time()
+    @tracing.traced("db.get_leaderboard")
     def get_leaderboard(self, limit: int = 10) -> list[dict]:
         rows = self.conn.execute(
             "SELECT user_id, username, bankroll, total_questions, correct_count, "
@@ -138,6 +275,8 @@ class BankrollManager:
             result.append(d)
         return result
 
+    @DB_QUERY_SECONDS.labels("get_rank").time()
+    @tracing.traced("db.get_rank")
     def get_rank(self, user_id: int) -> tuple[int, int]:
         """Return (rank, total_players) for user by bankroll."""
         total = self.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
@@ -149,6 +288,8 @@ class BankrollManager:
         rank = row[0] + 1 if row else 1
         return rank, total
 
+    @DB_QUERY_SECONDS.labels("get_recent_history").time()
+    @tracing.traced("db.get_recent_history")
     def get_recent_history(self, user_id: int, limit: int = 50) -> list[tuple]:
         rows = self.conn.execute(
             "SELECT scenario_id, hand FROM answer_history "
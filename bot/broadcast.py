@@ -0,0 +1,132 @@
+"""Concurrent, rate-limited broadcast fan-out."""
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterable, Optional
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+from ratelimit import ChatPacer, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# A send for one chat: called with no arguments, performs one API call
+SendFn = Callable[[], Awaitable[object]]
+
+
+@dataclass
+class BroadcastReport:
+    targets: int = 0
+    sent: int = 0
+    failed: int = 0
+    retries: int = 0
+    rate_limited: int = 0     # 429 responses seen
+    blocked: list[int] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.sent}/{self.targets} sent, {self.failed} failed, "
+            f"{len(self.blocked)} blocked, {self.retries} retries "
+            f"({self.rate_limited}x 429) in {self.elapsed:.1f}s "
+            f"({self.throughput:.1f} msg/s)"
+        )
+
+
+def _is_blocked(err: Exception) -> bool:
+    if isinstance(err, Forbidden):
+        return True
+    msg = str(err).lower()
+    return isinstance(err, BadRequest) and ("chat not found" in msg or "blocked" in msg)
+
+
+class Broadcaster:
+    """Fan out one send per chat with bounded concurrency.
+
+    Every send takes a token from the shared `limiter` (global Bot API
+    budget) and respects per-chat spacing. RetryAfter pauses the limiter
+    for the requested time and retries; network errors back off
+    exponentially. Pass `limiter=None` when the sends already go through
+    a rate-limited bot (see scheduler.OutboundScheduler). Chats that
+    blocked the bot are collected in the report for the caller to clean
+    up in one batch.
+    """
+
+    def __init__(
+        self,
+        limiter: Optional[TokenBucket] = None,
+        concurrency: int = 16,
+        max_retries: int = 3,
+        chat_interval: float = 1.0,
+        backoff_base: float = 0.5,
+    ):
+        self.limiter = limiter
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.pacer = ChatPacer(chat_interval)
+        self.backoff_base = backoff_base
+
+    async def _deliver(self, chat_id: int, send: SendFn, report: BroadcastReport):
+        for attempt in range(self.max_retries + 1):
+            await self.pacer.wait(chat_id)
+            if self.limiter is not None:
+                await self.limiter.acquire()
+            try:
+                await send()
+                report.sent += 1
+                return
+            except RetryAfter as e:
+                delay = e.retry_after
+                delay = delay.total_seconds() if hasattr(delay, "total_seconds") else float(delay)
+                report.rate_limited += 1
+                if self.limiter is not None:
+                    self.limiter.pause(delay)
+                else:
+                    await asyncio.sleep(delay)
+            except (Forbidden, BadRequest) as e:
+                # Not retryable (BadRequest subclasses NetworkError, so catch it first)
+                if _is_blocked(e):
+                    report.blocked.append(chat_id)
+                else:
+                    report.failed += 1
+                    logger.warning(f"Auto-broadcast failed for chat {chat_id}: {e}")
+                return
+            except (TimedOut, NetworkError) as e:
+                delay = self.backoff_base * (2 ** attempt) * (0.5 + random.random())
+                logger.debug(f"Broadcast to {chat_id} failed ({e}); retry in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            except Exception as e:
+                report.failed += 1
+                logger.warning(f"Auto-broadcast failed for chat {chat_id}: {e}")
+                return
+            report.retries += 1
+        report.failed += 1
+        logger.warning(f"Auto-broadcast to {chat_id} gave up after {self.max_retries} retries")
+
+    async def run(self, jobs: Iterable[tuple[int, SendFn]]) -> BroadcastReport:
+        """Deliver (chat_id, send) jobs; returns when every job is done.
+
+        `jobs` is consumed lazily by the workers, so a generator that
+        builds each message on demand spreads that work over the send
+        window instead of stalling the event loop up front.
+        """
+        report = BroadcastReport()
+        pending = iter(jobs)
+
+        async def worker():
+            # Shared iterator: each job is taken by exactly one worker
+            for chat_id, send in pending:
+                report.targets += 1
+                await self._deliver(chat_id, send, report)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        report.elapsed = time.perf_counter() - t0
+        self.pacer.prune()
+        return report
@@ -0,0 +1,126 @@
+"""Per-subscriber auto-quiz cadence on a timing wheel.
+
+Instead of one tick that sends to every subscriber at once, each
+subscriber has their own next-due time on a TimingWheel:
+
+- phases are spread: a subscriber's first send (and catch-up after
+  downtime) lands at a fixed hash-derived point of the window, so N
+  subscribers at interval T come due at a steady ~N/T per second
+- each subscriber can pick their interval (/subscribe 30) and local quiet
+  hours (/quiet 23-8 +9); a send that would fall inside quiet hours moves
+  to the end of them, again spread so 8 a.m. is not a herd
+- next-due times are persisted through the StateStore, so cadence
+  survives restarts
+
+`due(now)` pops the subscribers due this tick and reschedules each one,
+so a tick costs O(due subscribers), not O(all).
+"""
+from persistence import BroadcastSchedule, StateStore
+from timingwheel import TimingWheel
+
+DAY_SEC = 24 * 3600
+# Longest time anything is scheduled ahead: max interval + a quiet window
+HORIZON_SEC = 2 * DAY_SEC
+# Overdue subscribers (bot was down) are spread over this window
+CATCHUP_WINDOW_SEC = 600
+# Sends deferred by quiet hours are spread over up to this window
+QUIET_SPREAD_SEC = 1800
+
+
+def spread(chat_id: int) -> float:
+    """Stable pseudo-random phase in [0, 1) for a chat (Knuth hash)."""
+    return ((chat_id * 2654435761) & 0xFFFFFFFF) / 2**32
+
+
+def quiet_until(ts: float, schedule: BroadcastSchedule) -> float | None:
+    """End of the quiet window `ts` falls in, or None if it is not quiet."""
+    if schedule.quiet_start is None or schedule.quiet_start == schedule.quiet_end:
+        return None
+    local = (ts + schedule.utc_offset_min * 60) % DAY_SEC
+    start, end = schedule.quiet_start * 3600, schedule.quiet_end * 3600
+    inside = start <= local < end if start < end else (local >= start or local < end)
+    if not inside:
+        return None
+    return ts + (end - local) % DAY_SEC
+
+
+class BroadcastPlanner:
+    def __init__(self, store: StateStore, default_interval: int, now: float,
+                 tick_sec: float = 1.0, min_interval: int = 600, max_interval: int = DAY_SEC):
+        self.store = store
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.wheel = TimingWheel(tick_sec, int(HORIZON_SEC / tick_sec), now)
+        for chat_id in store.subscribed_chats:
+            schedule = store.schedules.get(chat_id)
+            if schedule is None:
+                schedule = self._new_schedule(chat_id, None, now)
+                self._plan(chat_id, schedule, schedule.next_due)
+            elif schedule.next_due < now:
+                due = now + spread(chat_id) * min(schedule.interval_sec, CATCHUP_WINDOW_SEC)
+                self._plan(chat_id, schedule, due)
+            else:
+                self.wheel.schedule(chat_id, schedule.next_due)
+
+    def clamp_interval(self, interval_sec: int) -> int:
+        return max(self.min_interval, min(self.max_interval, int(interval_sec)))
+
+    def _new_schedule(self, chat_id: int, interval_sec: int | None, now: float) -> BroadcastSchedule:
+        old = self.store.schedules.get(chat_id)
+        interval = self.clamp_interval(
+            interval_sec or (old.interval_sec if old else self.default_interval))
+        if old is None:
+            return BroadcastSchedule(now + spread(chat_id) * interval, interval)
+        return old._replace(next_due=now + spread(chat_id) * interval, interval_sec=interval)
+
+    def _plan(self, chat_id: int, schedule: BroadcastSchedule, due: float):
+        """Schedule the next send at `due`, moved past quiet hours if needed."""
+        end = quiet_until(due, schedule)
+        if end is not None:
+            due = end + spread(chat_id) * min(schedule.interval_sec, QUIET_SPREAD_SEC)
+        self.store.set_schedule(chat_id, schedule._replace(next_due=due))
+        self.wheel.schedule(chat_id, due)
+
+    # ─── Subscriber changes ──────────────────────────────────────────────
+
+    def subscribe(self, chat_id: int, now: float, interval_sec: int = None) -> BroadcastSchedule:
+        schedule = self._new_schedule(chat_id, interval_sec, now)
+        self._plan(chat_id, schedule, schedule.next_due)
+        return self.store.schedules[chat_id]
+
+    def unsubscribe(self, chat_id: int):
+        # Preferences stay in the store for a later /subscribe
+        self.wheel.cancel(chat_id)
+
+    def set_quiet(self, chat_id: int, now: float, start: int | None, end: int | None,
+                  utc_offset_min: int) -> BroadcastSchedule:
+        schedule = self.store.schedules.get(chat_id) or self._new_schedule(chat_id, None, now)
+        schedule = schedule._replace(quiet_start=start, quiet_end=end, utc_offset_min=utc_offset_min)
+        if chat_id in self.wheel:
+            self._plan(chat_id, schedule, schedule.next_due)
+        else:
+            self.store.set_schedule(chat_id, schedule)
+        return self.store.schedules[chat_id]
+
+    def schedule_at(self, chat_id: int, due: float):
+        """Force the next send time (ignores quiet hours)."""
+        schedule = self.store.schedules.get(chat_id) or BroadcastSchedule(due, self.default_interval)
+        self.store.set_schedule(chat_id, schedule._replace(next_due=due))
+        self.wheel.schedule(chat_id, due)
+
+    # ─── Ticks ───────────────────────────────────────────────────────────
+
+    def due(self, now: float) -> list[int]:
+        """Subscribers due by `now`; each is rescheduled one interval on."""
+        chats = []
+        for chat_id in self.wheel.advance(now):
+            if chat_id not in self.store.subscribed_chats:
+                continue
+            schedule = self.store.schedules[chat_id]
+            self._plan(chat_id, schedule, now + schedule.interval_sec)
+            chats.append(chat_id)
+        return chats
+
+    def next_due(self, chat_id: int) -> float | None:
+        return self.wheel.due_time(chat_id)
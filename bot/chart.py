@@ -1,10 +1,15 @@
 """Range chart image generation using Pillow."""
+import os
+import time
+from collections import OrderedDict
 from io import BytesIO
 from typing import Optional
 
 from PIL import Image, ImageDraw, ImageFont
 
+import tracing
 from config import RANKS
+from metrics import RENDER_SECONDS, CACHE_REQUESTS
 
 # Colors for each action type
 ACTION_COLORS = {
@@ -31,6 +36,19 @@ PADDING = 8
 FONT_SIZE = 12
 HEADER_FONT_SIZE = 11
 
+# Scaled PDF crops, keyed by (path, mtime, height): every RFI answer
+# combines one of a few dozen files at the same height
+CROP_CACHE_SIZE = 64
+_crop_cache: OrderedDict = OrderedDict()
+_crop_cache_bytes = 0               # decoded pixel bytes held by _crop_cache
+_font_cache: dict[int, object] = {}
+
+_FONT_HIT, _FONT_MISS = (CACHE_REQUESTS.labels("font", r) for r in ("hit", "miss"))
+_CROP_HIT, _CROP_MISS = (CACHE_REQUESTS.labels("crop", r) for r in ("hit", "miss"))
+_RANGE_RENDER, _RANGE_ENCODE = (RENDER_SECONDS.labels("range", p) for p in ("render", "encode"))
+_OPEN_RENDER, _OPEN_ENCODE = (RENDER_SECONDS.labels("open_range", p) for p in ("render", "encode"))
+_COMBINE_RENDER, _COMBINE_ENCODE = (RENDER_SECONDS.labels("combine", p) for p in ("render", "encode"))
+
 
 def _classify_action(action: str) -> str:
     """Classify an action string into a color category."""
@@ -70,7 +88,17 @@ def _hand_at_grid(row: int, col: int) -> str:
 
 
 def _try_load_font(size: int):
-    """Try to load a monospace font, fall back to default."""
+    """Try to load a monospace font, fall back to default (cached per size)."""
+    font = _font_cache.get(size)
+    if font is not None:
+        _FONT_HIT.inc()
+        return font
+    _FONT_MISS.inc()
+    font = _font_cache[size] = _load_font(size)
+    return font
+
+
+def _load_font(size: int):
     font_paths = [
         "/System/Library/Fonts/Menlo.ttc",
         "/System/Library/Fonts/SFMono-Regular.otf",
@@ -85,6 +113,7 @@ def _try_load_font(size: int):
     return ImageFont.load_default()
 
 
+@tracing.traced("render.chart")
 def generate_range_chart(
     scenario_hands: dict,
     actions: list[str],
@@ -102,6 +131,7 @@ def generate_range_chart(
     Returns:
         PNG image bytes
     """
+    start = time.perf_counter()
     grid_size = 13
     total_w = PADDING * 2 + HEADER_SIZE + grid_size * CELL_SIZE
     title_height = 28 if title else 0
@@ -210,31 +240,65 @@ def generate_range_chart(
             bbox = draw.textbbox((0, 0), action, font=header_font)
             legend_x += 18 + (bbox[2] - bbox[0]) + 12
 
-    buf = BytesIO()
-    img.save(buf, format="PNG")
+    _RANGE_RENDER.observe(time.perf_counter() - start)
+    with _RANGE_ENCODE.time(), tracing.span("render.encode"):
+        buf = BytesIO()
+        img.save(buf, format="PNG")
     return buf.getvalue()
 
 
+def _image_bytes(img: Image.Image) -> int:
+    return img.width * img.height * len(img.getbands())
+
+
+def cache_info() -> dict:
+    return {"crop_entries": len(_crop_cache), "crop_capacity": CROP_CACHE_SIZE,
+            "crop_bytes": _crop_cache_bytes, "font_entries": len(_font_cache)}
+
+
+def _scaled_crop(crop_path: str, mtime_ns: int, height: int) -> Image.Image:
+    """PDF crop scaled to `height` — show full PDF as-is (LRU cached)."""
+    global _crop_cache_bytes
+    key = (crop_path, mtime_ns, height)
+    crop = _crop_cache.get(key)
+    if crop is not None:
+        _crop_cache.move_to_end(key)
+        _CROP_HIT.inc()
+        tracing.set_attr("cache", "hit")
+        return crop
+    _CROP_MISS.inc()
+    tracing.set_attr("cache", "miss")
+    with Image.open(crop_path) as raw:
+        scale = height / raw.height
+        crop = raw.resize((int(raw.width * scale), height), Image.LANCZOS)
+    _crop_cache[key] = crop
+    _crop_cache_bytes += _image_bytes(crop)
+    if len(_crop_cache) > CROP_CACHE_SIZE:
+        _crop_cache_bytes -= _image_bytes(_crop_cache.popitem(last=False)[1])
+    return crop
+
+
+@tracing.traced("render.combine")
 def combine_with_crop(chart_bytes: bytes, crop_path: str) -> bytes:
     """Combine range chart with original PDF crop side-by-side (no cropping)."""
-    import os
-    if not os.path.exists(crop_path):
+    try:
+        mtime_ns = os.stat(crop_path).st_mtime_ns
+    except OSError:
         return chart_bytes
 
+    start = time.perf_counter()
     chart = Image.open(BytesIO(chart_bytes))
-    crop  = Image.open(crop_path)
-
-    # Scale crop to match chart height — show full PDF as-is
-    scale = chart.height / crop.height
-    new_w = int(crop.width * scale)
-    crop = crop.resize((new_w, chart.height), Image.LANCZOS)
+    with tracing.span("render.crop"):
+        crop = _scaled_crop(crop_path, mtime_ns, chart.height)
 
-    combined = Image.new("RGB", (chart.width + 4 + new_w, chart.height), (10, 10, 10))
+    combined = Image.new("RGB", (chart.width + 4 + crop.width, chart.height), (10, 10, 10))
     combined.paste(chart, (0, 0))
     combined.paste(crop, (chart.width + 4, 0))
+    _COMBINE_RENDER.observe(time.perf_counter() - start)
 
-    buf = BytesIO()
-    combined.save(buf, format="PNG")
+    with _COMBINE_ENCODE.time(), tracing.span("render.encode"):
+        buf = BytesIO()
+        combined.save(buf, format="PNG")
     return buf.getvalue()
 
 
@@ -251,6 +315,33 @@ OPEN_MIXED_COLOR1 = ( 67, 160,  71)  # green half (raise side)
 OPEN_MIXED_COLOR2 = ( 55,  55,  55)  # gray half (fold side)
 
 
+OPEN_TITLE_HEIGHT = 28
+
+
+def _open_range_chart_height(titled: bool) -> int:
+    return PADDING * 2 + HEADER_SIZE + 13 * CELL_SIZE + (OPEN_TITLE_HEIGHT if titled else 0)
+
+
+def preload_crops(crop_paths: list[str]) -> int:
+    """Scale crops into the cache ahead of use, at the answer chart's height.
+
+    Fills at most the cache's capacity; returns how many were loaded.
+    """
+    height = _open_range_chart_height(True)
+    loaded = 0
+    for crop_path in crop_paths:
+        if loaded == CROP_CACHE_SIZE:
+            break
+        try:
+            mtime_ns = os.stat(crop_path).st_mtime_ns
+        except OSError:
+            continue
+        _scaled_crop(crop_path, mtime_ns, height)
+        loaded += 1
+    return loaded
+
+
+@tracing.traced("render.chart")
 def generate_open_range_chart(
     in_range_hands: frozenset,
     allin_hands: frozenset = None,
@@ -263,10 +354,11 @@ def generate_open_range_chart(
       green = raise, red = all-in, orange = call/limp,
       diagonal split = mixed, gray = fold.
     """
+    start = time.perf_counter()
     grid_size = 13
     total_w = PADDING * 2 + HEADER_SIZE + grid_size * CELL_SIZE
-    title_height = 28 if title else 0
-    total_h = PADDING * 2 + HEADER_SIZE + grid_size * CELL_SIZE + title_height
+    title_height = OPEN_TITLE_HEIGHT if title else 0
+    total_h = _open_range_chart_height(bool(title))
 
     img = Image.new("RGB", (total_w, total_h), OPEN_BG_COLOR)
     draw = ImageDraw.Draw(img)
@@ -364,6 +456,8 @@ def generate_open_range_chart(
         x1 = PADDING + HEADER_SIZE + grid_size * CELL_SIZE
         draw.line([(x0, y), (x1, y)], fill=GRID_COLOR, width=1)
 
-    buf = BytesIO()
-    img.save(buf, format="PNG")
+    _OPEN_RENDER.observe(time.perf_counter() - start)
+    with _OPEN_ENCODE.time(), tracing.span("render.encode"):
+        buf = BytesIO()
+        img.save(buf, format="PNG")
     return buf.getvalue()
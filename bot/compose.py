@@ -0,0 +1,119 @@
+"""Answer responses in as few Bot API round trips as the API allows.
+
+One tap on an answer button used to cost answerCallbackQuery, an edit,
+a chart photo and a separate "Ready?" message, one after the other.
+The composer sends:
+
+- answerCallbackQuery and the result edit concurrently (independent)
+- the chart photo with its caption *and* the Next keyboard in one
+  sendPhoto, concurrently with the two above
+
+so an answer is at most three calls in one round trip. Without a chart
+the keyboard rides on the edit (two calls). Calls per answer are counted
+in `answer_stats`.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from io import BytesIO
+
+from telegram import InlineKeyboardMarkup
+from telegram.constants import ParseMode
+
+logger = logging.getLogger(__name__)
+
+# Telegram's limit on photo captions
+CAPTION_LIMIT = 1024
+
+
+@dataclass
+class CallStats:
+    answers: int = 0
+    calls: int = 0
+
+    def record(self, calls: int):
+        self.answers += 1
+        self.calls += calls
+
+    @property
+    def calls_per_answer(self) -> float:
+        return self.calls / self.answers if self.answers else 0.0
+
+
+answer_stats = CallStats()
+
+
+async def send_answer_response(
+    query,
+    bot,
+    *,
+    toast: str,
+    text: str,
+    keyboard: InlineKeyboardMarkup,
+    photo: bytes = None,
+    caption: str = None,
+    fallback_text: str = "Ready?",
+) -> int:
+    """Acknowledge the tap, show the result and offer `keyboard`.
+
+    `text` replaces the quiz message. With `photo`, the keyboard goes on
+    the photo (caption = `caption`); if the photo fails, it is sent on a
+    plain `fallback_text` message instead. Returns the API calls made.
+    """
+    chat_id = query.message.chat_id
+    calls = [
+        query.answer(toast),
+        query.edit_message_text(
+            text, parse_mode=ParseMode.HTML,
+            reply_markup=None if photo is not None else keyboard,
+        ),
+    ]
+    if photo is not None:
+        calls.append(bot.send_photo(
+            chat_id=chat_id, photo=BytesIO(photo),
+            caption=caption[:CAPTION_LIMIT] if caption else None,
+            reply_markup=keyboard,
+        ))
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    n_calls = len(calls)
+
+    if photo is not None and isinstance(results[2], Exception):
+        logger.warning(f"Failed to send range chart: {results[2]}")
+        await bot.send_message(chat_id=chat_id, text=fallback_text, reply_markup=keyboard)
+        n_calls += 1
+
+    answer_stats.record(n_calls)
+    # Surface answer/edit failures to the error handler, as before
+    for result in results[:2]:
+        if isinstance(result, Exception):
+            raise result
+    return n_calls
+
+
+async def edit_or_reply(query, text: str, reply_markup=None, *, on_photo: str = "reply"):
+    """Replace the tapped message's text, coping with photo messages.
+
+    Next/Fix buttons may sit on the chart photo, which has no text to
+    edit: `on_photo="caption"` edits its caption instead, `"reply"` sends
+    `text` as a new message and, concurrently, drops the photo's buttons
+    so they cannot be tapped again.
+    """
+    message = query.message
+    if message is not None and getattr(message, "photo", None):
+        if on_photo == "caption":
+            return await query.edit_message_caption(
+                caption=text[:CAPTION_LIMIT], reply_markup=reply_markup,
+                parse_mode=ParseMode.HTML,
+            )
+        sent, cleared = await asyncio.gather(
+            message.reply_text(text, reply_markup=reply_markup, parse_mode=ParseMode.HTML),
+            query.edit_message_reply_markup(reply_markup=None),
+            return_exceptions=True,
+        )
+        if isinstance(cleared, Exception):
+            # Already cleared by an earlier tap; the reply still counts
+            logger.debug(f"Could not clear the chart's buttons: {cleared}")
+        if isinstance(sent, Exception):
+            raise sent
+        return sent
+    return await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=ParseMode.HTML)
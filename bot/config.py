@@ -10,11 +10,114 @@ PROJECT_ROOT = Path(__file__).parent.parent
 DATA_DIR = PROJECT_ROOT / "data"
 SCENARIOS_FILE = DATA_DIR / "scenarios.json"
 EV_TABLES_DIR = DATA_DIR / "ev_tables"
-DB_PATH = DATA_DIR / "bankroll.db"
+DB_PATH = Path(os.getenv("BANKROLL_DB_PATH", DATA_DIR / "bankroll.db"))
 PDF_RANGES_FILE = DATA_DIR / "pdf_ranges.json"
+STATE_DB_PATH = Path(os.getenv("STATE_DB_PATH", DATA_DIR / "bot_state.db"))
+
+# Update delivery: "polling" (getUpdates) or "webhook" (embedded HTTP server)
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+# Public https URL registered with setWebhook; empty = register it elsewhere
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+# Checked against X-Telegram-Bot-Api-Secret-Token on every POST
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+
+# Updates handled concurrently across users; one user's updates always run
+# one at a time, in arrival order (1 = everything strictly sequential)
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "8"))
+
+# Prometheus metrics on http://METRICS_LISTEN:METRICS_PORT/metrics (0 = off);
+# sharded workers add their SHARD_INDEX to the port
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Logging goes through a queue to a writer thread. LOG_FILE (empty = stderr
+# only) rotates at LOG_MAX_BYTES. LOG_RATE_LIMITS caps the INFO chatter of
+# noisy loggers, in records per minute (warnings always pass).
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FILE = os.getenv("LOG_FILE", "")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 << 20)))
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", "5"))
+LOG_RATE_LIMITS = os.getenv("LOG_RATE_LIMITS", "httpx=1,apscheduler=1")
+
+# /healthz fails once the event loop wakes up this late (lag probe every
+# HEALTH_PROBE_INTERVAL_SEC; see bot/health.py)
+HEALTH_PROBE_INTERVAL_SEC = float(os.getenv("HEALTH_PROBE_INTERVAL_SEC", "0.5"))
+HEALTH_MAX_LOOP_LAG_SEC = float(os.getenv("HEALTH_MAX_LOOP_LAG_SEC", "2"))
+
+# Fraction of updates traced (0 = off), appended as JSONL span trees to
+# TRACE_PATH, rotated at TRACE_MAX_BYTES; see scripts/trace_summary.py
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_PATH = Path(os.getenv("TRACE_PATH", PROJECT_ROOT / "logs" / "traces.jsonl"))
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(10 << 20)))
+TRACE_BACKUPS = int(os.getenv("TRACE_BACKUPS", "5"))
+
+# Telegram user ids allowed to run admin commands (/profile), comma-separated
+ADMIN_USER_IDS = frozenset(int(u) for u in os.getenv("ADMIN_USER_IDS", "").replace(" ", "").split(",") if u)
+# Sampling profiler sessions (/profile [sec], or SIGUSR2 for PROFILE_SIGNAL_SEC)
+# write flame-graph stacks and a top-functions summary here
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", PROJECT_ROOT / "logs"))
+PROFILE_SIGNAL_SEC = float(os.getenv("PROFILE_SIGNAL_SEC", "30"))
+PROFILE_MAX_SEC = int(os.getenv("PROFILE_MAX_SEC", "300"))
+
+# 1: parse range formats and EV tables on first use and import Pillow on the
+# first chart, so the bot takes updates sooner; 0: load everything up front
+LAZY_STARTUP = os.getenv("LAZY_STARTUP", "1") == "1"
+
+# Bot API endpoint (token is appended); point at a local fake for load tests
+BOT_API_BASE_URL = os.getenv("BOT_API_BASE_URL", "https://api.telegram.org/bot")
+
+# HMAC key for answer-button tokens; empty = derived from TELEGRAM_BOT_TOKEN
+CALLBACK_SECRET = os.getenv("CALLBACK_SECRET", "")
+
+# Sharded mode (bot/router.py): SHARD_COUNT workers, each owning the users
+# with user_id % SHARD_COUNT == SHARD_INDEX, listening on WORKER_BASE_PORT + index
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "1"))
+SHARD_INDEX = int(os.getenv("SHARD_INDEX", "0"))
+WORKER_BASE_PORT = int(os.getenv("WORKER_BASE_PORT", "8100"))
+# Updates buffered per worker while it is down before the router pushes back
+ROUTER_MAX_BACKLOG = int(os.getenv("ROUTER_MAX_BACKLOG", "10000"))
+# 1: load the quiz data once (bot/prefork.py) and fork the workers from it,
+# sharing its memory; 0: each worker is its own bot/main.py process
+PRELOAD_WORKERS = os.getenv("PRELOAD_WORKERS", "0") == "1"
+# How often a worker checks corrections.json for Fixes saved by the others
+CORRECTIONS_POLL_SEC = float(os.getenv("CORRECTIONS_POLL_SEC", "5"))
+
+# Outgoing Bot API budget (Telegram allows ~30 msg/s per bot)
+BOT_API_RATE_PER_SEC = float(os.getenv("BOT_API_RATE_PER_SEC", "30"))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "16"))
+BROADCAST_MAX_RETRIES = int(os.getenv("BROADCAST_MAX_RETRIES", "3"))
+# Auto-quiz cadence: due subscribers are collected every tick; users pick
+# their own interval (minutes) within these bounds
+BROADCAST_TICK_SEC = float(os.getenv("BROADCAST_TICK_SEC", "1"))
+BROADCAST_MIN_INTERVAL_SEC = int(os.getenv("BROADCAST_MIN_INTERVAL_SEC", "600"))
+BROADCAST_MAX_INTERVAL_SEC = int(os.getenv("BROADCAST_MAX_INTERVAL_SEC", "86400"))
+# UTC offset assumed for /quiet when the user gives none (KST)
+DEFAULT_UTC_OFFSET_MIN = int(os.getenv("DEFAULT_UTC_OFFSET_MIN", "540"))
+
+# Group chats: /quiz opens one shared round that closes after the window;
+# live tally edits are spaced per chat (Telegram allows ~20 msgs/min per group)
+GROUP_QUIZ_WINDOW_SEC = float(os.getenv("GROUP_QUIZ_WINDOW_SEC", "30"))
+GROUP_EDIT_INTERVAL_SEC = float(os.getenv("GROUP_EDIT_INTERVAL_SEC", "3"))
+
+# Dirty bot state is coalesced and flushed on this timer (and on shutdown)
+STATE_FLUSH_INTERVAL_SEC = float(os.getenv("STATE_FLUSH_INTERVAL_SEC", "2"))
+# Per-user quiz state (recent hands, last question seq) stays in memory for
+# USER_STATE_TTL_SEC after the user's last activity, for at most
+# USER_STATE_MAX_USERS users; evicted users are read back from the state DB
+USER_STATE_TTL_SEC = float(os.getenv("USER_STATE_TTL_SEC", "3600"))
+USER_STATE_MAX_USERS = int(os.getenv("USER_STATE_MAX_USERS", "50000"))
+# An unanswered question holds back a subscriber's auto-quizzes this long
+PENDING_QUIZ_TTL_SEC = float(os.getenv("PENDING_QUIZ_TTL_SEC", "86400"))
 
 STARTING_BANKROLL = 100.0
 
+# SQLite lock wait when several bot processes share bankroll.db
+DB_BUSY_TIMEOUT_SEC = float(os.getenv("DB_BUSY_TIMEOUT_SEC", "10"))
+
 # Hand selection weights
 MARGINAL_EV_THRESHOLD = 0.5  # EV gap < this = marginal (high weight)
 OBVIOUS_FOLD_EV_GAP = 3.0   # EV gap > this = obvious fold (low weight)
@@ -0,0 +1,95 @@
+"""Shared quiz rounds for group chats.
+
+In a group, /quiz opens one round for the whole chat instead of a
+question per member: anyone can tap an answer until the round closes
+(a member's first tap counts), and votes are tallied per option. The
+question message shows the live tally, but edits go through
+DebouncedEditor — at most one per chat every `interval` seconds, always
+carrying the latest tally — so a few hundred taps cost a handful of
+edits. Scoring waits for the close, where every vote is written to the
+bankroll in one transaction.
+
+Rounds live in memory only: a round open across a restart is lost and
+its buttons answer "closed".
+"""
+import asyncio
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GroupRound:
+    chat_id: int
+    seq: int                      # token seq of the round's buttons
+    question: Any
+    text: str                     # question message as first sent
+    keyboard: Any
+    labels: dict[int, str]        # token action -> button label
+    deadline: float
+    message_id: int | None = None
+    votes: dict[int, tuple[str, int]] = field(default_factory=dict)  # user_id -> (name, action)
+    tallies: Counter = field(default_factory=Counter)
+    closed: bool = False
+
+    def vote(self, user_id: int, username: str, action: int) -> bool:
+        """Record a member's answer; False if closed or they already answered."""
+        if self.closed or user_id in self.votes or action not in self.labels:
+            return False
+        self.votes[user_id] = (username, action)
+        self.tallies[action] += 1
+        return True
+
+
+class DebouncedEditor:
+    """Coalesces message edits per key: at most one every `interval` seconds.
+
+    `request(key, edit)` replaces whatever edit is still waiting for that
+    key, so only the latest state is sent. A key's edits run one at a time
+    in request order; the first request for an idle key goes out at once.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.requested = 0
+        self.sent = 0
+        self._pending: dict[Hashable, Callable[[], Awaitable]] = {}
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        """Keys with an edit waiting or in its spacing interval."""
+        return len(self._tasks)
+
+    def request(self, key: Hashable, edit: Callable[[], Awaitable]):
+        self.requested += 1
+        self._pending[key] = edit
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.get_running_loop().create_task(self._run(key))
+
+    async def _run(self, key):
+        try:
+            while key in self._pending:
+                edit = self._pending.pop(key)
+                self.sent += 1
+                try:
+                    await edit()
+                except Exception as e:
+                    logger.warning(f"Edit for {key} failed: {e}")
+                # Hold the key for the interval so the next edit is spaced out
+                await asyncio.sleep(self.interval)
+        finally:
+            del self._tasks[key]
+
+    async def drain(self):
+        """Wait until every requested edit has been sent."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def close(self):
+        self._pending.clear()
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
@@ -0,0 +1,165 @@
+"""Minimal asyncio HTTP/1.1 server for the bot's own endpoints.
+
+Enough HTTP for Telegram webhooks and local admin endpoints: exact-path
+and prefix routing, Content-Length bodies, keep-alive. No chunked
+requests or TLS — put a reverse proxy in front for anything
+public-facing.
+"""
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+from urllib.parse import parse_qsl, urlsplit
+
+logger = logging.getLogger(__name__)
+
+REASONS = {
+    200: "OK", 204: "No Content", 400: "Bad Request", 403: "Forbidden",
+    404: "Not Found", 405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+MAX_HEADER_BYTES = 16 * 1024
+# Idle keep-alive connections are closed after this many seconds
+KEEPALIVE_TIMEOUT = 75
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: dict[str, str]
+    headers: dict[str, str]     # lower-cased names
+    body: bytes = b""
+
+    def json(self):
+        return json.loads(self.body)
+
+
+@dataclass
+class Response:
+    status: int = 200
+    body: bytes = b""
+    content_type: str = "text/plain; charset=utf-8"
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+def json_response(obj, status: int = 200) -> Response:
+    return Response(status, json.dumps(obj).encode(), "application/json")
+
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+class HttpServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, max_body: int = 1 << 20):
+        self.host = host
+        self.port = port
+        self.max_body = max_body
+        self._routes: dict[tuple[str, str], Handler] = {}
+        self._prefixes: list[tuple[str, str, Handler]] = []
+        self._server: asyncio.AbstractServer | None = None
+        self._conns: set[asyncio.StreamWriter] = set()
+
+    def route(self, method: str, path: str, handler: Handler):
+        self._routes[(method.upper(), path)] = handler
+
+    def route_prefix(self, method: str, prefix: str, handler: Handler):
+        """Route every path under `prefix` (checked after exact routes)."""
+        self._prefixes.append((method.upper(), prefix, handler))
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self._serve_conn, self.host, self.port, limit=MAX_HEADER_BYTES,
+        )
+        # Report the bound port when started with port=0
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"HTTP server listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in list(self._conns):
+            writer.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Request | Response | None:
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            return None
+        except asyncio.LimitOverrunError:
+            return Response(413, b"headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _version = lines[0].split(" ", 2)
+        except ValueError:
+            return Response(400, b"bad request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                k, v = line.split(":", 1)
+                headers[k.strip().lower()] = v.strip()
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            return Response(400, b"bad content-length")
+        if length > self.max_body:
+            return Response(413, b"body too large")
+        body = await reader.readexactly(length) if length else b""
+        url = urlsplit(target)
+        return Request(method.upper(), url.path, dict(parse_qsl(url.query)), headers, body)
+
+    async def _dispatch(self, req: Request) -> Response:
+        handler = self._routes.get((req.method, req.path))
+        if handler is None:
+            handler = next((h for m, p, h in self._prefixes
+                            if m == req.method and req.path.startswith(p)), None)
+        if handler is None:
+            allowed = any(path == req.path for _, path in self._routes)
+            return Response(405 if allowed else 404)
+        try:
+            return await handler(req)
+        except Exception as e:
+            logger.error(f"{req.method} {req.path} failed: {e}", exc_info=e)
+            return Response(500)
+
+    async def _serve_conn(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._conns.add(writer)
+        try:
+            while True:
+                req = await self._read_request(reader)
+                if req is None:
+                    break
+                if isinstance(req, Response):
+                    await self._write(writer, req, keep_alive=False)
+                    break
+                resp = await self._dispatch(req)
+                keep_alive = req.headers.get("connection", "").lower() != "close"
+                await self._write(writer, resp, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Loop shutdown with a request still open (e.g. a long poll);
+            # on 3.11 a cancelled connection task is logged as an error
+            pass
+        finally:
+            self._conns.discard(writer)
+            writer.close()
+
+    @staticmethod
+    async def _write(writer: asyncio.StreamWriter, resp: Response, keep_alive: bool):
+        head = [
+            f"HTTP/1.1 {resp.status} {REASONS.get(resp.status, 'Unknown')}",
+            f"Content-Type: {resp.content_type}",
+            f"Content-Length: {len(resp.body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        head += [f"{k}: {v}" for k, v in resp.headers.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + resp.body)
+        await writer.drain()
@@ -0,0 +1,251 @@
+"""Bankroll ledger replay and audit.
+
+`users` holds running totals; `answer_history` is the ledger they were
+built from. `replay()` recomputes bankroll, best_bankroll, streak,
+best_streak, total_questions and correct_count for every user from the
+ledger in one streaming pass ordered by (user_id, id), reading only a
+covering index, with constant memory per user.
+
+`audit()` compares the replay with `users` and yields the users that
+drifted; `apply_fixes()` writes replayed values back in one transaction,
+guarded so a user who answered in the meantime is left alone.
+
+After changing the scoring constants, replay with `scale=` (multiply
+every recorded EV) or a custom `ev_map(chosen_ev, was_correct) -> ev`.
+`rescore()` makes a scale permanent: it rewrites the ledger and `users`
+together, so the two still agree afterwards.
+"""
+import sqlite3
+from dataclasses import dataclass, asdict
+from typing import Callable, Iterator, Optional
+
+from config import STARTING_BANKROLL
+
+# Float tolerance when comparing replayed bankrolls with stored ones
+EPSILON = 1e-6
+
+STAT_FIELDS = (
+    "bankroll", "best_bankroll", "streak", "best_streak",
+    "total_questions", "correct_count",
+)
+
+
+@dataclass
+class LedgerTotals:
+    user_id: int
+    bankroll: float
+    best_bankroll: float
+    streak: int
+    best_streak: int
+    total_questions: int
+    correct_count: int
+
+
+@dataclass
+class Drift:
+    user_id: int
+    stored: Optional[dict]      # None if the user row is missing
+    replayed: LedgerTotals
+
+    @property
+    def fields(self) -> list[str]:
+        if self.stored is None:
+            return list(STAT_FIELDS)
+        out = []
+        for name in STAT_FIELDS:
+            a, b = self.stored[name], getattr(self.replayed, name)
+            if (abs(a - b) > EPSILON) if isinstance(b, float) else a != b:
+                out.append(name)
+        return out
+
+
+# Rows fetched per round trip; bounds memory regardless of table size
+FETCH_CHUNK = 65536
+
+
+def replay(
+    conn: sqlite3.Connection,
+    scale: float = 1.0,
+    ev_map: Optional[Callable[[float, int], float]] = None,
+    start: float = STARTING_BANKROLL,
+) -> Iterator[LedgerTotals]:
+    """Stream replayed totals for every user with history, ordered by user_id.
+
+    One ordered scan of the covering index on answer_history
+    (user_id, id, chosen_ev, was_correct); per-user state is a handful of
+    locals that are emitted when user_id changes.
+    """
+    cur = conn.execute(
+        "SELECT user_id, chosen_ev, was_correct FROM answer_history "
+        "ORDER BY user_id, id"
+    )
+    last = None
+    bankroll = best_bankroll = start
+    streak = best_streak = total = correct = 0
+    while True:
+        rows = cur.fetchmany(FETCH_CHUNK)
+        if not rows:
+            break
+        for user_id, ev, ok in rows:
+            if user_id != last:
+                if last is not None:
+                    yield LedgerTotals(last, bankroll, best_bankroll,
+                                       streak, best_streak, total, correct)
+                last = user_id
+                bankroll = best_bankroll = start
+                streak = best_streak = total = correct = 0
+            ev = ev or 0.0      # NULL chosen_ev counts as no change
+            if ev_map is not None:
+                ev = ev_map(ev, ok)
+            elif scale != 1.0:
+                ev *= scale
+            bankroll += ev
+            if bankroll > best_bankroll:
+                best_bankroll = bankroll
+            total += 1
+            if ok:
+                correct += 1
+                streak += 1
+                if streak > best_streak:
+                    best_streak = streak
+            else:
+                streak = 0
+    if last is not None:
+        yield LedgerTotals(last, bankroll, best_bankroll,
+                           streak, best_streak, total, correct)
+
+
+def audit(conn: sqlite3.Connection, **replay_kwargs) -> Iterator[Drift]:
+    """Yield users whose stored stats disagree with the ledger.
+
+    Merge-joins the replay stream with `users` (both ordered by user_id).
+    Consume it inside one read transaction (BEGIN ... COMMIT) so both
+    sides see the same snapshot. Users without history must still be at
+    the starting values.
+    """
+    start = replay_kwargs.get("start", STARTING_BANKROLL)
+    users = conn.execute(
+        f"SELECT user_id, {', '.join(STAT_FIELDS)} FROM users ORDER BY user_id"
+    )
+    cols = ("user_id",) + STAT_FIELDS
+    stored_iter = (dict(zip(cols, r)) for r in users)
+    stored = next(stored_iter, None)
+
+    for totals in replay(conn, **replay_kwargs):
+        while stored is not None and stored["user_id"] < totals.user_id:
+            empty = LedgerTotals(stored["user_id"], start, start, 0, 0, 0, 0)
+            drift = Drift(stored["user_id"], stored, empty)
+            if drift.fields:
+                yield drift
+            stored = next(stored_iter, None)
+        if stored is not None and stored["user_id"] == totals.user_id:
+            drift = Drift(totals.user_id, stored, totals)
+            stored = next(stored_iter, None)
+        else:
+            drift = Drift(totals.user_id, None, totals)
+        if drift.fields:
+            yield drift
+
+    while stored is not None:
+        empty = LedgerTotals(stored["user_id"], start, start, 0, 0, 0, 0)
+        drift = Drift(stored["user_id"], stored, empty)
+        if drift.fields:
+            yield drift
+        stored = next(stored_iter, None)
+
+
+def _write_totals(conn: sqlite3.Connection, drifts: list[Drift]) -> int:
+    updates, inserts = [], []
+    for d in drifts:
+        values = asdict(d.replayed)
+        if d.stored is None:
+            inserts.append(values)
+        else:
+            values["expected_total"] = d.stored["total_questions"]
+            updates.append(values)
+    before = conn.total_changes
+    conn.executemany(
+        "UPDATE users SET bankroll = :bankroll, best_bankroll = :best_bankroll, "
+        "streak = :streak, best_streak = :best_streak, "
+        "total_questions = :total_questions, correct_count = :correct_count "
+        "WHERE user_id = :user_id AND total_questions = :expected_total",
+        updates,
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO users (user_id, bankroll, best_bankroll, streak, "
+        "best_streak, total_questions, correct_count) VALUES (:user_id, :bankroll, "
+        ":best_bankroll, :streak, :best_streak, :total_questions, :correct_count)",
+        inserts,
+    )
+    return conn.total_changes - before
+
+
+def apply_fixes(conn: sqlite3.Connection, drifts: list[Drift]) -> int:
+    """Write replayed stats for drifted users in one transaction.
+
+    Each update is a compare-and-swap on the stored total_questions, so a
+    user who answered after the audit snapshot is skipped (re-run to fix).
+    Returns the number of users updated.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        changed = _write_totals(conn, drifts)
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return changed
+
+
+def _rescale_history(conn: sqlite3.Connection, scale: float, start: float) -> int:
+    """Scale chosen_ev and ev_vs_best and recompute bankroll_after, in
+    (user_id, id) order, a chunk at a time."""
+    select = ("SELECT user_id, id, chosen_ev, ev_vs_best FROM answer_history "
+              "{} ORDER BY user_id, id LIMIT ?")
+    key, user, bankroll, updated = None, None, start, 0
+    while True:
+        if key is None:
+            rows = conn.execute(select.format(""), (FETCH_CHUNK,)).fetchall()
+        else:
+            rows = conn.execute(select.format("WHERE (user_id, id) > (?, ?)"),
+                                (*key, FETCH_CHUNK)).fetchall()
+        if not rows:
+            return updated
+        changes = []
+        for user_id, row_id, ev, ev_vs_best in rows:
+            if user_id != user:
+                user, bankroll = user_id, start
+            if ev is not None:
+                ev *= scale
+                bankroll += ev
+            if ev_vs_best is not None:
+                ev_vs_best *= scale
+            changes.append((ev, ev_vs_best, bankroll, row_id))
+        conn.executemany(
+            "UPDATE answer_history SET chosen_ev = ?, ev_vs_best = ?, bankroll_after = ? "
+            "WHERE id = ?", changes,
+        )
+        updated += len(changes)
+        key = rows[-1][:2]
+
+
+def rescore(conn: sqlite3.Connection, scale: float,
+            start: float = STARTING_BANKROLL) -> tuple[int, int]:
+    """Multiply every recorded EV by `scale`, in the ledger and in `users`.
+
+    One BEGIN IMMEDIATE transaction: the audit at `scale`, the rescaled
+    answer_history rows and the replayed totals, so nobody answers in
+    between (the bot's writes wait on the busy timeout meanwhile) and a
+    plain audit afterwards finds no drift. Returns (answers, users)
+    updated.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        drifts = list(audit(conn, scale=scale, start=start))
+        answers = _rescale_history(conn, scale, start)
+        users = _write_totals(conn, drifts)
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return answers, users
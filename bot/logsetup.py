@@ -0,0 +1,202 @@
+"""Logging off the event loop: queue in, one writer thread out.
+
+`setup_logging()` replaces the root handlers with a single QueueHandler.
+On the thread that logs, a record costs a level check, building the
+LogRecord (without caller, thread or process lookups, which FORMAT does
+not use), the rate-limit filter and a queue put. Formatting, secret
+redaction and the file and console writes all happen on a QueueListener
+thread:
+
+    logger.info(...) -> RateLimitFilter -> QueueHandler ──queue──>
+        QueueListener thread -> RedactingFormatter -> RotatingFileHandler / stderr
+
+- RateLimitFilter gives noisy loggers ("httpx" logs every getUpdates poll,
+  "apscheduler" every job run) a budget of records per minute below
+  WARNING; what it drops is counted and the count is appended to the
+  next record it lets through. Warnings and errors always pass
+- RedactingFormatter scrubs Bot API tokens (bare, or in ".../bot<token>/"
+  URLs) and any configured secret values from the formatted line,
+  exception text included, with one precompiled pattern
+
+Skipping those lookups means setting logging module globals (the
+"Optimization" section of the logging HOWTO): logThreads, logProcesses,
+logMultiprocessing and _srcfile. The caller lookup runs in
+Logger._log, before any handler or formatter sees the record, so only
+_srcfile turns it off. They stay set while setup_logging's queue is in
+place; stop_logging() puts back the values it found.
+"""
+import atexit
+import logging
+import queue
+import re
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Iterable, Optional
+
+from config import (
+    TELEGRAM_BOT_TOKEN, WEBHOOK_SECRET, CALLBACK_SECRET,
+    LOG_LEVEL, LOG_FILE, LOG_MAX_BYTES, LOG_BACKUPS, LOG_RATE_LIMITS,
+)
+
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# "<bot id>:<secret>" as issued by @BotFather
+TOKEN_PATTERN = r"\d{5,}:[A-Za-z0-9_-]{30,}"
+REDACTED = "[REDACTED]"
+
+_listener: Optional[QueueListener] = None
+# logging globals as they were before setup_logging(), put back by stop_logging()
+_saved_globals: Optional[tuple] = None
+
+
+class RedactingFormatter(logging.Formatter):
+    def __init__(self, fmt: str = FORMAT, secrets: Iterable[str] = ()):
+        super().__init__(fmt)
+        # Longest first, so a secret containing another is replaced whole
+        literals = sorted((re.escape(s) for s in set(secrets) if s), key=len, reverse=True)
+        self._pattern = re.compile("|".join([TOKEN_PATTERN, *literals]))
+
+    def format(self, record: logging.LogRecord) -> str:
+        return self._pattern.sub(REDACTED, super().format(record))
+
+
+class RateLimitFilter(logging.Filter):
+    """At most `per_minute` records below WARNING per limited logger prefix."""
+
+    def __init__(self, limits: dict[str, float]):
+        super().__init__()
+        self.limits = dict(limits)
+        self.suppressed_total = 0
+        self._rules: dict[str, Optional[str]] = {}    # logger name -> limited prefix
+        self._buckets: dict[str, list] = {}           # prefix -> [tokens, updated, suppressed]
+        self._lock = threading.Lock()
+
+    def _prefix(self, name: str) -> Optional[str]:
+        try:
+            return self._rules[name]
+        except KeyError:
+            pass
+        prefix, candidate = None, name
+        while candidate:
+            if candidate in self.limits:
+                prefix = candidate
+                break
+            candidate = candidate.rpartition(".")[0]
+        self._rules[name] = prefix
+        return prefix
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        prefix = self._prefix(record.name)
+        if prefix is None:
+            return True
+        per_minute = self.limits[prefix]
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(prefix)
+            if bucket is None:
+                bucket = self._buckets[prefix] = [1.0, now, 0]
+            bucket[0] = min(1.0, bucket[0] + (now - bucket[1]) * per_minute / 60)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                self.suppressed_total += 1
+                return False
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+        if suppressed:
+            record.msg = f"{record.getMessage()} (+{suppressed} similar suppressed)"
+            record.args = None
+        return True
+
+
+class _EnqueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge %-args now: the objects may change before the writer gets to them
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+def parse_rate_limits(spec: str) -> dict[str, float]:
+    """"httpx=1,apscheduler=2" -> {"httpx": 1.0, "apscheduler": 2.0} (per minute)"""
+    limits = {}
+    for part in spec.replace(" ", "").split(","):
+        if part:
+            name, _, rate = part.partition("=")
+            limits[name] = float(rate or 1)
+    return limits
+
+
+def setup_logging(level: str = "INFO", path=None, max_bytes: int = 10 << 20,
+                  backups: int = 5, rate_limits: Optional[dict] = None,
+                  secrets: Iterable[str] = (), console: bool = True) -> QueueListener:
+    """Route the root logger through a queue to stderr and/or a rotating file."""
+    global _listener, _saved_globals
+    stop_logging()
+    formatter = RedactingFormatter(FORMAT, secrets)
+    handlers: list[logging.Handler] = []
+    if console:
+        handlers.append(logging.StreamHandler(sys.stderr))
+    if path:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        handlers.append(RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                            encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    enqueue = _EnqueueHandler(records)
+    if rate_limits:
+        enqueue.addFilter(RateLimitFilter(rate_limits))
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+        old.close()
+    root.addHandler(enqueue)
+    root.setLevel(level)
+    # FORMAT uses none of these; skip collecting them for every record
+    _saved_globals = (logging.logThreads, logging.logProcesses,
+                      logging.logMultiprocessing, logging._srcfile)
+    logging.logThreads = logging.logProcesses = logging.logMultiprocessing = False
+    logging._srcfile = None
+    _listener = QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def setup_logging_from_config() -> QueueListener:
+    """setup_logging() with the LOG_* settings, redacting the bot's secrets."""
+    return setup_logging(LOG_LEVEL, LOG_FILE or None, LOG_MAX_BYTES, LOG_BACKUPS,
+                         parse_rate_limits(LOG_RATE_LIMITS),
+                         secrets=(TELEGRAM_BOT_TOKEN, WEBHOOK_SECRET, CALLBACK_SECRET))
+
+
+def queue_depth() -> int:
+    """Records waiting for the writer thread."""
+    return _listener.queue.qsize() if _listener is not None else 0
+
+
+def stop_logging():
+    """Flush queued records, close the outputs and restore the logging
+    globals setup_logging() changed (also runs at exit)."""
+    global _listener, _saved_globals
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    (logging.logThreads, logging.logProcesses,
+     logging.logMultiprocessing, logging._srcfile) = _saved_globals
+    _saved_globals = None
+
+
+atexit.register(stop_logging)
@@ -1,21 +1,30 @@
 #!/usr/bin/env python3
 """Open Range Quiz Telegram Bot."""
-import json
+import asyncio
+import hashlib
 import logging
 import random
+import signal
+import sys
+import time
 from collections import deque
-from io import BytesIO
+from functools import partial
+from typing import NamedTuple, Optional
 
+from startup import STARTUP
+
+import httpx
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, BotCommand
 from telegram.ext import (
     Application, CommandHandler, CallbackQueryHandler, ContextTypes
 )
-from telegram.constants import ParseMode
+from telegram.constants import ChatType, ParseMode
+from telegram.request import HTTPXRequest
 
-from config import TELEGRAM_BOT_TOKEN
+from config import TELEGRAM_BOT_TOKEN, ALL_HANDS_169
 from quiz import (
-    QuizManager, OpenRangeQuizManager, OPEN_RANGE_POSITIONS,
-    QuizQuestion, OpenRangeQuestion,
+    OpenRangeQuizManager, OPEN_RANGE_POSITIONS,
+    QuizQuestion, OpenRangeQuestion, load_quiz_data, update_corrections,
 )
 
 
@@ -51,22 +60,56 @@ FORMAT_META = {
     "mtt_10bb":            {"game": "MTT 8-max",  "stack": "10bb",  "rake": "0.125bb ante"},
 }
 from bankroll import BankrollManager
-from chart import generate_open_range_chart, combine_with_crop
-from config import DATA_DIR
-from persistence import load_state, save_state
+from broadcast import Broadcaster
+from ratelimit import TokenBucket
+from scheduler import OutboundScheduler, Priority
+from compose import send_answer_response, edit_or_reply
+from config import (
+    DATA_DIR, STATE_FLUSH_INTERVAL_SEC,
+    BOT_API_RATE_PER_SEC, BROADCAST_CONCURRENCY, BROADCAST_MAX_RETRIES,
+    BOT_MODE, CONCURRENT_UPDATES, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH,
+    WEBHOOK_URL, WEBHOOK_SECRET, WEBHOOK_MAX_CONNECTIONS, BOT_API_BASE_URL,
+    SHARD_COUNT, SHARD_INDEX, CALLBACK_SECRET, CORRECTIONS_POLL_SEC,
+    BROADCAST_TICK_SEC, BROADCAST_MIN_INTERVAL_SEC, BROADCAST_MAX_INTERVAL_SEC,
+    DEFAULT_UTC_OFFSET_MIN, GROUP_QUIZ_WINDOW_SEC, GROUP_EDIT_INTERVAL_SEC,
+    METRICS_LISTEN, METRICS_PORT,
+    TRACE_SAMPLE_RATE, TRACE_PATH, TRACE_MAX_BYTES, TRACE_BACKUPS,
+    ADMIN_USER_IDS, PROFILE_DIR, PROFILE_SIGNAL_SEC, PROFILE_MAX_SEC,
+    LAZY_STARTUP, USER_STATE_TTL_SEC, USER_STATE_MAX_USERS, PENDING_QUIZ_TTL_SEC,
+    HEALTH_PROBE_INTERVAL_SEC, HEALTH_MAX_LOOP_LAG_SEC,
+)
+from cadence import BroadcastPlanner
+from groupquiz import GroupRound, DebouncedEditor
+from health import Introspector, LoopLagProbe, executor_stats, process_stats
+from httpserver import HttpServer, Request, Response, json_response
+import logsetup
+from logsetup import setup_logging_from_config
+import metrics
+import profiler
+from metrics import HANDLER_SECONDS, EVENT_LOOP_LAG
+import tracing
+from userlock import UserSerialProcessor
+from userstate import UserStateCache
+from persistence import StateStore
+from tokens import (
+    TokenSigner, QuestionToken, InvalidToken, snapshot_id, KIND_RFI, KIND_SCENARIO, ANY_USER,
+)
+from webhook import run_webhook
 
 
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO
-)
+setup_logging_from_config()
 logger = logging.getLogger(__name__)
+STARTUP.mark("imports")
 
-quiz_manager = QuizManager()
-open_range_quiz = OpenRangeQuizManager(quiz_manager.ev_tables)
+# Preloaded by bot/prefork.py when forked from it, else loaded here
+quiz_manager, open_range_quiz = load_quiz_data(lazy=LAZY_STARTUP)
+if not LAZY_STARTUP:
+    import chart    # Pillow and fonts now, not on the first answer
 _available_formats = open_range_quiz.get_available_formats()
 logger.info(f"Loaded formats: {_available_formats}")
+STARTUP.mark("quiz data")
 bankroll_manager = BankrollManager()
+STARTUP.mark("bankroll db")
 CROPS_DIR = DATA_DIR / "crops"
 
 # Verified format/position combos (range editor pages 1-26)
@@ -93,25 +136,63 @@ VERIFIED_SET = set(VERIFIED_SLOTS)
 BB_MIN, BB_MAX = 1.0, 5.0
 BB_MIXED_MIN, BB_MIXED_MAX = 0.5, 2.5
 
-_state = load_state()
-active_chats: set[int] = set(_state.get("active_chats", []))
-subscribed_chats: set[int] = set(_state.get("subscribed_chats", []))
+# A sharded worker only ever sees (and persists) its own users
+state_store = StateStore(shard=(SHARD_INDEX, SHARD_COUNT) if SHARD_COUNT > 1 else None)
+# Live views of the store's sets — mutate only through state_store
+active_chats: set[int] = state_store.active_chats
+subscribed_chats: set[int] = state_store.subscribed_chats
+STARTUP.mark("state store")
 
-# Auto-broadcast interval (seconds). Override via env BROADCAST_INTERVAL_SEC.
+# Default auto-broadcast interval (seconds). Override via env BROADCAST_INTERVAL_SEC.
 import os
 BROADCAST_INTERVAL_SEC = int(os.getenv("BROADCAST_INTERVAL_SEC", "3600"))
+# Each subscriber's next auto-quiz, spread over their interval
+broadcast_planner = BroadcastPlanner(
+    state_store, BROADCAST_INTERVAL_SEC, time.time(), tick_sec=BROADCAST_TICK_SEC,
+    min_interval=BROADCAST_MIN_INTERVAL_SEC, max_interval=BROADCAST_MAX_INTERVAL_SEC,
+)
 
-# Per-user pending quiz
-pending_quizzes: dict[int, object] = {}
+# Shared Bot API budget. Every outgoing call is queued by priority
+# (callback answers > replies > charts > broadcasts) and draws from it.
+api_limiter = TokenBucket(BOT_API_RATE_PER_SEC)
+outbound = OutboundScheduler(api_limiter)
+broadcaster = Broadcaster(
+    concurrency=BROADCAST_CONCURRENCY,
+    max_retries=BROADCAST_MAX_RETRIES,
+)
+_broadcast_running = False
+# Subscribers due for an auto-quiz, not yet sent
+_broadcast_backlog: deque[int] = deque()
+
+# Answer buttons carry signed question tokens; any worker can score them.
+# Default key is derived from the bot token so every worker agrees on it.
+token_signer = TokenSigner(
+    CALLBACK_SECRET.encode() if CALLBACK_SECRET
+    else hashlib.sha256(b"callback-token:" + TELEGRAM_BOT_TOKEN.encode()).digest()
+)
 
-# Per-user recent hands: deque of (position, hand) tuples
-user_recent: dict[int, deque] = {}
+# Open shared round per group chat; tally edits are debounced per chat
+GROUP_CHAT_TYPES = {ChatType.GROUP, ChatType.SUPERGROUP}
+group_rounds: dict[int, GroupRound] = {}
+group_editor = DebouncedEditor(GROUP_EDIT_INTERVAL_SEC)
 
-# Per-user recent scenarios: deque of (scenario_id, hand) tuples for QuizManager weighting
-user_recent_scenarios: dict[int, deque] = {}
+# Token ref indexes: RFI slots are fixed by code, scenarios by the snapshot
+RFI_SLOTS = [(f, p) for f in OpenRangeQuizManager.FORMATS for p in OPEN_RANGE_POSITIONS]
+RFI_SLOT_INDEX = {slot: i for i, slot in enumerate(RFI_SLOTS)}
+SCENARIO_IDS = sorted(quiz_manager.scenarios)
+SCENARIO_INDEX = {sid: i for i, sid in enumerate(SCENARIO_IDS)}
+HAND_INDEX = {h: i for i, h in enumerate(ALL_HANDS_169)}
+# Button order for RFI answers; the token's action byte indexes this
+RFI_ACTIONS = ["Push", "Open", "Call", "Fold"]
 
 RECENT_LIMIT = 50
 
+# Per-user recent hands, recent scenarios and last issued seq (a question is
+# open while that is newer than last_answered_seq in bankroll.db and not
+# past PENDING_QUIZ_TTL_SEC); idle users are evicted to the state DB
+user_states = UserStateCache(state_store, USER_STATE_TTL_SEC, USER_STATE_MAX_USERS, time.time(),
+                             recent_limit=RECENT_LIMIT, pending_ttl_sec=PENDING_QUIZ_TTL_SEC)
+
 # Narrative scenario routing
 SCENARIO_POOL: list[str] = sorted(quiz_manager.get_available_scenarios())
 SCENARIO_RATIO = 1.0  # always pick narrative scenario unless RFI hint (fmt/pos) given
@@ -131,19 +212,106 @@ def escape_html(text: str) -> str:
     return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
 
 
+def _issue_seq(user_id: int) -> int:
+    """Next question seq for a user: issue time in ms, strictly increasing."""
+    now = time.time()
+    state = user_states.get(user_id, now)
+    seq = max(int(now * 1000), state.issued_seq + 1)
+    state.issued_seq = seq
+    user_states.mark_dirty(user_id)
+    return seq
+
+
+def _question_token(question, seq: int, action: int) -> QuestionToken:
+    hand = HAND_INDEX[question.hand]
+    if isinstance(question, OpenRangeQuestion):
+        ref = RFI_SLOT_INDEX[(question.format_key, question.position)]
+        return QuestionToken(KIND_RFI, snapshot_id(open_range_quiz.snapshot_version),
+                             ref, hand, action, seq)
+    return QuestionToken(KIND_SCENARIO, snapshot_id(quiz_manager.snapshot_version),
+                         SCENARIO_INDEX[question.scenario.id], hand, action, seq)
+
+
+def _question_from_token(token: QuestionToken):
+    """Rebuild the question a token refers to; None if the quiz data changed since."""
+    if not 0 <= token.hand < len(ALL_HANDS_169):
+        return None
+    hand = ALL_HANDS_169[token.hand]
+    if token.kind == KIND_RFI and token.snapshot == snapshot_id(open_range_quiz.snapshot_version):
+        if token.ref < len(RFI_SLOTS):
+            return open_range_quiz.build_question(*RFI_SLOTS[token.ref], hand)
+    if token.kind == KIND_SCENARIO and token.snapshot == snapshot_id(quiz_manager.snapshot_version):
+        if token.ref < len(SCENARIO_IDS):
+            return quiz_manager.build_question(SCENARIO_IDS[token.ref], hand)
+    return None
+
+
+class Grade(NamedTuple):
+    chosen: str          # action as recorded in answer_history
+    best: str
+    scenario_id: str
+    was_correct: bool
+    is_mixed: bool
+
+
+def _grade(question, action: int) -> Optional[Grade]:
+    """Grade a token's action against its question; None if out of range."""
+    if isinstance(question, OpenRangeQuestion):
+        if not 0 <= action < len(RFI_ACTIONS):
+            return None
+        chosen = RFI_ACTIONS[action]
+        correct = question.correct_action
+        is_mixed = question.hand in question.mixed_hands
+        return Grade(chosen, correct, f"{question.format_key}:{question.position}",
+                     chosen == correct or is_mixed, is_mixed)
+    sc = question.scenario
+    if not 0 <= action < len(sc.actions):
+        return None
+    chosen = sc.actions[action]
+    freq = (question.strategy or {}).get(chosen, 0.0)
+    return Grade(chosen, question.best_action, sc.id, freq > 0.0, 0.0 < freq < 0.99)
+
+
+def _answer_key(chat_id: int, seq: int, user_id: int) -> str:
+    """Idempotency key of an answer: one per user per question sent to a chat."""
+    return f"{chat_id}:{seq}:{user_id}"
+
+
+def _not_scored_text(answer_key: str) -> str:
+    """Alert for an answer record_answer() refused: a repeat tap, or a
+    question older than one the user has already answered."""
+    if bankroll_manager.answer_recorded(answer_key):
+        return "Already answered — use /quiz for a new one."
+    return "Quiz expired — you answered a newer question. Use /quiz for a new one."
+
+
+def _bb_change(grade: Grade) -> float:
+    """Bankroll scoring (random 1-5bb, mixed 0.5-2.5bb)."""
+    if grade.is_mixed:
+        return round(random.uniform(BB_MIXED_MIN, BB_MIXED_MAX), 1)
+    if grade.was_correct:
+        return round(random.uniform(BB_MIN, BB_MAX), 1)
+    return -round(random.uniform(BB_MIN, BB_MAX), 1)
+
+
 def _get_recent_set(user_id: int, position: str) -> set:
     """Return hands recently seen by this user for the given position."""
-    recent = user_recent.get(user_id, deque())
+    recent = user_states.get(user_id, time.time()).recent
     return {hand for pos, hand in recent if pos == position}
 
 
 def _record_recent(user_id: int, position: str, hand: str):
-    if user_id not in user_recent:
-        user_recent[user_id] = deque(maxlen=RECENT_LIMIT)
-    user_recent[user_id].append((position, hand))
+    user_states.get(user_id, time.time()).recent.append((position, hand))
+    user_states.mark_dirty(user_id)
+
+
+def _answer_button(label: str, question, chat_id: int, user_id: int, seq: int, action: int):
+    token = _question_token(question, seq, action)
+    return InlineKeyboardButton(label, callback_data=token_signer.sign(chat_id, user_id, token))
 
 
-def _build_quiz_message(question) -> tuple[str, InlineKeyboardMarkup]:
+def _build_quiz_message(question, chat_id: int, user_id: int,
+                        seq: int) -> tuple[str, InlineKeyboardMarkup]:
     pos  = question.position
     hand = escape_html(question.hand_display)
     fkey = question.format_key
@@ -181,12 +349,12 @@ def _build_quiz_message(question) -> tuple[str, InlineKeyboardMarkup]:
     # Build buttons based on available actions
     buttons = []
     if has_allin:
-        buttons.append(InlineKeyboardButton("Push", callback_data=f"rfi:{fkey}:{pos}:{question.hand}:P"))
+        buttons.append(_answer_button("Push", question, chat_id, user_id, seq, RFI_ACTIONS.index("Push")))
     if has_raise:
-        buttons.append(InlineKeyboardButton("Raise", callback_data=f"rfi:{fkey}:{pos}:{question.hand}:O"))
+        buttons.append(_answer_button("Raise", question, chat_id, user_id, seq, RFI_ACTIONS.index("Open")))
     if has_call:
-        buttons.append(InlineKeyboardButton("Call", callback_data=f"rfi:{fkey}:{pos}:{question.hand}:C"))
-    buttons.append(InlineKeyboardButton("Fold", callback_data=f"rfi:{fkey}:{pos}:{question.hand}:F"))
+        buttons.append(_answer_button("Call", question, chat_id, user_id, seq, RFI_ACTIONS.index("Call")))
+    buttons.append(_answer_button("Fold", question, chat_id, user_id, seq, RFI_ACTIONS.index("Fold")))
 
     labels = [b.text for b in buttons]
     if len(labels) == 2:
@@ -229,7 +397,9 @@ def _scenario_action_emoji(action_label: str) -> str:
     return "🔴"
 
 
-def _build_scenario_message(question: QuizQuestion) -> tuple[str, InlineKeyboardMarkup]:
+def _build_scenario_message(
+    question: QuizQuestion, chat_id: int, user_id: int, seq: int,
+) -> tuple[str, InlineKeyboardMarkup]:
     """Build narrative-style preflop scenario message (action-by-action)."""
     sc = question.scenario
     fkey = _format_key_for_scenario(sc)
@@ -256,12 +426,7 @@ def _build_scenario_message(question: QuizQuestion) -> tuple[str, InlineKeyboard
     buttons = []
     for i, label in enumerate(sc.actions):
         emoji = _scenario_action_emoji(label)
-        buttons.append(
-            InlineKeyboardButton(
-                f"{emoji} {label}",
-                callback_data=f"sc:{sc.id}:{question.hand}:{i}",
-            )
-        )
+        buttons.append(_answer_button(f"{emoji} {label}", question, chat_id, user_id, seq, i))
     # Telegram inline buttons: split into rows of 2 if > 3 actions
     if len(buttons) > 3:
         keyboard = InlineKeyboardMarkup([buttons[:2], buttons[2:]])
@@ -271,13 +436,12 @@ def _build_scenario_message(question: QuizQuestion) -> tuple[str, InlineKeyboard
 
 
 def _record_recent_scenario(user_id: int, scenario_id: str, hand: str):
-    if user_id not in user_recent_scenarios:
-        user_recent_scenarios[user_id] = deque(maxlen=RECENT_LIMIT)
-    user_recent_scenarios[user_id].append((scenario_id, hand))
+    user_states.get(user_id, time.time()).recent_scenarios.append((scenario_id, hand))
+    user_states.mark_dirty(user_id)
 
 
 def _scenario_recent_history(user_id: int) -> list[tuple]:
-    return list(user_recent_scenarios.get(user_id, deque()))
+    return list(user_states.get(user_id, time.time()).recent_scenarios)
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -285,8 +449,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     username = update.effective_user.username or update.effective_user.first_name or str(user_id)
 
-    active_chats.add(chat_id)
-    save_state(active_chats, subscribed_chats)
+    state_store.add_active(chat_id)
     bankroll_manager.get_or_create_user(user_id, username)
 
     await update.message.reply_text(
@@ -331,10 +494,11 @@ async def _send_scenario_quiz_message(send_target, user_id: int, scenario_id: st
     )
     if question is None:
         return False
-    pending_quizzes[user_id] = question
-    text, keyboard = _build_scenario_message(question)
-    if hasattr(send_target, "edit_message_text"):
-        await send_target.edit_message_text(text, reply_markup=keyboard, parse_mode=ParseMode.HTML)
+    is_query = hasattr(send_target, "edit_message_text")
+    chat_id = send_target.message.chat_id if is_query else send_target.chat_id
+    text, keyboard = _build_scenario_message(question, chat_id, user_id, _issue_seq(user_id))
+    if is_query:
+        await edit_or_reply(send_target, text, keyboard)
     else:
         await send_target.reply_text(text, reply_markup=keyboard, parse_mode=ParseMode.HTML)
     return True
@@ -346,52 +510,73 @@ async def _send_rfi_quiz_message(send_target, user_id: int, fmt_arg: str, pos_ar
         position=pos_arg,
         recent=_get_recent_set(user_id, pos_arg or ""),
     )
-    pending_quizzes[user_id] = question
-    text, keyboard = _build_quiz_message(question)
-    if hasattr(send_target, "edit_message_text"):
-        await send_target.edit_message_text(text, reply_markup=keyboard, parse_mode=ParseMode.HTML)
+    is_query = hasattr(send_target, "edit_message_text")
+    chat_id = send_target.message.chat_id if is_query else send_target.chat_id
+    text, keyboard = _build_quiz_message(question, chat_id, user_id, _issue_seq(user_id))
+    if is_query:
+        await edit_or_reply(send_target, text, keyboard)
     else:
         await send_target.reply_text(text, reply_markup=keyboard, parse_mode=ParseMode.HTML)
 
 
+def _parse_quiz_args(args) -> tuple:
+    """(fmt_arg, pos_arg, forced_scenario_id, force_scenario_mode) from /quiz args.
+
+      /quiz utg | /quiz 100bb utg            → RFI route
+      /quiz scenario | /quiz story           → force narrative scenario route
+      /quiz <scenario_id>                    → force a specific scenario (e.g. /quiz sb_vs_limp)
+    """
+    pos_arg = None
+    fmt_arg = None
+    forced_scenario_id = None
+    force_scenario_mode = False
+    for arg in args or ():
+        a_upper = arg.upper()
+        if a_upper in OPEN_RANGE_POSITIONS:
+            pos_arg = a_upper
+            continue
+        fmt_match = next((f for f in open_range_quiz.FORMATS if f.upper() == a_upper), None)
+        if fmt_match:
+            fmt_arg = fmt_match
+            continue
+        if arg.lower() in {"scenario", "story", "narrative", "rfi"}:
+            if arg.lower() == "rfi":
+                force_scenario_mode = False
+                pos_arg = pos_arg or None
+            else:
+                force_scenario_mode = True
+            continue
+        if arg in quiz_manager.scenarios:
+            forced_scenario_id = arg
+            continue
+    return fmt_arg, pos_arg, forced_scenario_id, force_scenario_mode
+
+
+def _rfi_slot(fmt_arg: str, pos_arg: str) -> tuple[str, str]:
+    """Fill in a random verified format/position for whatever the user left out."""
+    if not fmt_arg and not pos_arg:
+        return random.choice(VERIFIED_SLOTS)
+    if fmt_arg and not pos_arg:
+        candidates = [p for f, p in VERIFIED_SLOTS if f == fmt_arg]
+        return fmt_arg, random.choice(candidates) if candidates else None
+    return fmt_arg, pos_arg
+
+
+@HANDLER_SECONDS.labels("quiz_command").time()
+@tracing.traced("handler.quiz_command")
 async def quiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     username = update.effective_user.username or update.effective_user.first_name or str(user_id)
     chat_id = update.effective_chat.id
 
-    active_chats.add(chat_id)
-    save_state(active_chats, subscribed_chats)
+    state_store.add_active(chat_id)
+    fmt_arg, pos_arg, forced_scenario_id, force_scenario_mode = _parse_quiz_args(context.args)
+    if update.effective_chat.type in GROUP_CHAT_TYPES:
+        await _open_group_round(update, context, fmt_arg, pos_arg,
+                                forced_scenario_id, force_scenario_mode)
+        return
     bankroll_manager.get_or_create_user(user_id, username)
 
-    # Parse optional args:
-    #   /quiz utg | /quiz 100bb utg            → RFI route
-    #   /quiz scenario | /quiz story           → force narrative scenario route
-    #   /quiz <scenario_id>                    → force a specific scenario (e.g. /quiz sb_vs_limp)
-    pos_arg = None
-    fmt_arg = None
-    forced_scenario_id = None
-    force_scenario_mode = False
-    if context.args:
-        for arg in context.args:
-            a_upper = arg.upper()
-            if a_upper in OPEN_RANGE_POSITIONS:
-                pos_arg = a_upper
-                continue
-            fmt_match = next((f for f in open_range_quiz.FORMATS if f.upper() == a_upper), None)
-            if fmt_match:
-                fmt_arg = fmt_match
-                continue
-            if arg.lower() in {"scenario", "story", "narrative", "rfi"}:
-                if arg.lower() == "rfi":
-                    force_scenario_mode = False
-                    pos_arg = pos_arg or None
-                else:
-                    force_scenario_mode = True
-                continue
-            if arg in quiz_manager.scenarios:
-                forced_scenario_id = arg
-                continue
-
     # Route: explicit scenario id > forced scenario mode > 50/50 random > RFI
     if forced_scenario_id and forced_scenario_id in SCENARIO_POOL:
         if await _send_scenario_quiz_message(update.message, user_id, forced_scenario_id):
@@ -404,59 +589,73 @@ async def quiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
     # RFI fallback
-    if not fmt_arg and not pos_arg:
-        fmt_arg, pos_arg = random.choice(VERIFIED_SLOTS)
-    elif fmt_arg and not pos_arg:
-        candidates = [p for f, p in VERIFIED_SLOTS if f == fmt_arg]
-        pos_arg = random.choice(candidates) if candidates else None
-
+    fmt_arg, pos_arg = _rfi_slot(fmt_arg, pos_arg)
     await _send_rfi_quiz_message(update.message, user_id, fmt_arg, pos_arg)
 
 
-async def handle_open_range_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def handle_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Score an answer button. Callback data is a signed question token (q:...)."""
     query = update.callback_query
-    user_id = query.from_user.id
-    username = query.from_user.username or query.from_user.first_name or str(user_id)
-
-    # Parse: rfi:{fmt}:{pos}:{hand}:{O|P|C|F}
-    parts = query.data.split(":")
-    if len(parts) != 5:
+    try:
+        if query.message is None:
+            raise InvalidToken("message no longer accessible")
+        in_group = query.message.chat.type in GROUP_CHAT_TYPES
+        # A private question only counts for the user it was sent to
+        recipient = ANY_USER if in_group else query.from_user.id
+        token = token_signer.verify(query.message.chat_id, recipient, query.data)
+    except InvalidToken:
         await query.answer("Invalid data.", show_alert=True)
         return
 
-    _, fmt, pos, hand, action_code = parts
-    chosen = {"O": "Open", "P": "Push", "C": "Call", "F": "Fold"}.get(action_code, "Fold")
-
-    question = pending_quizzes.get(user_id)
-    if (not isinstance(question, OpenRangeQuestion)
-            or question.position != pos or question.hand != hand):
+    if in_group:
+        await _vote_group_round(query, context, token)
+        return
+    question = _question_from_token(token)
+    if question is None:
         await query.answer("Quiz expired — use /quiz for a new one.", show_alert=True)
         return
+    if isinstance(question, OpenRangeQuestion):
+        await _answer_open_range(query, context, question, token)
+    else:
+        await _answer_scenario(query, context, question, token)
 
-    correct = question.correct_action
-    is_mixed = hand in question.mixed_hands
-    was_correct = chosen == correct or is_mixed
 
-    # Bankroll scoring (random 1-5bb, mixed 0.5-2.5bb)
-    prev_br = bankroll_manager.get_or_create_user(user_id, username)["bankroll"]
+async def handle_expired_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Buttons from before signed tokens (rfi:/sc:) can no longer be scored."""
+    await update.callback_query.answer("Quiz expired — use /quiz for a new one.", show_alert=True)
 
-    if is_mixed:
-        bb_change = round(random.uniform(BB_MIXED_MIN, BB_MIXED_MAX), 1)
-    elif was_correct:
-        bb_change = round(random.uniform(BB_MIN, BB_MAX), 1)
-    else:
-        bb_change = -round(random.uniform(BB_MIN, BB_MAX), 1)
 
+@HANDLER_SECONDS.labels("handle_open_range_answer").time()
+@tracing.traced("handler.handle_open_range_answer")
+async def _answer_open_range(query, context: ContextTypes.DEFAULT_TYPE,
+                             question: OpenRangeQuestion, token: QuestionToken):
+    user_id = query.from_user.id
+    username = query.from_user.username or query.from_user.first_name or str(user_id)
+
+    grade = _grade(question, token.action)
+    if grade is None:
+        await query.answer("Invalid action.", show_alert=True)
+        return
+    fmt, pos, hand = question.format_key, question.position, question.hand
+    chosen, correct = grade.chosen, grade.best
+    is_mixed, was_correct = grade.is_mixed, grade.was_correct
+    bb_change = _bb_change(grade)
+
+    answer_key = _answer_key(query.message.chat_id, token.seq, user_id)
     br = bankroll_manager.record_answer(
         user_id=user_id, username=username,
-        scenario_id=f"{fmt}:{pos}", hand=hand,
+        scenario_id=grade.scenario_id, hand=hand,
         chosen_action=chosen, chosen_ev_normalized=bb_change,
         best_action=correct, ev_vs_best=0.0 if was_correct else bb_change,
-        was_correct=was_correct,
+        was_correct=was_correct, seq=token.seq, answer_key=answer_key,
     )
+    if br is None:
+        await query.answer(_not_scored_text(answer_key), show_alert=True)
+        return
+    # Derived from the atomic update — another worker may have written in between
+    prev_br = br["bankroll"] - bb_change
 
     _record_recent(user_id, pos, hand)
-    pending_quizzes.pop(user_id, None)
 
     accuracy = br["correct_count"] / br["total_questions"] * 100 if br["total_questions"] else 0
 
@@ -507,11 +706,15 @@ async def handle_open_range_answer(update: Update, context: ContextTypes.DEFAULT
         f"{pct_line}{mixed_line}"
     )
 
-    await query.answer("✅ Correct!" if was_correct else "❌ Wrong")
-    await query.edit_message_text(result_text, parse_mode=ParseMode.HTML)
+    # Next + Fix buttons
+    keyboard = InlineKeyboardMarkup([[
+        InlineKeyboardButton("➡️ Next", callback_data=f"next:{fmt}:{pos}"),
+        InlineKeyboardButton("Fix", callback_data=f"fix:{fmt}:{pos}:{hand}"),
+    ]])
 
-    # Send range chart + PDF crop side-by-side
+    # Range chart + PDF crop side-by-side
     try:
+        from chart import generate_open_range_chart, combine_with_crop
         has_allin = bool(question.allin_hands)
         chart_title = f"{pos} {'Push/Fold' if has_allin else 'Open Raise'} ({meta['game']} {meta['stack']})"
         chart_bytes = generate_open_range_chart(
@@ -524,92 +727,60 @@ async def handle_open_range_answer(update: Update, context: ContextTypes.DEFAULT
         )
         crop_path = str(CROPS_DIR / f"{fmt}_rfi_{pos}.png")
         combined = combine_with_crop(chart_bytes, crop_path)
-        await context.bot.send_photo(
-            chat_id=query.message.chat_id,
-            photo=BytesIO(combined),
-            caption=(
-                f"{icon} {pos} — {hand}  {bb_sign}{bb_change:.1f}bb\n"
-                f"Bankroll: {prev_br:.1f} → {bankroll:.1f}bb  {rank_txt}{streak_txt}\n"
-                f"Total: {br['correct_count']}/{br['total_questions']} ({accuracy:.0f}%)"
-            ),
-        )
     except Exception as e:
-        logger.warning(f"Failed to send range chart: {e}")
-
-    # Next + Fix buttons
-    keyboard = [[
-        InlineKeyboardButton("➡️ Next", callback_data=f"next:{fmt}:{pos}"),
-        InlineKeyboardButton("Fix", callback_data=f"fix:{fmt}:{pos}:{hand}"),
-    ]]
-    await context.bot.send_message(
-        chat_id=query.message.chat_id,
-        text="Ready?",
-        reply_markup=InlineKeyboardMarkup(keyboard),
+        logger.warning(f"Failed to render range chart: {e}")
+        combined = None
+
+    # Toast, result edit and chart (carrying the keyboard) go out together
+    await send_answer_response(
+        query, context.bot,
+        toast="✅ Correct!" if was_correct else "❌ Wrong",
+        text=result_text,
+        keyboard=keyboard,
+        photo=combined,
+        caption=(
+            f"{icon} {pos} — {hand}  {bb_sign}{bb_change:.1f}bb\n"
+            f"Bankroll: {prev_br:.1f} → {bankroll:.1f}bb  {rank_txt}{streak_txt}\n"
+            f"Total: {br['correct_count']}/{br['total_questions']} ({accuracy:.0f}%)"
+        ),
     )
 
 
-async def handle_scenario_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle answer for narrative scenario quizzes. Callback: sc:{scenario_id}:{hand}:{action_index}"""
-    query = update.callback_query
+@HANDLER_SECONDS.labels("handle_scenario_answer").time()
+@tracing.traced("handler.handle_scenario_answer")
+async def _answer_scenario(query, context: ContextTypes.DEFAULT_TYPE,
+                           question: QuizQuestion, token: QuestionToken):
+    """Score a narrative scenario answer (token action = index into scenario actions)."""
     user_id = query.from_user.id
     username = query.from_user.username or query.from_user.first_name or str(user_id)
-
-    parts = query.data.split(":", 3)
-    if len(parts) != 4:
-        await query.answer("Invalid data.", show_alert=True)
-        return
-    _, scenario_id, hand, idx_str = parts
-    try:
-        action_idx = int(idx_str)
-    except ValueError:
-        await query.answer("Invalid action.", show_alert=True)
-        return
-
-    question = pending_quizzes.get(user_id)
-    if (not isinstance(question, QuizQuestion)
-            or question.scenario.id != scenario_id
-            or question.hand != hand):
-        await query.answer("Quiz expired — use /quiz for a new one.", show_alert=True)
-        return
+    hand = question.hand
 
     sc = question.scenario
-    if not (0 <= action_idx < len(sc.actions)):
+    grade = _grade(question, token.action)
+    if grade is None:
         await query.answer("Invalid action index.", show_alert=True)
         return
-    chosen_label = sc.actions[action_idx]
-
+    chosen_label = grade.chosen
     strategy = question.strategy or {}
-    chosen_freq = strategy.get(chosen_label, 0.0)
-
-    if chosen_freq >= 0.99:
-        was_correct = True
-        is_mixed = False
-    elif chosen_freq > 0.0:
-        was_correct = True
-        is_mixed = True
-    else:
-        was_correct = False
-        is_mixed = False
-
-    prev_br = bankroll_manager.get_or_create_user(user_id, username)["bankroll"]
-    if is_mixed:
-        bb_change = round(random.uniform(BB_MIXED_MIN, BB_MIXED_MAX), 1)
-    elif was_correct:
-        bb_change = round(random.uniform(BB_MIN, BB_MAX), 1)
-    else:
-        bb_change = -round(random.uniform(BB_MIN, BB_MAX), 1)
+    was_correct, is_mixed = grade.was_correct, grade.is_mixed
+    bb_change = _bb_change(grade)
 
+    answer_key = _answer_key(query.message.chat_id, token.seq, user_id)
     br = bankroll_manager.record_answer(
         user_id=user_id, username=username,
         scenario_id=sc.id, hand=hand,
         chosen_action=chosen_label, chosen_ev_normalized=bb_change,
         best_action=question.best_action,
         ev_vs_best=0.0 if was_correct else bb_change,
-        was_correct=was_correct,
+        was_correct=was_correct, seq=token.seq, answer_key=answer_key,
     )
+    if br is None:
+        await query.answer(_not_scored_text(answer_key), show_alert=True)
+        return
+    # Derived from the atomic update — another worker may have written in between
+    prev_br = br["bankroll"] - bb_change
 
     _record_recent_scenario(user_id, sc.id, hand)
-    pending_quizzes.pop(user_id, None)
 
     accuracy = br["correct_count"] / br["total_questions"] * 100 if br["total_questions"] else 0
     icon = "🔀" if is_mixed else ("✅" if was_correct else "❌")
@@ -653,18 +824,174 @@ async def handle_scenario_answer(update: Update, context: ContextTypes.DEFAULT_T
     ]
     result_text = "\n".join(parts_out)
 
-    await query.answer("✅ 정답" if was_correct else ("🔀 Mixed" if is_mixed else "❌ 오답"))
-    await query.edit_message_text(result_text, parse_mode=ParseMode.HTML)
+    # Next button (no fmt/pos hint → 50/50 routing on next call), on the result itself
+    keyboard = InlineKeyboardMarkup([[InlineKeyboardButton("➡️ Next", callback_data="next:")]])
+    await send_answer_response(
+        query, context.bot,
+        toast="✅ 정답" if was_correct else ("🔀 Mixed" if is_mixed else "❌ 오답"),
+        text=result_text,
+        keyboard=keyboard,
+    )
+
 
-    # Next button (no fmt/pos hint → 50/50 routing on next call)
-    keyboard = [[InlineKeyboardButton("➡️ Next", callback_data="next:")]]
-    await context.bot.send_message(
-        chat_id=query.message.chat_id,
-        text="Ready?",
-        reply_markup=InlineKeyboardMarkup(keyboard),
+def _pick_group_question(fmt_arg, pos_arg, forced_scenario_id, force_scenario_mode):
+    """Same routing as /quiz, without per-user recent-hand weighting."""
+    scenario_id = None
+    if forced_scenario_id and forced_scenario_id in SCENARIO_POOL:
+        scenario_id = forced_scenario_id
+    elif SCENARIO_POOL and (force_scenario_mode or (
+            pos_arg is None and fmt_arg is None and random.random() < SCENARIO_RATIO)):
+        scenario_id = random.choice(SCENARIO_POOL)
+    if scenario_id is not None:
+        question = quiz_manager.generate_question(recent_history=[], scenario_id=scenario_id)
+        if question is not None:
+            return question
+    fmt_arg, pos_arg = _rfi_slot(fmt_arg, pos_arg)
+    return open_range_quiz.generate_question(format_key=fmt_arg, position=pos_arg, recent=set())
+
+
+def _group_round_footer(round_: GroupRound) -> str:
+    left = max(0, round(round_.deadline - time.time()))
+    tally = " · ".join(
+        f"{escape_html(label)} {round_.tallies[action]}"
+        for action, label in round_.labels.items()
+    )
+    return (f"👥 <b>{len(round_.votes)}</b> answered · closes in {left}s\n"
+            f"<code>{tally}</code>")
+
+
+def _group_result_text(round_: GroupRound, grades: dict[int, Grade],
+                       changes: dict[int, float], scored: bool = True) -> str:
+    total = len(round_.votes)
+    lines = []
+    for action, label in round_.labels.items():
+        mark = "  🔀" if grades[action].is_mixed else ("  ✅" if grades[action].was_correct else "")
+        count = round_.tallies[action]
+        pct = count / total * 100 if total else 0
+        lines.append(f"{escape_html(label)} — {count} ({pct:.0f}%){mark}")
+    right = sum(1 for _, action in round_.votes.values() if grades[action].was_correct)
+    winners = sorted((uid for uid, bb in changes.items() if bb > 0),
+                     key=changes.get, reverse=True)[:5]
+    top_line = ", ".join(
+        f"{escape_html(round_.votes[uid][0])} +{changes[uid]:.1f}bb" for uid in winners
+    )
+    parts = [
+        round_.text.rstrip(),
+        "",
+        f"🏁 <b>Closed</b> — {total} answered, {right} right",
+        *lines,
+    ]
+    if top_line:
+        parts.append(f"Top: {top_line}")
+    if not scored:
+        parts.append("⚠️ Scores could not be saved this round")
+    parts.append("/quiz for the next round")
+    return "\n".join(parts)
+
+
+async def _edit_group_message(bot, round_: GroupRound, text: str, keyboard):
+    await bot.edit_message_text(
+        chat_id=round_.chat_id, message_id=round_.message_id, text=text,
+        reply_markup=keyboard, parse_mode=ParseMode.HTML,
     )
 
 
+async def _edit_group_tally(bot, round_: GroupRound):
+    if round_.closed:
+        return
+    await _edit_group_message(
+        bot, round_, f"{round_.text}\n\n{_group_round_footer(round_)}", round_.keyboard)
+
+
+async def _open_group_round(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                            fmt_arg, pos_arg, forced_scenario_id, force_scenario_mode):
+    """One question for the whole group; votes are scored when the window closes."""
+    chat_id = update.effective_chat.id
+    if chat_id in group_rounds:
+        left = max(0, round(group_rounds[chat_id].deadline - time.time()))
+        await update.message.reply_text(f"A group quiz is still open ({left}s left) — answer that one first.")
+        return
+    question = _pick_group_question(fmt_arg, pos_arg, forced_scenario_id, force_scenario_mode)
+    seq = int(time.time() * 1000)
+    if isinstance(question, OpenRangeQuestion):
+        text, keyboard = _build_quiz_message(question, chat_id, ANY_USER, seq)
+    else:
+        text, keyboard = _build_scenario_message(question, chat_id, ANY_USER, seq)
+    labels = {
+        token_signer.verify(chat_id, ANY_USER, button.callback_data).action: button.text
+        for row in keyboard.inline_keyboard for button in row
+    }
+    round_ = GroupRound(chat_id, seq, question, text, keyboard, labels,
+                        deadline=time.time() + GROUP_QUIZ_WINDOW_SEC)
+    group_rounds[chat_id] = round_
+    try:
+        message = await update.message.reply_text(
+            f"{text}\n\n{_group_round_footer(round_)}",
+            reply_markup=keyboard, parse_mode=ParseMode.HTML,
+        )
+    except Exception:
+        del group_rounds[chat_id]
+        raise
+    round_.message_id = message.message_id
+    context.application.create_task(_close_group_round(context.bot, round_))
+
+
+@HANDLER_SECONDS.labels("handle_group_vote").time()
+@tracing.traced("handler.handle_group_vote")
+async def _vote_group_round(query, context: ContextTypes.DEFAULT_TYPE, token: QuestionToken):
+    """A group member's tap: tallied now, scored when the round closes."""
+    round_ = group_rounds.get(query.message.chat_id)
+    if round_ is None or round_.seq != token.seq or round_.message_id != query.message.message_id:
+        await query.answer("This round is closed — /quiz for a new one.", show_alert=True)
+        return
+    user = query.from_user
+    username = user.username or user.first_name or str(user.id)
+    if not round_.vote(user.id, username, token.action):
+        await query.answer("You already answered this one.")
+        return
+    left = max(0, round(round_.deadline - time.time()))
+    await query.answer(f"🗳 {round_.labels[token.action]} — results in {left}s")
+    group_editor.request(round_.chat_id, partial(_edit_group_tally, context.bot, round_))
+
+
+async def _close_group_round(bot, round_: GroupRound):
+    await asyncio.sleep(max(0.0, round_.deadline - time.time()))
+    round_.closed = True
+    if group_rounds.get(round_.chat_id) is round_:
+        del group_rounds[round_.chat_id]
+
+    question = round_.question
+    grades = {action: _grade(question, action) for action in round_.labels}
+    answers = []
+    for user_id, (username, action) in round_.votes.items():
+        grade = grades[action]
+        bb_change = _bb_change(grade)
+        answers.append({
+            "user_id": user_id, "username": username,
+            "scenario_id": grade.scenario_id, "hand": question.hand,
+            "chosen_action": grade.chosen, "chosen_ev_normalized": bb_change,
+            "best_action": grade.best, "ev_vs_best": 0.0 if grade.was_correct else bb_change,
+            "was_correct": grade.was_correct,
+            "answer_key": _answer_key(round_.chat_id, round_.seq, user_id),
+        })
+    # Every answerer in one transaction
+    try:
+        results = bankroll_manager.record_answers(answers) if answers else {}
+        scored = True
+    except Exception:
+        # Still close the round below, or its buttons stay live on a dead round
+        logger.exception(f"Scoring group round in {round_.chat_id} failed "
+                         f"({len(answers)} answers lost)")
+        results, scored = {}, False
+    changes = {a["user_id"]: a["chosen_ev_normalized"] for a in answers if a["user_id"] in results}
+    text = _group_result_text(round_, grades, changes, scored)
+    # Queued behind any pending tally edit, so the result is never overwritten
+    group_editor.request(round_.chat_id, partial(_edit_group_message, bot, round_, text, None))
+    logger.info(f"Group round in {round_.chat_id} closed: {len(answers)} answers")
+
+
+@HANDLER_SECONDS.labels("handle_next_quiz").time()
+@tracing.traced("handler.handle_next_quiz")
 async def handle_next_quiz(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -713,10 +1040,9 @@ async def handle_fix_prompt(update: Update, context: ContextTypes.DEFAULT_TYPE):
         InlineKeyboardButton("Fold",  callback_data=f"fixdo:{fmt}:{pos}:{hand}:F"),
         InlineKeyboardButton("Mixed", callback_data=f"fixdo:{fmt}:{pos}:{hand}:M"),
     ]])
-    await query.edit_message_text(
-        f"<b>Fix {pos} — {escape_html(hand)}</b>\n\nCorrect action?",
-        reply_markup=keyboard,
-        parse_mode=ParseMode.HTML,
+    await edit_or_reply(
+        query, f"<b>Fix {pos} — {escape_html(hand)}</b>\n\nCorrect action?",
+        keyboard, on_photo="caption",
     )
 
 
@@ -736,7 +1062,7 @@ async def handle_fix_apply(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # Determine current action from in-memory ranges
-    range_data = open_range_quiz.ranges.get(fmt, {}).get(pos, {})
+    range_data = open_range_quiz.range_data(fmt, pos) or {}
     if hand in range_data.get("raise", frozenset()):
         old_action = "raise"
     elif hand in range_data.get("call", frozenset()):
@@ -748,62 +1074,55 @@ async def handle_fix_apply(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.answer(f"Already {new_action}.", show_alert=True)
         return
 
-    # Update corrections.json
-    corr_path = DATA_DIR / "corrections.json"
-    if corr_path.exists():
-        with open(corr_path, encoding="utf-8") as f:
-            corrections = json.load(f)
-    else:
-        corrections = {}
-
-    if fmt not in corrections:
-        corrections[fmt] = {}
-    if pos not in corrections[fmt]:
-        corrections[fmt][pos] = {}
-    c = corrections[fmt][pos]
-
-    if new_action == "mixed":
-        c.setdefault("mixed", [])
-        if hand not in c["mixed"]:
-            c["mixed"].append(hand)
-    else:
-        # Remove from mixed if present
-        if "mixed" in c and hand in c["mixed"]:
-            c["mixed"].remove(hand)
-
-        if old_action == "raise":
-            c.setdefault("raise_remove", [])
-            if hand not in c["raise_remove"]:
-                c["raise_remove"].append(hand)
-            if "raise_add" in c and hand in c["raise_add"]:
-                c["raise_add"].remove(hand)
-        elif new_action == "raise":
-            c.setdefault("raise_add", [])
-            if hand not in c["raise_add"]:
-                c["raise_add"].append(hand)
-            if "raise_remove" in c and hand in c["raise_remove"]:
-                c["raise_remove"].remove(hand)
-
-        if old_action == "call":
-            c.setdefault("call_remove", [])
-            if hand not in c["call_remove"]:
-                c["call_remove"].append(hand)
-        elif new_action == "call":
-            c.setdefault("call_add", [])
-            if hand not in c["call_add"]:
-                c["call_add"].append(hand)
-
-    # Clean up empty lists
-    for key in list(c.keys()):
-        if isinstance(c[key], list) and not c[key]:
-            del c[key]
-    if not corrections[fmt][pos]:
-        del corrections[fmt][pos]
-    if not corrections[fmt]:
-        del corrections[fmt]
-
-    with open(corr_path, "w", encoding="utf-8") as f:
-        json.dump(corrections, f, indent=2)
+    # Update corrections.json (shared by every worker)
+    def edit(corrections: dict):
+        if fmt not in corrections:
+            corrections[fmt] = {}
+        if pos not in corrections[fmt]:
+            corrections[fmt][pos] = {}
+        c = corrections[fmt][pos]
+
+        if new_action == "mixed":
+            c.setdefault("mixed", [])
+            if hand not in c["mixed"]:
+                c["mixed"].append(hand)
+        else:
+            # Remove from mixed if present
+            if "mixed" in c and hand in c["mixed"]:
+                c["mixed"].remove(hand)
+
+            if old_action == "raise":
+                c.setdefault("raise_remove", [])
+                if hand not in c["raise_remove"]:
+                    c["raise_remove"].append(hand)
+                if "raise_add" in c and hand in c["raise_add"]:
+                    c["raise_add"].remove(hand)
+            elif new_action == "raise":
+                c.setdefault("raise_add", [])
+                if hand not in c["raise_add"]:
+                    c["raise_add"].append(hand)
+                if "raise_remove" in c and hand in c["raise_remove"]:
+                    c["raise_remove"].remove(hand)
+
+            if old_action == "call":
+                c.setdefault("call_remove", [])
+                if hand not in c["call_remove"]:
+                    c["call_remove"].append(hand)
+            elif new_action == "call":
+                c.setdefault("call_add", [])
+                if hand not in c["call_add"]:
+                    c["call_add"].append(hand)
+
+        # Clean up empty lists
+        for key in list(c.keys()):
+            if isinstance(c[key], list) and not c[key]:
+                del c[key]
+        if not corrections[fmt][pos]:
+            del corrections[fmt][pos]
+        if not corrections[fmt]:
+            del corrections[fmt]
+
+    update_corrections(edit)
 
     # Update in-memory ranges
     raise_h = set(range_data.get("raise", frozenset()))
@@ -823,21 +1142,42 @@ async def handle_fix_apply(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if new_action == "call":
             call_h.add(hand)
 
-    open_range_quiz.ranges[fmt][pos] = {
+    open_range_quiz.set_range(fmt, pos, {
         "raise": frozenset(raise_h),
         "call": frozenset(call_h),
         "mixed": frozenset(mixed_h),
-    }
+    })
 
     await query.answer(f"Fixed: {hand} → {new_action}")
-    await query.edit_message_text(
-        f"Fixed <b>{pos} {escape_html(hand)}</b>: {old_action} → {new_action}",
-        parse_mode=ParseMode.HTML,
+    await edit_or_reply(
+        query, f"Fixed <b>{pos} {escape_html(hand)}</b>: {old_action} → {new_action}",
+        on_photo="caption",
     )
 
 
+def _fmt_local(ts: float, utc_offset_min: int) -> str:
+    return time.strftime("%H:%M", time.gmtime(ts + utc_offset_min * 60))
+
+
+def _fmt_offset(utc_offset_min: int) -> str:
+    sign = "+" if utc_offset_min >= 0 else "-"
+    h, m = divmod(abs(utc_offset_min), 60)
+    return f"UTC{sign}{h}" + (f":{m:02d}" if m else "")
+
+
+def _parse_offset(arg: str) -> int | None:
+    """'+9', '-5', '+5:30' → minutes east of UTC."""
+    try:
+        sign = -1 if arg.startswith("-") else 1
+        h, _, m = arg.lstrip("+-").partition(":")
+        minutes = sign * (int(h) * 60 + (int(m) if m else 0))
+    except ValueError:
+        return None
+    return minutes if -14 * 60 <= minutes <= 14 * 60 else None
+
+
 async def subscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Opt in to hourly auto-quiz delivery (private chats only)."""
+    """Opt in to auto-quiz delivery (private chats only); /subscribe <minutes> sets the interval."""
     chat = update.effective_chat
     if chat.type != "private":
         await update.message.reply_text(
@@ -845,18 +1185,26 @@ async def subscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
+    interval_sec = None
+    if context.args:
+        try:
+            interval_sec = int(context.args[0]) * 60
+        except ValueError:
+            await update.message.reply_text("사용법: /subscribe [분]  예) /subscribe 30")
+            return
+
     user_id = update.effective_user.id
     username = update.effective_user.username or update.effective_user.first_name or str(user_id)
     chat_id = chat.id
 
-    active_chats.add(chat_id)
-    subscribed_chats.add(chat_id)
-    save_state(active_chats, subscribed_chats)
+    state_store.subscribe(chat_id)
+    schedule = broadcast_planner.subscribe(chat_id, time.time(), interval_sec)
     bankroll_manager.get_or_create_user(user_id, username)
 
-    interval_min = BROADCAST_INTERVAL_SEC // 60
+    interval_min = schedule.interval_sec // 60
     await update.message.reply_text(
         f"✅ 구독 완료! {interval_min}분마다 한 문제씩 보내줄게.\n"
+        f"주기 변경: /subscribe <분>, 방해 금지 시간: /quiet 23-8\n"
         f"중단하려면 /unsubscribe."
     )
 
@@ -864,77 +1212,204 @@ async def subscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def unsubscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     if chat_id in subscribed_chats:
-        subscribed_chats.discard(chat_id)
-        save_state(active_chats, subscribed_chats)
+        state_store.unsubscribe(chat_id)
+        broadcast_planner.unsubscribe(chat_id)
         await update.message.reply_text("⏹️ 구독 해제. 더 이상 자동 발송 안 함.")
     else:
         await update.message.reply_text("이미 구독 중이 아니야. /subscribe 로 시작 가능.")
 
 
+async def quiet_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/quiet 23-8 [+9] sets local quiet hours; /quiet off clears them."""
+    chat_id = update.effective_chat.id
+    args = context.args or []
+    usage = "사용법: /quiet 23-8 [+9]  (시작-끝 시각, UTC 오프셋) · 해제: /quiet off"
+    if not args:
+        await update.message.reply_text(usage)
+        return
+
+    now = time.time()
+    if args[0].lower() == "off":
+        old = state_store.schedules.get(chat_id)
+        offset = old.utc_offset_min if old else DEFAULT_UTC_OFFSET_MIN
+        broadcast_planner.set_quiet(chat_id, now, None, None, offset)
+        await update.message.reply_text("🔔 방해 금지 시간 해제.")
+        return
+
+    try:
+        start_h, end_h = (int(x) for x in args[0].split("-"))
+    except ValueError:
+        start_h = end_h = -1
+    offset = _parse_offset(args[1]) if len(args) > 1 else DEFAULT_UTC_OFFSET_MIN
+    if not (0 <= start_h < 24 and 0 <= end_h < 24) or offset is None:
+        await update.message.reply_text(usage)
+        return
+
+    broadcast_planner.set_quiet(chat_id, now, start_h, end_h, offset)
+    await update.message.reply_text(
+        f"🌙 방해 금지: {start_h:02d}:00–{end_h:02d}:00 ({_fmt_offset(offset)}). "
+        f"이 시간엔 자동 발송 안 함."
+    )
+
+
 async def sub_status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
-    interval_min = BROADCAST_INTERVAL_SEC // 60
-    if chat_id in subscribed_chats:
-        await update.message.reply_text(
-            f"🔔 구독 중 — {interval_min}분마다 자동 발송.\n해제: /unsubscribe"
-        )
+    schedule = state_store.schedules.get(chat_id)
+    interval_min = (schedule.interval_sec if schedule else BROADCAST_INTERVAL_SEC) // 60
+    if chat_id in subscribed_chats and schedule:
+        lines = [f"🔔 구독 중 — {interval_min}분마다 자동 발송."]
+        next_due = broadcast_planner.next_due(chat_id)
+        if next_due:
+            lines.append(f"다음 문제: {_fmt_local(next_due, schedule.utc_offset_min)} "
+                         f"({_fmt_offset(schedule.utc_offset_min)})")
+        if schedule.quiet_start is not None:
+            lines.append(f"방해 금지: {schedule.quiet_start:02d}:00–{schedule.quiet_end:02d}:00")
+        lines.append("해제: /unsubscribe")
+        await update.message.reply_text("\n".join(lines))
     else:
         await update.message.reply_text(
             f"🔕 미구독. /subscribe 로 {interval_min}분마다 한 문제씩 자동 받기."
         )
 
 
-async def broadcast_quiz_job(context: ContextTypes.DEFAULT_TYPE):
-    """Send a narrative scenario quiz to every subscribed private chat."""
-    if not subscribed_chats:
+# Sampling profiler session started by /profile or SIGUSR2 (one at a time)
+profile_task: Optional[asyncio.Task] = None
+
+
+def _profile_running() -> bool:
+    return profile_task is not None and not profile_task.done()
+
+
+def _start_profile(application, seconds: float, chat_id: Optional[int] = None, update=None):
+    """Profile in the background; the report goes to `chat_id` (if any) and the log."""
+    async def session():
+        result = await profiler.profile(seconds, PROFILE_DIR)
+        if result is None:
+            return
+        logger.info(f"Profile written to {result.collapsed_path} and {result.summary_path}")
+        if chat_id is None:
+            return
+        own, _ = result.profiler.top_functions(8)
+        busy = result.profiler.busy or 1
+        lines = [f"📈 Profile: {result.profiler.busy} busy samples / {seconds:g}s, top functions (self):",
+                 *(f"{count / busy * 100:5.1f}% {label}" for label, count in own),
+                 f"\n{result.summary_path}", f"{result.collapsed_path}"]
+        await application.bot.send_message(chat_id, "\n".join(lines))
+
+    global profile_task
+    # Not awaited by the caller: a user's later updates would queue behind the window
+    profile_task = application.create_task(session(), update=update)
+
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/profile [seconds] — admins only; everyone else gets no reply."""
+    if update.effective_user is None or update.effective_user.id not in ADMIN_USER_IDS:
         return
-    targets = list(subscribed_chats)
-    logger.info(f"Auto-broadcast quiz to {len(targets)} subscriber(s)")
+    try:
+        seconds = min(PROFILE_MAX_SEC, max(1, int(context.args[0]))) if context.args else PROFILE_SIGNAL_SEC
+    except ValueError:
+        await update.message.reply_text("Usage: /profile [seconds]")
+        return
+    if _profile_running():
+        await update.message.reply_text("A profile is already running.")
+        return
+    _start_profile(context.application, seconds, update.effective_chat.id, update)
+    await update.message.reply_text(f"📈 Profiling for {seconds:g}s…")
+
+
+def _profile_on_signal(application):
+    if _profile_running():
+        logger.warning("SIGUSR2: a profile is already running")
+        return
+    logger.info(f"SIGUSR2: profiling for {PROFILE_SIGNAL_SEC:g}s")
+    _start_profile(application, PROFILE_SIGNAL_SEC)
+
+
+def _broadcast_question(user_id: int, chat_id: int):
+    """Pick the next auto-broadcast question for a user and build its message."""
+    if SCENARIO_POOL and random.random() < SCENARIO_RATIO:
+        scenario_id = random.choice(SCENARIO_POOL)
+        question = quiz_manager.generate_question(
+            recent_history=_scenario_recent_history(user_id),
+            scenario_id=scenario_id,
+        )
+        if question is None:
+            return None
+        return _build_scenario_message(question, chat_id, user_id, _issue_seq(user_id))
+
+    fmt_arg, pos_arg = random.choice(VERIFIED_SLOTS)
+    question = open_range_quiz.generate_question(
+        format_key=fmt_arg, position=pos_arg,
+        recent=_get_recent_set(user_id, pos_arg or ""),
+    )
+    return _build_quiz_message(question, chat_id, user_id, _issue_seq(user_id))
 
-    failed: list[int] = []
-    for chat_id in targets:
-        try:
-            # In private chats, chat_id == user_id — pending_quizzes uses user_id
-            user_id = chat_id
-
-            # Skip if a quiz is already pending for this user (don't pile up)
-            if user_id in pending_quizzes:
-                continue
-
-            if SCENARIO_POOL and random.random() < SCENARIO_RATIO:
-                scenario_id = random.choice(SCENARIO_POOL)
-                question = quiz_manager.generate_question(
-                    recent_history=_scenario_recent_history(user_id),
-                    scenario_id=scenario_id,
-                )
-                if question is None:
-                    continue
-                pending_quizzes[user_id] = question
-                text, keyboard = _build_scenario_message(question)
-            else:
-                fmt_arg, pos_arg = random.choice(VERIFIED_SLOTS)
-                question = open_range_quiz.generate_question(
-                    format_key=fmt_arg, position=pos_arg,
-                    recent=_get_recent_set(user_id, pos_arg or ""),
-                )
-                pending_quizzes[user_id] = question
-                text, keyboard = _build_quiz_message(question)
-
-            await context.bot.send_message(
-                chat_id=chat_id, text=text,
-                reply_markup=keyboard, parse_mode=ParseMode.HTML,
-            )
-        except Exception as e:
-            logger.warning(f"Auto-broadcast failed for chat {chat_id}: {e}")
-            # Telegram blocks: 403 → user blocked the bot. Auto-unsubscribe.
-            if "Forbidden" in str(e) or "blocked" in str(e).lower():
-                failed.append(chat_id)
 
-    if failed:
-        for cid in failed:
-            subscribed_chats.discard(cid)
-        save_state(active_chats, subscribed_chats)
-        logger.info(f"Auto-unsubscribed blocked chats: {failed}")
+async def broadcast_tick_job(context: ContextTypes.DEFAULT_TYPE):
+    """Queue the subscribers due this tick and start a send run if none is going."""
+    _broadcast_backlog.extend(broadcast_planner.due(time.time()))
+    if _broadcast_backlog and not _broadcast_running:
+        context.application.create_task(broadcast_quiz_job(context), name="broadcast_quiz")
+
+
+@HANDLER_SECONDS.labels("broadcast_quiz_job").time()
+@tracing.traced("handler.broadcast_quiz_job")
+async def broadcast_quiz_job(context: ContextTypes.DEFAULT_TYPE):
+    """Send a quiz to every subscriber that is due, until none are left."""
+    global _broadcast_running
+    if _broadcast_running:
+        return
+    _broadcast_running = True
+    try:
+        _broadcast_backlog.extend(broadcast_planner.due(time.time()))
+
+        def jobs():
+            # Pulled lazily by the broadcaster; due chats queued meanwhile join the run
+            while _broadcast_backlog:
+                chunk = [_broadcast_backlog.popleft()
+                         for _ in range(min(len(_broadcast_backlog), 500))]
+                # In private chats, chat_id == user_id
+                answered = bankroll_manager.last_answered_seqs(chunk)
+                now = time.time()
+                for chat_id in chunk:
+                    user_id = chat_id
+                    if chat_id not in subscribed_chats:
+                        continue
+
+                    # Skip while the last question is unanswered and not yet
+                    # expired (don't pile up on an idle user, don't stop forever)
+                    state = user_states.get(user_id, now)
+                    if state.issued_seq > answered.get(user_id, 0) and user_states.open_until(state) > now:
+                        continue
+                    try:
+                        message = _broadcast_question(user_id, chat_id)
+                    except Exception as e:
+                        logger.warning(f"Auto-broadcast question failed for chat {chat_id}: {e}")
+                        continue
+                    if message is None:
+                        continue
+                    text, keyboard = message
+                    yield chat_id, partial(
+                        context.bot.send_message,
+                        chat_id=chat_id, text=text,
+                        reply_markup=keyboard, parse_mode=ParseMode.HTML,
+                        rate_limit_args=Priority.BROADCAST,
+                    )
+
+        report = await broadcaster.run(jobs())
+        # Ticks with nobody due stay quiet; a run with targets is reported
+        if report.targets:
+            logger.info(f"Auto-broadcast done: {report.summary()}")
+            logger.info(f"Outbound queues: {outbound.summary()}")
+
+        # Telegram blocks: 403 → user blocked the bot. Auto-unsubscribe in one batch.
+        if report.blocked:
+            for cid in report.blocked:
+                state_store.unsubscribe(cid)
+                broadcast_planner.unsubscribe(cid)
+            logger.info(f"Auto-unsubscribed blocked chats: {report.blocked}")
+    finally:
+        _broadcast_running = False
 
 
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -999,47 +1474,220 @@ async def ranking_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("\n".join(lines), parse_mode=ParseMode.HTML)
 
 
+async def flush_state_job(context: ContextTypes.DEFAULT_TYPE):
+    """Coalesced write-behind of dirty chat + user session state."""
+    user_states.sweep(time.time())
+    user_states.spill_dirty()
+    if state_store.dirty:
+        n = state_store.flush()
+        logger.debug(f"Flushed {n} state row(s)")
+
+
+async def reload_corrections_job(context: ContextTypes.DEFAULT_TYPE):
+    """Pick up Fixes saved by the other workers (or corrections.json edited by hand)."""
+    global open_range_quiz
+    if open_range_quiz.corrections_changed():
+        open_range_quiz = OpenRangeQuizManager(quiz_manager.ev_tables, lazy=True)
+        logger.info("corrections.json changed; open ranges reloaded")
+
+
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
     logger.error(f"Exception: {context.error}", exc_info=context.error)
 
 
+# GET /metrics (Prometheus text format), /healthz, /readyz and /debug/state
+# when METRICS_PORT is set
+metrics_server: Optional[HttpServer] = None
+lag_probe = LoopLagProbe(HEALTH_PROBE_INTERVAL_SEC)
+EVENT_LOOP_LAG.set_function(lambda: lag_probe.last)
+introspector = Introspector()
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    return Response(200, metrics.render().encode(), "text/plain; version=0.0.4; charset=utf-8")
+
+
+async def healthz_endpoint(request: Request) -> Response:
+    lag = max(lag_probe.last, lag_probe.stalled_for)
+    ok = lag <= HEALTH_MAX_LOOP_LAG_SEC
+    return json_response({"ok": ok, "lag_ms": round(lag * 1000, 1)}, 200 if ok else 503)
+
+
+async def readyz_endpoint(application, request: Request) -> Response:
+    checks = {"running": application.running}
+    for name, ping in (("state_db", state_store.ping), ("bankroll_db", bankroll_manager.ping)):
+        try:
+            checks[name] = ping()
+        except Exception as e:
+            logger.warning(f"Readiness: {name} failed: {e}")
+            checks[name] = False
+    ok = all(checks.values())
+    return json_response({"ok": ok, **checks}, 200 if ok else 503)
+
+
+async def debug_state_endpoint(request: Request) -> Response:
+    return json_response(introspector.snapshot())
+
+
+def _register_introspection(application):
+    """/debug/state sections: lengths and counters only, never contents."""
+    loop = asyncio.get_running_loop()
+    processor = application.update_processor
+    introspector.add("bot", lambda: {
+        "mode": BOT_MODE, "shard": [SHARD_INDEX, SHARD_COUNT], "running": application.running,
+    })
+    introspector.add("snapshots", lambda: {
+        "scenarios": quiz_manager.snapshot_version, "open_ranges": open_range_quiz.snapshot_version,
+    })
+    introspector.add("users", user_states.stats)
+    introspector.add("chats", lambda: {
+        "active": len(active_chats), "subscribed": len(subscribed_chats),
+        "broadcast_scheduled": len(broadcast_planner.wheel),
+        "broadcast_backlog": len(_broadcast_backlog), "broadcast_running": _broadcast_running,
+        "group_rounds": len(group_rounds), "group_edits_pending": len(group_editor),
+    })
+    introspector.add("caches", lambda: {
+        # chart (and Pillow) may not be imported yet with LAZY_STARTUP
+        "chart": sys.modules["chart"].cache_info() if "chart" in sys.modules else None,
+        "scenarios": quiz_manager.cache_info(),
+        "open_ranges": open_range_quiz.cache_info(),
+    })
+    introspector.add("queues", lambda: {
+        "updates": application.update_queue.qsize(),
+        "users_in_flight": len(processor.locks) if isinstance(processor, UserSerialProcessor) else None,
+        "outbound": outbound.queue_stats(),
+        "executor": executor_stats(loop),
+        "log_writer": logsetup.queue_depth(),
+        "trace_writer": tracing.queue_depth(),
+    })
+    introspector.add("loop", lag_probe.snapshot)
+    introspector.add("db", lambda: {"state": state_store.stats(), "bankroll": bankroll_manager.stats()})
+    introspector.add("process", process_stats)
+
+
+async def start_metrics_server(application) -> Optional[HttpServer]:
+    if not METRICS_PORT:
+        return None
+    port = METRICS_PORT + (SHARD_INDEX if SHARD_COUNT > 1 else 0)
+    lag_probe.start()
+    _register_introspection(application)
+    server = HttpServer(METRICS_LISTEN, port)
+    server.route("GET", "/metrics", metrics_endpoint)
+    server.route("GET", "/healthz", healthz_endpoint)
+    server.route("GET", "/readyz", partial(readyz_endpoint, application))
+    server.route("GET", "/debug/state", debug_state_endpoint)
+    await server.start()
+    logger.info(f"Metrics on http://{METRICS_LISTEN}:{port}/metrics")
+    return server
+
+
 async def post_init(application):
+    STARTUP.mark("initialize")
     commands = [
         BotCommand("quiz", "Open range quiz (add position: /quiz utg)"),
         BotCommand("q", "Open range quiz"),
         BotCommand("stats", "Your stats & ranking"),
         BotCommand("ranking", "Leaderboard"),
-        BotCommand("subscribe", "1시간마다 한 문제씩 자동 받기"),
+        BotCommand("subscribe", "자동 문제 받기 (/subscribe 30 = 30분마다)"),
         BotCommand("unsubscribe", "자동 발송 해제"),
+        BotCommand("quiet", "방해 금지 시간 (/quiet 23-8)"),
         BotCommand("sub_status", "자동 발송 구독 상태"),
         BotCommand("help", "How to play"),
     ]
     await application.bot.set_my_commands(commands)
     logger.info("Bot commands registered")
+    global metrics_server
+    metrics_server = await start_metrics_server(application)
+    try:
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGUSR2, _profile_on_signal, application)
+    except (AttributeError, NotImplementedError, RuntimeError):
+        pass                        # no SIGUSR2 (Windows) or not the main thread
+    if TRACE_SAMPLE_RATE > 0:
+        trace_path = TRACE_PATH
+        if SHARD_COUNT > 1:
+            trace_path = trace_path.with_name(f"{trace_path.stem}.{SHARD_INDEX}{trace_path.suffix}")
+        tracing.configure(TRACE_SAMPLE_RATE, trace_path, TRACE_MAX_BYTES, TRACE_BACKUPS)
+        logger.info(f"Tracing {TRACE_SAMPLE_RATE:.0%} of updates to {trace_path}")
 
     if application.job_queue is not None:
         application.job_queue.run_repeating(
-            broadcast_quiz_job,
-            interval=BROADCAST_INTERVAL_SEC,
-            first=BROADCAST_INTERVAL_SEC,  # first run after 1 interval, not at boot
-            name="broadcast_quiz",
+            broadcast_tick_job,
+            interval=BROADCAST_TICK_SEC,
+            first=BROADCAST_TICK_SEC,
+            name="broadcast_tick",
         )
-        logger.info(f"Auto-broadcast scheduled every {BROADCAST_INTERVAL_SEC}s")
+        logger.info(f"Auto-broadcast: {len(broadcast_planner.wheel)} subscriber(s) scheduled, "
+                    f"default every {BROADCAST_INTERVAL_SEC}s")
     else:
         logger.warning("JobQueue unavailable — auto-broadcast disabled")
 
+    if application.job_queue is not None:
+        application.job_queue.run_repeating(
+            flush_state_job,
+            interval=STATE_FLUSH_INTERVAL_SEC,
+            first=STATE_FLUSH_INTERVAL_SEC,
+            name="flush_state",
+        )
+    else:
+        logger.warning("JobQueue unavailable — state is flushed on shutdown only")
 
-def main():
-    if not TELEGRAM_BOT_TOKEN:
-        logger.error("TELEGRAM_BOT_TOKEN not set!")
-        return
-
-    application = (
+    if application.job_queue is not None:
+        application.job_queue.run_repeating(
+            reload_corrections_job,
+            interval=CORRECTIONS_POLL_SEC,
+            first=CORRECTIONS_POLL_SEC,
+            name="reload_corrections",
+        )
+    STARTUP.mark("post_init")
+    logger.info(STARTUP.summary())
+
+
+async def post_shutdown(application):
+    await group_editor.close()
+    if metrics_server is not None:
+        await metrics_server.stop()
+    await lag_probe.stop()
+    tracing.shutdown()
+    user_states.spill_dirty()
+    state_store.close()
+    logger.info("Bot state flushed")
+
+
+def _default_requests() -> tuple[HTTPXRequest, HTTPXRequest]:
+    """The builder's two Bot API transports, sharing one TLS context.
+
+    Left to itself the builder gives each its own httpx client, and each
+    loads the CA bundle (~40 ms apiece). Even with a plain http://
+    BOT_API_BASE_URL (a local Bot API server) the context stays verifying:
+    file downloads may still go to https://api.telegram.org.
+    """
+    ssl_context = httpx.create_ssl_context()
+    return (HTTPXRequest(connection_pool_size=256, httpx_kwargs={"verify": ssl_context}),
+            HTTPXRequest(connection_pool_size=1, httpx_kwargs={"verify": ssl_context}))
+
+
+def build_application(token: str, request=None, update_processor=None) -> Application:
+    """Application with every handler registered.
+
+    `request` replaces the HTTP transport (tests and benchmarks pass a
+    fake Bot API here); `update_processor` replaces the per-user serial
+    one.
+    """
+    builder = (
         Application.builder()
-        .token(TELEGRAM_BOT_TOKEN)
+        .token(token)
+        .base_url(BOT_API_BASE_URL)
+        .concurrent_updates(update_processor or UserSerialProcessor(CONCURRENT_UPDATES))
+        .rate_limiter(outbound)
         .post_init(post_init)
-        .build()
+        .post_shutdown(post_shutdown)
     )
+    if request is None:
+        request, get_updates_request = _default_requests()
+    else:
+        get_updates_request = request
+    application = builder.request(request).get_updates_request(get_updates_request).build()
 
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", help_command))
@@ -1052,12 +1700,38 @@ def main():
     application.add_handler(CommandHandler("unsubscribe", unsubscribe_command))
     application.add_handler(CommandHandler("unsub", unsubscribe_command))
     application.add_handler(CommandHandler("sub_status", sub_status_command))
-    application.add_handler(CallbackQueryHandler(handle_open_range_answer, pattern=r"^rfi:"))
-    application.add_handler(CallbackQueryHandler(handle_scenario_answer, pattern=r"^sc:"))
+    application.add_handler(CommandHandler("quiet", quiet_command))
+    application.add_handler(CommandHandler("profile", profile_command))
+    application.add_handler(CallbackQueryHandler(handle_answer, pattern=r"^q:"))
+    application.add_handler(CallbackQueryHandler(handle_expired_answer, pattern=r"^(rfi|sc):"))
     application.add_handler(CallbackQueryHandler(handle_next_quiz, pattern=r"^next:"))
     application.add_handler(CallbackQueryHandler(handle_fix_prompt, pattern=r"^fix:"))
     application.add_handler(CallbackQueryHandler(handle_fix_apply, pattern=r"^fixdo:"))
     application.add_error_handler(error_handler)
+    STARTUP.mark("application")
+    return application
+
+
+def main():
+    if not TELEGRAM_BOT_TOKEN:
+        logger.error("TELEGRAM_BOT_TOKEN not set!")
+        return
+
+    application = build_application(TELEGRAM_BOT_TOKEN)
+
+    if BOT_MODE == "webhook":
+        logger.info(f"Starting Open Range Quiz Bot (webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}{WEBHOOK_PATH})...")
+        run_webhook(
+            application,
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            path=WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            webhook_url=WEBHOOK_URL,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=Update.ALL_TYPES,
+        )
+        return
 
     logger.info("Starting Open Range Quiz Bot...")
     application.run_polling(allowed_updates=Update.ALL_TYPES)
@@ -0,0 +1,275 @@
+"""In-process metrics, served in Prometheus text format.
+
+Counters, gauges and histograms with fixed label names, modelled on
+prometheus_client but without the dependency (or its locks: everything
+is updated from the event loop thread). Look a labelled child up once,
+ideally at import time, and keep it:
+
+    ANSWER_SECONDS = HANDLER_SECONDS.labels("handle_scenario_answer")
+    ANSWER_SECONDS.observe(elapsed)          # ~1 µs
+
+Histograms use fixed buckets: an observation is one bisect plus two
+additions. `render()` produces the text exposition format, cumulative
+buckets and all, for GET /metrics.
+"""
+import functools
+import inspect
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Iterator
+
+# Seconds; spans a fast SQLite read up to a slow Telegram call
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, "_Metric"] = {}
+
+    def register(self, metric: "_Metric"):
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> "_Metric":
+        return self._metrics[name]
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        if registry is not None:
+            registry.register(self)
+        # Unlabelled metrics are their own (only) child
+        self._default = None if self.labelnames else self.labels()
+
+    def labels(self, *values):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}")
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def samples(self):
+        for values, child in self._children.items():
+            yield f"{self.name}{_label_str(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the value from `function` at scrape time instead."""
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def set_function(self, function: Callable[[], float]):
+        self._default.set_function(function)
+
+    def samples(self):
+        for values, child in self._children.items():
+            yield f"{self.name}{_label_str(self.labelnames, values)} {_format_value(child.get())}"
+
+
+class _Timer:
+    """Context manager and decorator (sync or async) observing elapsed seconds."""
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+
+    def __call__(self, func):
+        child = self.child
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    child.observe(time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapper
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)      # last one is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (),
+                 buckets: tuple = DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return self._default.time()
+
+    def samples(self):
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_label_str(self.labelnames, values, le)} {cumulative}"
+            labels = _label_str(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+# ─── Bot metrics ─────────────────────────────────────────────────────────
+
+HANDLER_SECONDS = Histogram(
+    "bot_handler_seconds", "Time spent in an update handler or job", ("handler",))
+DB_QUERY_SECONDS = Histogram(
+    "bot_db_query_seconds", "BankrollManager query time, including the write lock wait",
+    ("query",))
+RENDER_SECONDS = Histogram(
+    "bot_render_seconds", "Chart drawing (render) and PNG encoding (encode) time",
+    ("chart", "phase"))
+CACHE_REQUESTS = Counter(
+    "bot_cache_requests_total", "Cache lookups by result", ("cache", "result"))
+API_CALLS = Counter(
+    "bot_api_calls_total", "Bot API requests by method and outcome", ("method", "outcome"))
+API_SECONDS = Histogram(
+    "bot_api_call_seconds", "Bot API request time, from being sent to the response",
+    ("method",))
+API_QUEUE_DEPTH = Gauge(
+    "bot_api_queue_depth", "Requests waiting in the outbound scheduler", ("priority",))
+API_QUEUE_WAIT_P99 = Gauge(
+    "bot_api_queue_wait_p99_seconds", "p99 of recent outbound queue waits", ("priority",))
+EVENT_LOOP_LAG = Gauge(
+    "bot_event_loop_lag_seconds", "How late the event loop lag probe last woke up")
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -1,25 +1,313 @@
-"""Simple JSON persistence for bot state."""
+"""SQLite persistence for bot state.
+
+Chat membership lives in memory; changes only mark the chat dirty.
+`flush()` upserts the dirty rows in a single transaction, so a write
+costs O(changed chats) and a crash never leaves a torn state file.
+
+Per-user quiz sessions (recent-hand history + the seq of the last
+question issued) are written behind the same way and read back lazily,
+one user at a time. The question itself lives in the signed
+callback_data of its buttons (see tokens.py), not here.
+
+Each subscriber's auto-quiz schedule (next due time, interval, quiet
+hours) is kept in memory for the broadcast planner and written behind
+too, so cadence survives restarts.
+
+In sharded mode each worker has its own state DB holding only its users
+(user_id % count == index). A new shard DB is seeded once from the
+unsharded DB and the legacy JSON snapshot, keeping just its own rows.
+"""
 import json
-from pathlib import Path
+import sqlite3
+import threading
+from typing import NamedTuple
+
+from config import STATE_DB_PATH, DATA_DIR
+
+LEGACY_STATE_FILE = DATA_DIR / "bot_state.json"
+UNSHARDED_STATE_DB = DATA_DIR / "bot_state.db"
+
+
+class UserSession(NamedTuple):
+    issued_seq: int                          # seq of the last question sent
+    recent: list[tuple[str, str]]            # (position, hand)
+    recent_scenarios: list[tuple[str, str]]  # (scenario_id, hand)
+
+
+class BroadcastSchedule(NamedTuple):
+    next_due: float                  # unix time of the next auto-quiz
+    interval_sec: int
+    quiet_start: int | None = None   # local hour quiet hours begin
+    quiet_end: int | None = None     # local hour they end
+    utc_offset_min: int = 0          # the user's UTC offset for quiet hours
 
-STATE_FILE = Path(__file__).parent.parent / "data" / "bot_state.json"
 
+def _is_open(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.total_changes
+        return True
+    except sqlite3.ProgrammingError:       # closed
+        return False
 
-def load_state() -> dict:
-    if STATE_FILE.exists():
+
+class StateStore:
+    def __init__(self, db_path=None, shard: tuple[int, int] = None):
+        self.db_path = db_path or STATE_DB_PATH
+        # (index, count) when this store owns one shard of the users
+        self.shard = shard
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.Lock()
+        self._dirty: set[int] = set()
+        # user_id -> seq of the last question issued
+        self._issued_dirty: dict[int, int] = {}
+        # user_id -> (recent, recent_scenarios)
+        self._recent_dirty: dict[int, tuple[list, list]] = {}
+        self._schedule_dirty: set[int] = set()
+        self.active_chats: set[int] = set()
+        self.subscribed_chats: set[int] = set()
+        self.schedules: dict[int, BroadcastSchedule] = {}
+        self._init_db()
+        self._load()
+
+    def _init_db(self):
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chats (
+                chat_id INTEGER PRIMARY KEY,
+                active INTEGER NOT NULL DEFAULT 0,
+                subscribed INTEGER NOT NULL DEFAULT 0
+            );
+
+            CREATE TABLE IF NOT EXISTS question_seq (
+                user_id INTEGER PRIMARY KEY,
+                issued INTEGER NOT NULL
+            );
+            -- Superseded by signed callback tokens + question_seq
+            DROP TABLE IF EXISTS pending_quizzes;
+
+            CREATE TABLE IF NOT EXISTS user_recent (
+                user_id INTEGER PRIMARY KEY,
+                recent TEXT NOT NULL DEFAULT '[]',
+                recent_scenarios TEXT NOT NULL DEFAULT '[]'
+            );
+
+            CREATE TABLE IF NOT EXISTS broadcast_schedule (
+                chat_id INTEGER PRIMARY KEY,
+                next_due REAL NOT NULL,
+                interval_sec INTEGER NOT NULL,
+                quiet_start INTEGER,
+                quiet_end INTEGER,
+                utc_offset_min INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+        self.conn.commit()
+
+    def _load_schedules(self):
+        for row in self.conn.execute(
+            "SELECT chat_id, next_due, interval_sec, quiet_start, quiet_end, utc_offset_min "
+            "FROM broadcast_schedule"
+        ):
+            self.schedules[row[0]] = BroadcastSchedule(*row[1:])
+
+    def _load(self):
+        self._load_schedules()
+        rows = self.conn.execute(
+            "SELECT chat_id, active, subscribed FROM chats"
+        ).fetchall()
+        if not rows:
+            if self.shard is not None:
+                self._seed_shard()
+            self._import_legacy()
+            return
+        for chat_id, active, subscribed in rows:
+            if active:
+                self.active_chats.add(chat_id)
+            if subscribed:
+                self.subscribed_chats.add(chat_id)
+
+    def owns(self, key: int) -> bool:
+        return self.shard is None or key % self.shard[1] == self.shard[0]
+
+    def _seed_shard(self):
+        """Copy this shard's rows out of the unsharded state DB, if any."""
+        if not UNSHARDED_STATE_DB.exists() or UNSHARDED_STATE_DB.resolve() == self.db_path.resolve():
+            return
+        index, count = self.shard
+        # SQLite's % keeps the sign; normalise so negative (group) ids match Python's %
+        owned = f"((%s %% {count}) + {count}) %% {count} = {index}"
+        self.conn.execute("ATTACH DATABASE ? AS src", (str(UNSHARDED_STATE_DB),))
+        copies = {
+            "chats": f"SELECT chat_id, active, subscribed FROM src.chats WHERE {owned % 'chat_id'}",
+            "question_seq": f"SELECT * FROM src.question_seq WHERE {owned % 'user_id'}",
+            "user_recent": f"SELECT * FROM src.user_recent WHERE {owned % 'user_id'}",
+            "broadcast_schedule":
+                f"SELECT * FROM src.broadcast_schedule WHERE {owned % 'chat_id'}",
+        }
         try:
-            with open(STATE_FILE, encoding="utf-8") as f:
-                return json.load(f)
+            present = {r[0] for r in self.conn.execute(
+                "SELECT name FROM src.sqlite_master WHERE type = 'table'"
+            )}
+            with self.conn:
+                for table, select in copies.items():
+                    if table in present:
+                        self.conn.execute(f"INSERT OR IGNORE INTO {table} {select}")
+        finally:
+            self.conn.execute("DETACH DATABASE src")
+        for chat_id, active, subscribed in self.conn.execute(
+            "SELECT chat_id, active, subscribed FROM chats"
+        ):
+            if active:
+                self.active_chats.add(chat_id)
+            if subscribed:
+                self.subscribed_chats.add(chat_id)
+        self._load_schedules()
+
+    def _import_legacy(self):
+        """One-time migration from the old bot_state.json snapshot."""
+        if self.active_chats or not LEGACY_STATE_FILE.exists():
+            return
+        try:
+            with open(LEGACY_STATE_FILE, encoding="utf-8") as f:
+                state = json.load(f)
         except Exception:
-            pass
-    return {"active_chats": [], "subscribed_chats": []}
-
-
-def save_state(active_chats: set[int], subscribed_chats: set[int] | None = None):
-    STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
-    state = {
-        "active_chats": list(active_chats),
-        "subscribed_chats": list(subscribed_chats) if subscribed_chats is not None else [],
-    }
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(state, f, indent=2)
+            return
+        self.active_chats.update(c for c in state.get("active_chats", []) if self.owns(c))
+        self.subscribed_chats.update(c for c in state.get("subscribed_chats", []) if self.owns(c))
+        self._dirty.update(self.active_chats | self.subscribed_chats)
+        self.flush()
+
+    # ─── Mutations (memory only, marked dirty) ───────────────────────────
+
+    def add_active(self, chat_id: int):
+        if chat_id not in self.active_chats:
+            self.active_chats.add(chat_id)
+            self._dirty.add(chat_id)
+
+    def subscribe(self, chat_id: int):
+        self.add_active(chat_id)
+        if chat_id not in self.subscribed_chats:
+            self.subscribed_chats.add(chat_id)
+            self._dirty.add(chat_id)
+
+    def unsubscribe(self, chat_id: int):
+        if chat_id in self.subscribed_chats:
+            self.subscribed_chats.discard(chat_id)
+            self._dirty.add(chat_id)
+
+    def set_issued(self, user_id: int, seq: int):
+        self._issued_dirty[user_id] = seq
+
+    def set_recent(self, user_id: int, recent: list, recent_scenarios: list):
+        self._recent_dirty[user_id] = (recent, recent_scenarios)
+
+    def set_schedule(self, chat_id: int, schedule: BroadcastSchedule):
+        self.schedules[chat_id] = schedule
+        self._schedule_dirty.add(chat_id)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._dirty or self._issued_dirty or self._recent_dirty
+                    or self._schedule_dirty)
+
+    def ping(self) -> bool:
+        with self._lock:
+            return self.conn.execute("SELECT 1").fetchone()[0] == 1
+
+    def stats(self) -> dict:
+        return {
+            "path": str(self.db_path), "open": _is_open(self.conn),
+            "active_chats": len(self.active_chats), "subscribed_chats": len(self.subscribed_chats),
+            "schedules": len(self.schedules),
+            "dirty": {"chats": len(self._dirty), "issued": len(self._issued_dirty),
+                      "recent": len(self._recent_dirty), "schedules": len(self._schedule_dirty)},
+        }
+
+    # ─── Lazy per-user restore ───────────────────────────────────────────
+
+    def load_session(self, user_id: int) -> UserSession:
+        """Read one user's persisted session (unflushed writes win)."""
+        if user_id in self._issued_dirty:
+            issued = self._issued_dirty[user_id]
+        else:
+            row = self.conn.execute(
+                "SELECT issued FROM question_seq WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            issued = row[0] if row else 0
+
+        if user_id in self._recent_dirty:
+            recent, recent_sc = self._recent_dirty[user_id]
+        else:
+            row = self.conn.execute(
+                "SELECT recent, recent_scenarios FROM user_recent WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+            recent, recent_sc = (json.loads(row[0]), json.loads(row[1])) if row else ([], [])
+
+        return UserSession(
+            issued_seq=issued,
+            recent=[tuple(x) for x in recent],
+            recent_scenarios=[tuple(x) for x in recent_sc],
+        )
+
+    # ─── Flush ───────────────────────────────────────────────────────────
+
+    def flush(self) -> int:
+        """Write all dirty rows in one transaction. Returns rows written."""
+        with self._lock:
+            if not self.dirty:
+                return 0
+            dirty, self._dirty = self._dirty, set()
+            issued, self._issued_dirty = self._issued_dirty, {}
+            recent, self._recent_dirty = self._recent_dirty, {}
+            scheduled, self._schedule_dirty = self._schedule_dirty, set()
+
+            chat_rows = [
+                (cid, int(cid in self.active_chats), int(cid in self.subscribed_chats))
+                for cid in dirty
+            ]
+            issued_rows = list(issued.items())
+            recent_rows = [
+                (uid, json.dumps(r, separators=(",", ":")),
+                 json.dumps(rs, separators=(",", ":")))
+                for uid, (r, rs) in recent.items()
+            ]
+            schedule_rows = [(cid, *self.schedules[cid]) for cid in scheduled]
+            try:
+                with self.conn:
+                    self.conn.executemany(
+                        "INSERT INTO chats (chat_id, active, subscribed) VALUES (?, ?, ?) "
+                        "ON CONFLICT(chat_id) DO UPDATE SET "
+                        "active = excluded.active, subscribed = excluded.subscribed",
+                        chat_rows,
+                    )
+                    self.conn.executemany(
+                        "INSERT INTO question_seq (user_id, issued) VALUES (?, ?) "
+                        "ON CONFLICT(user_id) DO UPDATE SET "
+                        "issued = MAX(issued, excluded.issued)",
+                        issued_rows,
+                    )
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO user_recent "
+                        "(user_id, recent, recent_scenarios) VALUES (?, ?, ?)",
+                        recent_rows,
+                    )
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO broadcast_schedule "
+                        "(chat_id, next_due, interval_sec, quiet_start, quiet_end, utc_offset_min) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        schedule_rows,
+                    )
+            except sqlite3.Error:
+                # Retry on next flush; newer in-memory writes take precedence
+                self._dirty |= dirty
+                self._issued_dirty = {**issued, **self._issued_dirty}
+                self._recent_dirty = {**recent, **self._recent_dirty}
+                self._schedule_dirty |= scheduled
+                raise
+            return len(chat_rows) + len(issued_rows) + len(recent_rows) + len(schedule_rows)
+
+    def close(self):
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Preload-then-fork worker pool (bot/router.py with PRELOAD_WORKERS=1).
+
+    python bot/prefork.py --workers 4 --base-port 8100 --state-dir data
+
+Imports python-telegram-bot, httpx and Pillow, loads the read-only quiz
+data (scenarios, every EV table, range format and slot) and scales the
+PDF crops shown next to answer charts into the crop cache (up to its
+capacity), once; then forks one worker per shard. Each worker runs
+bot/main.py in webhook mode on base port + index, the same as a worker
+the router starts itself, but from this process's memory instead of
+its own copy.
+
+Copy-on-write keeps those pages shared only while nobody writes to
+them, and a garbage collection writes to every object it examines. So
+the GC is off while loading, which also avoids leaving freed gaps in
+the shared pages. Just before forking, gc.freeze() moves everything
+loaded into a generation the workers' collections never scan, and each
+worker turns its GC back on. Reference counting still dirties the
+pages of objects a worker uses, so hot objects are copied and the rest
+stay shared. /debug/state reports each worker's pss_bytes/uss_bytes,
+and scripts/bench_prefork.py compares them with separately started
+workers.
+
+The pool never runs an event loop, so forking stays safe. A worker that
+exits is forked again from the same preloaded image, unless a Fix has
+changed corrections.json since; that worker then loads its own data
+(see quiz.load_quiz_data). Running workers reload their open ranges
+when another worker's Fix changes the file. SIGTERM/SIGINT stop every
+worker, then the pool.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+
+import httpx  # noqa: F401  (preloaded for the workers)
+import telegram.ext  # noqa: F401
+import telegram.request  # noqa: F401
+
+import chart
+from config import DATA_DIR
+from logsetup import FORMAT
+from quiz import load_quiz_data, preload_quiz_data
+from router import RESTART_DELAY_SEC, shard_env
+
+logger = logging.getLogger("prefork")
+BOT_DIR = Path(__file__).resolve().parent
+
+
+def preload() -> int:
+    """Load the quiz data and the answer charts' PDF crops; returns crops loaded."""
+    preload_quiz_data()
+    _, open_range_quiz = load_quiz_data()
+    return chart.preload_crops([
+        str(DATA_DIR / "crops" / f"{fmt}_rfi_{pos}.png")
+        for fmt, positions in open_range_quiz.ranges.items() for pos in positions
+    ])
+
+
+def _forget_settings(keys) -> list[str]:
+    """Drop config, and every loaded bot module that bound one of `keys`
+    from it, from sys.modules; returns their names.
+
+    The next import reads them again with the current environment.
+    Modules that bound none of the keys, such as quiz with the preloaded
+    data, are kept as they are.
+    """
+    stale = []
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if name == "__main__" or not path or Path(path).resolve().parent != BOT_DIR:
+            continue
+        if name == "config" or any(key in vars(module) for key in keys):
+            del sys.modules[name]
+            stale.append(name)
+    return stale
+
+
+def _become_worker(index: int, args):
+    """In the forked child: take worker `index`'s signals, GC and settings."""
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, signal.SIG_DFL)
+    gc.enable()
+    env = shard_env(index, args.base_port + index, Path(args.state_dir))
+    os.environ.update(env)
+    # The preload imported config with the pool's environment; main.py and
+    # whatever it imports must read this worker's SHARD_INDEX, port and
+    # state DB
+    _forget_settings(env)
+
+
+def _run_worker(index: int, args) -> int:
+    """In the forked child: become worker `index` and serve until stopped."""
+    _become_worker(index, args)
+    import main
+    main.main()
+    return 0
+
+
+def _fork(index: int, args) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            code = _run_worker(index, args)
+        except BaseException:
+            logger.exception(f"Worker {index} failed")
+        finally:
+            import logsetup
+            logsetup.stop_logging()
+            os._exit(code)
+    logger.info(f"Worker {index} forked (pid {pid}, port {args.base_port + index})")
+    return pid
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Preload the quiz data and fork bot workers")
+    ap.add_argument("--workers", type=int, required=True)
+    ap.add_argument("--base-port", type=int, required=True)
+    ap.add_argument("--state-dir", required=True)
+    args = ap.parse_args()
+    # No writer thread in a process that forks
+    logging.basicConfig(level=logging.INFO, format=FORMAT)
+
+    gc.disable()
+    start = time.perf_counter()
+    crops = preload()
+    gc.freeze()
+    logger.info(f"Preloaded quiz data and {crops} chart crops in "
+                f"{(time.perf_counter() - start) * 1000:.0f} ms ({gc.get_freeze_count()} objects frozen)")
+
+    workers = {_fork(i, args): i for i in range(args.workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while workers:
+        pid, status = os.wait()
+        index = workers.pop(pid, None)
+        if index is None or stopping:
+            continue
+        logger.warning(f"Worker {index} exited with {os.waitstatus_to_exitcode(status)}; restarting")
+        time.sleep(RESTART_DELAY_SEC)
+        if not stopping:
+            workers[_fork(index, args)] = index
+    logger.info("Worker pool stopped")
+
+
+if __name__ == "__main__":
+    main()
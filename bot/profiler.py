@@ -0,0 +1,172 @@
+"""On-demand sampling profiler for the running bot.
+
+Nothing runs until a session is started (/profile from an admin, or
+SIGUSR2): then a daemon thread wakes every `interval` seconds, grabs the
+stack of every other thread with sys._current_frames() — the event loop,
+asyncio.to_thread / executor workers, the trace and log writers — and
+counts each distinct stack. When the session ends it writes, to
+PROFILE_DIR:
+
+- profile-<time>.collapsed: one "thread;outer;...;inner count" line per
+  stack, the input format of flamegraph.pl / speedscope / inferno
+- profile-<time>.txt: samples per thread, and top functions by self and
+  inclusive samples over the stacks that were not idle (parked in a
+  selector poll, a lock/condition wait or an executor queue)
+
+Samples land where a thread can be interrupted for the GIL, so time inside
+a C call that holds it (Pillow drawing, an sqlite commit) is charged to the
+Python line that made the call — which is the line worth knowing.
+"""
+import asyncio
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+DEFAULT_INTERVAL = 0.01
+
+# Pool workers differ only by a numeric suffix; fold them into one lane
+_WORKER_SUFFIX = re.compile(r"_\d+$")
+_running = threading.Lock()
+
+# Leaf frames of a thread that is waiting, not working
+IDLE_FRAMES = ("EpollSelector.select", "KqueueSelector.select", "SelectSelector.select",
+               "PollSelector.select", "Condition.wait", "Event.wait", "Thread.join",
+               "SimpleQueue.get", "Queue.get", "_worker")
+
+
+def _frame_label(code) -> str:
+    path = code.co_filename
+    marker = path.rfind("site-packages/")
+    if marker >= 0:
+        path = path[marker + len("site-packages/"):]
+    else:
+        path = path.rsplit("/", 1)[-1]
+    return f"{code.co_qualname} ({path}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()       # (thread, frame, ...) root first -> samples
+        self.started = self.stopped = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._labels: dict = {}                # code object -> label, computed once
+
+    def start(self):
+        self.started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.monotonic()
+
+    def _run(self):
+        own = threading.get_ident()
+        labels = self._labels
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = _frame_label(code)
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.append(_WORKER_SUFFIX.sub("", names.get(ident, str(ident))))
+                stack.reverse()
+                self.stacks[tuple(stack)] += 1
+
+    # -- reports -----------------------------------------------------------
+
+    def collapsed(self) -> str:
+        return "".join(f"{';'.join(stack)} {count}\n"
+                       for stack, count in self.stacks.most_common())
+
+    @property
+    def busy(self) -> int:
+        return sum(count for stack, count in self.stacks.items() if not _is_idle(stack))
+
+    def top_functions(self, n: int = 30) -> tuple[list, list]:
+        """([(function, self samples)], [(function, inclusive samples)]), busy only"""
+        own, inclusive = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack[1:]
+            if not frames or _is_idle(stack):
+                continue
+            own[frames[-1]] += count
+            for label in set(frames):      # recursion counts once per sample
+                inclusive[label] += count
+        return own.most_common(n), inclusive.most_common(n)
+
+    def summary(self, n: int = 30) -> str:
+        total = sum(self.stacks.values())
+        threads, idle = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            threads[stack[0]] += count
+            if _is_idle(stack):
+                idle[stack[0]] += count
+        busy = self.busy
+        lines = [f"{total} samples over {self.stopped - self.started:.1f}s "
+                 f"every {self.interval * 1000:.0f} ms, {busy} busy", "",
+                 "Samples by thread (busy / all):"]
+        lines += [f"  {count - idle[name]:7d} / {count:<7d} {name}"
+                  for name, count in threads.most_common()]
+        own, inclusive = self.top_functions(n)
+        for title, rows in (("Top functions, busy samples (self):", own),
+                            ("Top functions, busy samples (inclusive):", inclusive)):
+            lines += ["", title]
+            lines += [f"  {count:7d} {count / busy * 100 if busy else 0:5.1f}%  {label}"
+                      for label, count in rows]
+        return "\n".join(lines) + "\n"
+
+
+def _is_idle(stack: tuple) -> bool:
+    return stack[-1].startswith(IDLE_FRAMES)
+
+
+class ProfileResult(NamedTuple):
+    profiler: SamplingProfiler
+    collapsed_path: Path
+    summary_path: Path
+
+
+def is_running() -> bool:
+    return _running.locked()
+
+
+async def profile(seconds: float, out_dir: Path,
+                  interval: float = DEFAULT_INTERVAL) -> Optional[ProfileResult]:
+    """Sample every thread for `seconds`; None if a session is already running."""
+    if not _running.acquire(blocking=False):
+        return None
+    try:
+        profiler = SamplingProfiler(interval)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            await asyncio.to_thread(profiler.stop)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        result = ProfileResult(profiler, out_dir / f"profile-{stamp}.collapsed",
+                               out_dir / f"profile-{stamp}.txt")
+        await asyncio.to_thread(_write, result)
+        return result
+    finally:
+        _running.release()
+
+
+def _write(result: ProfileResult):
+    result.collapsed_path.parent.mkdir(parents=True, exist_ok=True)
+    result.collapsed_path.write_text(result.profiler.collapsed(), encoding="utf-8")
+    result.summary_path.write_text(result.profiler.summary(), encoding="utf-8")
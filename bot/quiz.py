@@ -1,5 +1,10 @@
+import fcntl
+import hashlib
 import json
+import os
 import random
+import re
+import sys
 from pathlib import Path
 from dataclasses import dataclass, field
 from typing import Optional
@@ -11,7 +16,7 @@ from config import (
 )
 
 
-@dataclass
+@dataclass(slots=True)
 class Scenario:
     id: str
     type: str
@@ -24,16 +29,34 @@ class Scenario:
     action_sequence: list[dict] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class QuizQuestion:
+    """A scenario question: references into the shared snapshot, no copies."""
     scenario: Scenario
     hand: str           # e.g. "ATs", "72o", "QQ"
-    hand_display: str   # e.g. "A\u2660 T\u2660"
-    ev_vs_best: dict    # action -> ev relative to best (best=0, rest negative)
-    ev_normalized: dict # action -> normalized ev (average=0)
-    strategy: dict      # action -> GTO frequency
+    hand_data: dict     # the EV table's entry for the hand (shared)
     best_action: str
-    correct_actions: list[str]  # actions with strategy > 0
+
+    @property
+    def hand_display(self) -> str:      # e.g. "A\u2660 T\u2660"
+        return hand_to_display(self.hand)
+
+    @property
+    def ev_vs_best(self) -> dict:       # action -> ev relative to best (best=0, rest negative)
+        return self.hand_data["ev_vs_best"]
+
+    @property
+    def ev_normalized(self) -> dict:    # action -> normalized ev (average=0)
+        return self.hand_data["ev_normalized"]
+
+    @property
+    def strategy(self) -> dict:         # action -> GTO frequency
+        return self.hand_data.get("strategy", {})
+
+    @property
+    def correct_actions(self) -> list[str]:     # actions with strategy > 0
+        strategy = self.strategy
+        return [a for a, freq in strategy.items() if freq > 0] if strategy else [self.best_action]
 
 
 SUIT_SYMBOLS = ["\u2660", "\u2665", "\u2666", "\u2663"]  # spade, heart, diamond, club
@@ -41,6 +64,9 @@ SUIT_SYMBOLS = ["\u2660", "\u2665", "\u2666", "\u2663"]  # spade, heart, diamond
 
 def hand_to_display(hand: str) -> str:
     """Convert hand notation to display with suit symbols."""
+    display = _HAND_DISPLAY.get(hand)
+    if display is not None:
+        return display
     if len(hand) == 2:
         # Pocket pair like "AA"
         return f"{hand[0]}\u2660 {hand[1]}\u2665"
@@ -50,41 +76,83 @@ def hand_to_display(hand: str) -> str:
         return f"{hand[0]}\u2660 {hand[1]}\u2665"
 
 
+_HAND_DISPLAY: dict[str, str] = {}
+_HAND_DISPLAY.update((h, hand_to_display(h)) for h in ALL_HANDS_169)
+
+
+# Top-level "scenario_id" near the start of an EV table file
+_SCENARIO_ID = re.compile(rb'"scenario_id"\s*:\s*"([^"]+)"')
+
+
 class QuizManager:
-    def __init__(self):
+    """Scenario quizzes over the solver EV tables.
+
+    With `lazy=True` the EV tables are read (and hashed into the snapshot
+    version) up front but only parsed when a scenario is first asked,
+    which is most of the load time.
+    """
+
+    def __init__(self, lazy: bool = False):
         self.scenarios: dict[str, Scenario] = {}
         self.ev_tables: dict[str, dict] = {}
+        self._ev_raw: dict[str, bytes] = {}     # lazy: scenario_id -> unparsed table
+        self._digest = hashlib.sha1()
         self._load_scenarios()
-        self._load_ev_tables()
+        self._load_ev_tables(lazy)
+        # Short content hash; persisted quiz references are only valid
+        # against the same snapshot of scenarios + EV tables.
+        self.snapshot_version = self._digest.hexdigest()[:12]
+
+    def _read_json(self, path: Path):
+        raw = path.read_bytes()
+        self._digest.update(raw)
+        return json.loads(raw)
 
     def _load_scenarios(self):
-        with open(SCENARIOS_FILE, encoding="utf-8") as f:
-            data = json.load(f)
+        data = self._read_json(SCENARIOS_FILE)
         for s in data:
             self.scenarios[s["id"]] = Scenario(
-                id=s["id"],
-                type=s["type"],
+                id=sys.intern(s["id"]),
+                type=sys.intern(s["type"]),
                 name=s["name"],
                 description=s["description"],
-                hero_position=s["hero_position"],
+                hero_position=sys.intern(s["hero_position"]),
                 villain_position=s.get("villain_position"),
                 stack_bb=s["stack_bb"],
-                actions=s["actions"],
+                actions=[sys.intern(a) for a in s["actions"]],
                 action_sequence=s.get("action_sequence", []),
             )
 
-    def _load_ev_tables(self):
+    def _load_ev_tables(self, lazy: bool):
         if not EV_TABLES_DIR.exists():
             return
-        for path in EV_TABLES_DIR.glob("*.json"):
-            with open(path, encoding="utf-8") as f:
-                data = json.load(f)
-            scenario_id = data.get("scenario_id", path.stem)
-            self.ev_tables[scenario_id] = data
+        for path in sorted(EV_TABLES_DIR.glob("*.json")):
+            if not lazy:
+                data = self._read_json(path)
+                scenario_id = data.get("scenario_id", path.stem)
+                self.ev_tables[scenario_id] = data
+                continue
+            raw = path.read_bytes()
+            self._digest.update(raw)
+            match = _SCENARIO_ID.search(raw, 0, 1024)
+            self._ev_raw[match.group(1).decode() if match else path.stem] = raw
+
+    def _ev_table(self, scenario_id: str) -> Optional[dict]:
+        table = self.ev_tables.get(scenario_id)
+        if table is None:
+            raw = self._ev_raw.pop(scenario_id, None)
+            if raw is None:
+                return None
+            table = self.ev_tables[scenario_id] = json.loads(raw)
+        return table
+
+    def cache_info(self) -> dict:
+        return {"snapshot": self.snapshot_version, "scenarios": len(self.scenarios),
+                "ev_tables_parsed": len(self.ev_tables), "ev_tables_pending": len(self._ev_raw)}
 
     def get_available_scenarios(self) -> list[str]:
         """Return scenario IDs that have EV tables loaded."""
-        return [sid for sid in self.scenarios if sid in self.ev_tables]
+        return [sid for sid in self.scenarios if sid in self.ev_tables or sid in self._ev_raw]
 
     def generate_question(
         self,
@@ -100,8 +168,7 @@ class QuizManager:
         else:
             chosen_scenario_id = random.choice(available)
 
-        scenario = self.scenarios[chosen_scenario_id]
-        ev_table = self.ev_tables[chosen_scenario_id]
+        ev_table = self._ev_table(chosen_scenario_id)
         hands = ev_table.get("hands", {})
 
         if not hands:
@@ -148,42 +215,41 @@ class QuizManager:
         if not weighted_hands:
             # Fallback: pick any hand
             hand_name = random.choice(list(hands.keys()))
-            hand_data = hands[hand_name]
         else:
-            names, datas, weights = zip(*weighted_hands)
+            names, _, weights = zip(*weighted_hands)
             idx = random.choices(range(len(names)), weights=weights, k=1)[0]
             hand_name = names[idx]
-            hand_data = datas[idx]
 
-        ev_vs_best = hand_data["ev_vs_best"]
-        ev_normalized = hand_data["ev_normalized"]
-        strategy = hand_data.get("strategy", {})
+        return self.build_question(chosen_scenario_id, hand_name)
 
-        best_action = max(ev_vs_best, key=ev_vs_best.get)
-        correct_actions = [a for a, freq in strategy.items() if freq > 0] if strategy else [best_action]
+    def build_question(self, scenario_id: str, hand: str) -> Optional[QuizQuestion]:
+        """Rebuild a question from its (scenario_id, hand) reference."""
+        scenario = self.scenarios.get(scenario_id)
+        hand_data = self.get_hand_data(scenario_id, hand)
+        if scenario is None or not hand_data:
+            return None
 
+        ev_vs_best = hand_data["ev_vs_best"]
         return QuizQuestion(
             scenario=scenario,
-            hand=hand_name,
-            hand_display=hand_to_display(hand_name),
-            ev_vs_best=ev_vs_best,
-            ev_normalized=ev_normalized,
-            strategy=strategy,
-            best_action=best_action,
-            correct_actions=correct_actions,
+            hand=hand,
+            hand_data=hand_data,
+            best_action=max(ev_vs_best, key=ev_vs_best.get),
         )
 
     def get_hand_data(self, scenario_id: str, hand: str) -> Optional[dict]:
         """Get full hand data for a scenario."""
-        if scenario_id not in self.ev_tables:
+        ev_table = self._ev_table(scenario_id)
+        if ev_table is None:
             return None
-        return self.ev_tables[scenario_id].get("hands", {}).get(hand)
+        return ev_table.get("hands", {}).get(hand)
 
     def get_scenario_hands(self, scenario_id: str) -> dict:
         """Get all hands for a scenario (for range chart)."""
-        if scenario_id not in self.ev_tables:
+        ev_table = self._ev_table(scenario_id)
+        if ev_table is None:
             return {}
-        return self.ev_tables[scenario_id].get("hands", {})
+        return ev_table.get("hands", {})
 
 
 # ─── Open Range Quiz ──────────────────────────────────────────────────────────
@@ -270,22 +336,57 @@ def _compute_range_pcts(raise_h, allin_h, call_h, mixed_pcts) -> dict:
     }
 
 
-@dataclass
-class OpenRangeQuestion:
+@dataclass(frozen=True, slots=True)
+class RangeSlot:
+    """One format/position's range, shared by every question asked from it."""
     format_key: str        # e.g. "6max_100bb_highRake"
     format_name: str       # e.g. "6-max 100bb High Rake"
     position: str          # "UTG" / "MP" / "CO" / "BTN" / "SB"
-    hand: str              # e.g. "K9s"
-    hand_display: str      # e.g. "K♠ 9♠"
-    correct_action: str    # "Open", "Call", or "Fold"
-    in_range_hands: frozenset  # raise ∪ allin ∪ call (for chart display)
     raise_hands: frozenset     # pure raise hands
     allin_hands: frozenset     # all-in/push hands
     call_hands: frozenset      # call/limp hands (SB)
     mixed_hands: frozenset     # hands where both raise and fold are correct
     mixed_pcts: dict           # hand -> raise_pct (0.0-1.0) for mixed hands
-    is_boundary: bool      # whether near the range edge
-    range_pcts: dict = field(default_factory=dict)  # action percentages
+    in_range_hands: frozenset  # raise ∪ allin ∪ call (for chart display)
+    boundary_hands: frozenset  # hands next to a different action on the grid
+    range_pcts: dict           # action percentages
+
+
+@dataclass(frozen=True, slots=True)
+class OpenRangeQuestion:
+    """A slot and a hand; everything else is read from the shared slot."""
+    slot: RangeSlot
+    hand: str              # e.g. "K9s"
+
+    format_key = property(lambda self: self.slot.format_key)
+    format_name = property(lambda self: self.slot.format_name)
+    position = property(lambda self: self.slot.position)
+    in_range_hands = property(lambda self: self.slot.in_range_hands)
+    raise_hands = property(lambda self: self.slot.raise_hands)
+    allin_hands = property(lambda self: self.slot.allin_hands)
+    call_hands = property(lambda self: self.slot.call_hands)
+    mixed_hands = property(lambda self: self.slot.mixed_hands)
+    mixed_pcts = property(lambda self: self.slot.mixed_pcts)
+    range_pcts = property(lambda self: self.slot.range_pcts)
+
+    @property
+    def hand_display(self) -> str:      # e.g. "K♠ 9♠"
+        return hand_to_display(self.hand)
+
+    @property
+    def correct_action(self) -> str:    # "Push", "Open", "Call", or "Fold"
+        slot, hand = self.slot, self.hand
+        if hand in slot.allin_hands:
+            return "Push"
+        if hand in slot.raise_hands:
+            return "Open"
+        if hand in slot.call_hands:
+            return "Call"
+        return "Fold"
+
+    @property
+    def is_boundary(self) -> bool:      # whether near the range edge
+        return self.hand in self.slot.boundary_hands
 
 
 class OpenRangeQuizManager:
@@ -310,66 +411,131 @@ class OpenRangeQuizManager:
     }
     BOUNDARY_WINDOW = 8   # hands within this rank-distance from boundary get 3x weight
 
-    def __init__(self, ev_tables: dict = None):
+    def __init__(self, ev_tables: dict = None, lazy: bool = False):
         # fmt -> pos -> {"raise": frozenset, "call": frozenset}
         self.ranges: dict[str, dict[str, dict]] = {}
         # fmt -> pos -> hand -> weight
         self.weights: dict[str, dict[str, dict]] = {}
-        self._load(ev_tables or {})
-
-    def _load(self, ev_tables: dict):
+        # lazy: fmt -> pos -> unparsed range file, built on first use of fmt
+        self._pending: dict[str, dict[str, bytes]] = {}
+        # (fmt, pos) -> RangeSlot shared by that slot's questions
+        self._slots: dict[tuple[str, str], RangeSlot] = {}
+        self._ev_tables = ev_tables or {}
+        self._corrections: dict = {}
+        self._digest = hashlib.sha1()
+        self._load(lazy)
+        self.snapshot_version = self._digest.hexdigest()[:12]
+
+    def _load(self, lazy: bool):
+        # Not hashed: a Fix rewrites corrections.json, and the snapshot must
+        # not change under the questions already sent
         corrections_path = DATA_DIR / "corrections.json"
-        corrections: dict = {}
+        self.corrections_stamp = _corrections_stamp()
         if corrections_path.exists():
-            with open(corrections_path, encoding="utf-8") as f:
-                raw = json.load(f)
-            corrections = {k: v for k, v in raw.items() if not k.startswith("_")}
+            raw = json.loads(corrections_path.read_bytes())
+            self._corrections = {k: v for k, v in raw.items() if not k.startswith("_")}
 
+        # Every range file is read (and hashed) now either way, so the snapshot
+        # version does not depend on which formats have been used
         for fmt in self.FORMATS:
             fmt_dir = RANGES_DIR / fmt / "rfi"
             if not fmt_dir.exists():
                 continue
-            self.ranges[fmt] = {}
-            self.weights[fmt] = {}
+            files = {}
             for pos in OPEN_RANGE_POSITIONS:
                 path = fmt_dir / f"{pos}.json"
-                if not path.exists():
-                    continue
-                with open(path, encoding="utf-8") as f:
-                    data = json.load(f)
-                raise_hands = frozenset(data.get("raise", []))
-                allin_hands = frozenset(data.get("allin", []))
-                call_hands  = frozenset(data.get("call", []))
-
-                # Mixed: support both dict {hand: pct} and list [hand] formats
-                raw_mixed = data.get("mixed", {})
-                if isinstance(raw_mixed, list):
-                    mixed_pcts = {h: 0.5 for h in raw_mixed}
-                else:
-                    mixed_pcts = dict(raw_mixed)
-
-                # Apply manual corrections
-                corr = corrections.get(fmt, {}).get(pos, {})
-                raise_hands = (raise_hands - frozenset(corr.get("raise_remove", [])))
-                raise_hands = raise_hands | frozenset(corr.get("raise_add", []))
-                allin_hands = (allin_hands - frozenset(corr.get("allin_remove", [])))
-                allin_hands = allin_hands | frozenset(corr.get("allin_add", []))
-                call_hands  = (call_hands - frozenset(corr.get("call_remove", [])))
-                call_hands  = call_hands  | frozenset(corr.get("call_add", []))
-                for h in corr.get("mixed", []):
-                    mixed_pcts.setdefault(h, 0.5)
-                for h in corr.get("mixed_remove", []):
-                    mixed_pcts.pop(h, None)
-                mixed_hands = frozenset(mixed_pcts.keys())
-
-                self.ranges[fmt][pos] = {
-                    "raise": raise_hands, "allin": allin_hands,
-                    "call": call_hands, "mixed": mixed_hands,
-                    "mixed_pcts": mixed_pcts,
+                if path.exists():
+                    files[pos] = path.read_bytes()
+                    self._digest.update(files[pos])
+            self._pending[fmt] = files
+            if not lazy:
+                self._build_format(fmt)
+
+    def _build_format(self, fmt: str) -> bool:
+        """Parse a pending format's ranges and weights; False if unknown."""
+        files = self._pending.pop(fmt, None)
+        if files is None:
+            return fmt in self.ranges
+        self.ranges[fmt] = {}
+        self.weights[fmt] = {}
+        for pos, raw in files.items():
+            data = json.loads(raw)
+            raise_hands = frozenset(data.get("raise", []))
+            allin_hands = frozenset(data.get("allin", []))
+            call_hands  = frozenset(data.get("call", []))
+
+            # Mixed: support dict {hand: pct | {"pct": ..}} and list [hand] formats
+            raw_mixed = data.get("mixed", {})
+            if isinstance(raw_mixed, list):
+                mixed_pcts = {h: 0.5 for h in raw_mixed}
+            else:
+                mixed_pcts = {
+                    h: v.get("pct", 0.5) if isinstance(v, dict) else v
+                    for h, v in raw_mixed.items()
                 }
-                self.weights[fmt][pos] = self._compute_weights(
-                    raise_hands | allin_hands | call_hands, ev_tables, pos, fmt
-                )
+
+            # Apply manual corrections
+            corr = self._corrections.get(fmt, {}).get(pos, {})
+            raise_hands = (raise_hands - frozenset(corr.get("raise_remove", [])))
+            raise_hands = raise_hands | frozenset(corr.get("raise_add", []))
+            allin_hands = (allin_hands - frozenset(corr.get("allin_remove", [])))
+            allin_hands = allin_hands | frozenset(corr.get("allin_add", []))
+            call_hands  = (call_hands - frozenset(corr.get("call_remove", [])))
+            call_hands  = call_hands  | frozenset(corr.get("call_add", []))
+            for h in corr.get("mixed", []):
+                mixed_pcts.setdefault(h, 0.5)
+            for h in corr.get("mixed_remove", []):
+                mixed_pcts.pop(h, None)
+            mixed_hands = frozenset(mixed_pcts.keys())
+
+            self.ranges[fmt][pos] = {
+                "raise": raise_hands, "allin": allin_hands,
+                "call": call_hands, "mixed": mixed_hands,
+                "mixed_pcts": mixed_pcts,
+            }
+            self.weights[fmt][pos] = self._compute_weights(
+                raise_hands | allin_hands | call_hands, self._ev_tables, pos, fmt
+            )
+        return True
+
+    def range_data(self, fmt: str, pos: str) -> Optional[dict]:
+        """The (corrected) range of one format/position, loading the format if needed."""
+        if not self._build_format(fmt):
+            return None
+        return self.ranges[fmt].get(pos)
+
+    def set_range(self, fmt: str, pos: str, range_data: dict):
+        """Replace a format/position's range in memory (the Fix buttons)."""
+        self._build_format(fmt)
+        self.ranges[fmt][pos] = range_data
+        self._slots.pop((fmt, pos), None)
+
+    def _slot(self, fmt: str, pos: str) -> Optional[RangeSlot]:
+        slot = self._slots.get((fmt, pos))
+        if slot is not None:
+            return slot
+        range_data = self.range_data(fmt, pos)
+        if range_data is None:
+            return None
+        raise_h = range_data["raise"]
+        allin_h = range_data.get("allin", frozenset())
+        call_h  = range_data["call"]
+        mixed_pcts = range_data.get("mixed_pcts", {})
+        all_play = raise_h | allin_h | call_h
+        slot = self._slots[(fmt, pos)] = RangeSlot(
+            format_key=sys.intern(fmt),
+            format_name=self.FORMATS.get(fmt, fmt),
+            position=sys.intern(pos),
+            raise_hands=raise_h,
+            allin_hands=allin_h,
+            call_hands=call_h,
+            mixed_hands=range_data.get("mixed", frozenset()),
+            mixed_pcts=mixed_pcts,
+            in_range_hands=all_play,
+            boundary_hands=frozenset(h for h in ALL_HANDS_169 if _is_grid_boundary(h, all_play)),
+            range_pcts=_compute_range_pcts(raise_h, allin_h, call_h, mixed_pcts),
+        )
+        return slot
 
     def _compute_weights(
         self,
@@ -395,8 +561,24 @@ class OpenRangeQuizManager:
                 w[h] = 0.1
         return w
 
+    def build_all(self):
+        """Parse every pending format and build every slot now."""
+        for fmt in list(self._pending):
+            self._build_format(fmt)
+        for fmt, positions in self.ranges.items():
+            for pos in positions:
+                self._slot(fmt, pos)
+
+    def corrections_changed(self) -> bool:
+        """True once corrections.json has been replaced since this load."""
+        return _corrections_stamp() != self.corrections_stamp
+
+    def cache_info(self) -> dict:
+        return {"snapshot": self.snapshot_version, "formats_built": len(self.ranges),
+                "formats_pending": len(self._pending), "slots_cached": len(self._slots)}
+
     def get_available_formats(self) -> list[str]:
-        return [f for f in self.FORMATS if f in self.ranges and self.ranges[f]]
+        return [f for f in self.FORMATS if self.ranges.get(f) or self._pending.get(f)]
 
     def generate_question(
         self,
@@ -409,13 +591,13 @@ class OpenRangeQuizManager:
             return None
 
         fmt = format_key if format_key in available else random.choice(available)
+        self._build_format(fmt)
         fmt_ranges = self.ranges[fmt]
         available_pos = [p for p in OPEN_RANGE_POSITIONS if p in fmt_ranges]
         if not available_pos:
             return None
 
         pos = position if position in available_pos else random.choice(available_pos)
-        range_data = fmt_ranges[pos]
         weights    = self.weights[fmt][pos]
         skip       = recent or set()
 
@@ -425,41 +607,70 @@ class OpenRangeQuizManager:
 
         names, wts = zip(*pool)
         idx  = random.choices(range(len(names)), weights=list(wts), k=1)[0]
-        hand = names[idx]
+        return self.build_question(fmt, pos, names[idx])
 
-        raise_h = range_data["raise"]
-        allin_h = range_data.get("allin", frozenset())
-        call_h  = range_data["call"]
-        mixed_h = range_data.get("mixed", frozenset())
-
-        if hand in allin_h:
-            action = "Push"
-        elif hand in raise_h:
-            action = "Open"
-        elif hand in call_h:
-            action = "Call"
-        else:
-            action = "Fold"
+    def build_question(
+        self, fmt: str, pos: str, hand: str,
+    ) -> Optional[OpenRangeQuestion]:
+        """Rebuild a question from its (format, position, hand) reference."""
+        slot = self._slot(fmt, pos)
+        if slot is None or hand not in _HAND_RANK:
+            return None
+        return OpenRangeQuestion(slot, hand)
 
-        all_play = raise_h | allin_h | call_h
-        is_bnd = _is_grid_boundary(hand, all_play)
 
-        return OpenRangeQuestion(
-            format_key=fmt,
-            format_name=self.FORMATS.get(fmt, fmt),
-            position=pos,
-            hand=hand,
-            hand_display=hand_to_display(hand),
-            correct_action=action,
-            in_range_hands=all_play,
-            raise_hands=raise_h,
-            allin_hands=allin_h,
-            call_hands=call_h,
-            mixed_hands=mixed_h,
-            mixed_pcts=range_data.get("mixed_pcts", {}),
-            is_boundary=is_bnd,
-            range_pcts=_compute_range_pcts(
-                raise_h, allin_h, call_h,
-                range_data.get("mixed_pcts", {}),
-            ),
-        )
+# ─── Corrections (the Fix buttons) ────────────────────────────────────────────
+
+def _corrections_stamp() -> Optional[tuple]:
+    try:
+        st = (DATA_DIR / "corrections.json").stat()
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def update_corrections(edit) -> dict:
+    """Read-modify-write corrections.json; `edit` changes the dict in place.
+
+    Sharded workers share the file: the lock serializes their Fixes, and
+    the new file replaces the old one atomically, so nobody reads it
+    half-written. Other workers pick it up via corrections_changed().
+    """
+    path = DATA_DIR / "corrections.json"
+    with open(path.with_name(path.name + ".lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        corrections = json.loads(path.read_bytes()) if path.exists() else {}
+        edit(corrections)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(corrections, f, indent=2)
+        os.replace(tmp, path)
+    return corrections
+
+
+# ─── Preloading (bot/prefork.py) ──────────────────────────────────────────────
+
+# (QuizManager, OpenRangeQuizManager) loaded before the workers were
+# forked; shared copy-on-write by all of them
+_preloaded: Optional[tuple] = None
+
+
+def preload_quiz_data():
+    """Load every scenario, EV table, range format and slot up front."""
+    global _preloaded
+    quiz_manager = QuizManager()
+    open_range_quiz = OpenRangeQuizManager(quiz_manager.ev_tables)
+    open_range_quiz.build_all()
+    _preloaded = (quiz_manager, open_range_quiz)
+
+
+def load_quiz_data(lazy: bool = False) -> tuple[QuizManager, OpenRangeQuizManager]:
+    """The quiz managers: the preloaded ones if any, else freshly loaded.
+
+    A worker forked after a Fix changed corrections.json loads its own
+    copy, so it starts from the corrected ranges like a fresh process.
+    """
+    if _preloaded is not None and not _preloaded[1].corrections_changed():
+        return _preloaded[0], _preloaded[1]
+    quiz_manager = QuizManager(lazy=lazy)
+    return quiz_manager, OpenRangeQuizManager(quiz_manager.ev_tables, lazy=lazy)
@@ -0,0 +1,66 @@
+"""Async rate limiting for outgoing Bot API calls."""
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens/s, holding at most `capacity`.
+
+    The default capacity of one token means no bursts: sends are spaced
+    1/rate apart, which keeps Telegram's sliding one-second window happy.
+
+    Waiters are served FIFO. `pause(seconds)` empties the bucket and holds
+    every waiter for that long — used when Telegram answers 429 RetryAfter,
+    which means the whole bot is over its budget, not just one request.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else 1.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0
+        self._updated = self._paused_until
+
+
+class ChatPacer:
+    """Minimum spacing between sends to the same chat (Telegram allows ~1/s)."""
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self._next: dict[int, float] = {}
+
+    async def wait(self, chat_id: int):
+        now = time.monotonic()
+        due = self._next.get(chat_id, 0.0)
+        self._next[chat_id] = max(now, due) + self.interval
+        if due > now:
+            await asyncio.sleep(due - now)
+
+    def prune(self):
+        """Drop chats whose spacing window has passed."""
+        now = time.monotonic()
+        self._next = {c: t for c, t in self._next.items() if t > now}
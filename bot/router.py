@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""Update router for sharded deployments.
+
+    SHARD_COUNT=4 python bot/router.py
+
+Spawns SHARD_COUNT workers (bot/main.py in webhook mode on
+127.0.0.1:WORKER_BASE_PORT + i) and forwards every update, as the raw
+JSON Telegram sent, to worker `user_id % SHARD_COUNT`. A user's updates
+therefore always reach the same worker, which owns that user's
+in-memory quiz state, and arrive in order. Group chats go by chat id
+instead, so one worker holds the chat's shared quiz round.
+
+With PRELOAD_WORKERS=1 the workers are forked from one bot/prefork.py
+process that loaded the quiz data first, so they share it copy-on-write
+instead of each loading its own.
+
+Updates come in the way BOT_MODE says: long-polling getUpdates, or a
+public webhook served by the router itself. Each worker has an in-memory
+backlog; while a worker is down (crashed, restarting) its updates wait
+there and are retried until delivered. A worker takes an update before
+its handlers run, so the router also keeps it in flight until the worker
+reports it processed; if the worker dies first, the update goes back to
+the front of the backlog for its restarted process (see webhook.py).
+Delivery is therefore at least once: an update processed just before a
+crash, but not yet reported, runs again. When a backlog is full the router
+pushes back on Telegram instead of dropping: polling stops advancing the
+offset, and webhook POSTs get 503 so Telegram redelivers later.
+"""
+import asyncio
+import hmac
+import json
+import logging
+import os
+import secrets
+import signal
+import sys
+import time
+from collections import deque
+from pathlib import Path
+
+import httpx
+
+from config import (
+    TELEGRAM_BOT_TOKEN, BOT_MODE, BOT_API_BASE_URL, BOT_API_RATE_PER_SEC, DATA_DIR,
+    SHARD_COUNT, WORKER_BASE_PORT, ROUTER_MAX_BACKLOG, PRELOAD_WORKERS,
+    WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_URL, WEBHOOK_SECRET,
+    WEBHOOK_MAX_CONNECTIONS,
+)
+from httpserver import HttpServer, Request, Response
+from logsetup import setup_logging_from_config
+from webhook import BOOT_HEADER, SECRET_HEADER
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = Path(__file__).parent / "main.py"
+PREFORK_SCRIPT = Path(__file__).parent / "prefork.py"
+WORKER_PATH = "/update"
+# Delay between delivery retries to a worker that is down
+RETRY_MIN_SEC, RETRY_MAX_SEC = 0.05, 2.0
+# With nothing to send but updates in flight, ask the worker this often
+ACK_POLL_SEC = 0.2
+# A worker that exits is restarted after this long
+RESTART_DELAY_SEC = 1.0
+GROUP_CHAT_TYPES = ("group", "supergroup")
+
+
+def update_routing_key(update: dict) -> int:
+    """The user an update belongs to (falls back to the chat, then 0).
+
+    Group chats are keyed by the chat: a group quiz round lives in one
+    worker, and every member's answer has to reach it.
+    """
+    for key, value in update.items():
+        if key == "update_id" or not isinstance(value, dict):
+            continue
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if chat and chat.get("type") in GROUP_CHAT_TYPES:
+            return chat["id"]
+        user = value.get("from") or value.get("user")
+        if user:
+            return user["id"]
+        if chat:
+            return chat["id"]
+    return 0
+
+
+def shard_of(key: int, count: int) -> int:
+    return key % count
+
+
+class WorkerLink:
+    """Ordered, retrying delivery of raw updates to one worker.
+
+    An update moves from `backlog` to `inflight` once the worker has taken
+    it, and leaves `inflight` once a later answer lists it as processed.
+    """
+
+    def __init__(self, index: int, url: str, secret: str, max_backlog: int):
+        self.index = index
+        self.url = url
+        self.secret = secret
+        self.max_backlog = max_backlog
+        self.backlog: deque[tuple[int, bytes]] = deque()     # (update_id, body)
+        self.inflight: dict[int, bytes] = {}
+        self.boot = ""      # the worker process that holds `inflight`
+        self._ready = asyncio.Event()
+        self.delivered = 0
+        self.retries = 0
+        self.redelivered = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self.backlog) + len(self.inflight)
+
+    @property
+    def full(self) -> bool:
+        return self.pending >= self.max_backlog
+
+    def put(self, update_id: int, body: bytes):
+        self.backlog.append((update_id, body))
+        self._ready.set()
+
+    def _acked(self, ack: dict):
+        if ack["boot"] != self.boot:
+            if self.inflight:
+                # A new process: what the old one had taken is gone, and goes first
+                logger.warning(f"Worker {self.index} restarted with {len(self.inflight)} "
+                               f"update(s) unprocessed; resending")
+                self.backlog.extendleft(reversed(self.inflight.items()))
+                self.redelivered += len(self.inflight)
+                self.inflight.clear()
+            self.boot = ack["boot"]
+        for update_id in ack["processed"]:
+            self.inflight.pop(update_id, None)
+
+    async def _idle(self) -> bool:
+        """Wait for updates to send; False if it is time to poll for acks instead."""
+        self._ready.clear()
+        if not self.inflight:
+            await self._ready.wait()
+            return True
+        try:
+            await asyncio.wait_for(self._ready.wait(), ACK_POLL_SEC)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def run(self, client: httpx.AsyncClient):
+        delay = RETRY_MIN_SEC
+        while True:
+            if not self.backlog and await self._idle():
+                continue
+            headers = {SECRET_HEADER: self.secret, BOOT_HEADER: self.boot}
+            sending = self.backlog[0] if self.backlog else None
+            try:
+                if sending:
+                    r = await client.post(self.url, content=sending[1], headers={
+                        **headers, "Content-Type": "application/json"})
+                else:
+                    r = await client.get(self.url, headers=headers)
+                status = r.status_code
+                if status in (200, 409, 503):
+                    self._acked(r.json())
+            except (httpx.HTTPError, ValueError, KeyError):
+                status = None
+            if sending and status in (200, 400):
+                if status == 400:
+                    # The worker can never accept it; retrying would wedge the shard
+                    logger.warning(f"Worker {self.index} rejected an update as malformed")
+                else:
+                    self.inflight[sending[0]] = sending[1]
+                    self.delivered += 1
+                self.backlog.popleft()
+            if status in (200, 400, 409):
+                delay = RETRY_MIN_SEC
+            else:
+                self.retries += 1
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RETRY_MAX_SEC)
+
+
+def shard_env(index: int, port: int, state_dir: Path) -> dict:
+    """The settings that differ from one worker to the next."""
+    return {
+        "SHARD_INDEX": str(index),
+        "WEBHOOK_PORT": str(port),
+        "STATE_DB_PATH": str(state_dir / f"bot_state.shard{index}.db"),
+    }
+
+
+class WorkerProcess:
+    """One bot/main.py worker, restarted whenever it exits."""
+
+    def __init__(self, index: int, count: int, port: int, secret: str,
+                 env: dict = None, state_dir: Path = DATA_DIR):
+        self.name = f"Worker {index}"
+        self.port = port
+        self.argv = [sys.executable, str(WORKER_SCRIPT)]
+        self.env = {
+            **os.environ,
+            **(env or {}),
+            "BOT_MODE": "webhook",
+            "WEBHOOK_LISTEN": "127.0.0.1",
+            "WEBHOOK_PATH": WORKER_PATH,
+            "WEBHOOK_URL": "",
+            "WEBHOOK_SECRET": secret,
+            "SHARD_COUNT": str(count),
+            # The Bot API budget is per bot, so workers split it
+            "BOT_API_RATE_PER_SEC": str(BOT_API_RATE_PER_SEC / count),
+            **shard_env(index, port, state_dir),
+        }
+        self.proc: asyncio.subprocess.Process | None = None
+        self.restarts = 0
+        self._stopping = False
+
+    async def start(self):
+        self.proc = await asyncio.create_subprocess_exec(*self.argv, env=self.env)
+        logger.info(f"{self.name} started (pid {self.proc.pid}, port {self.port})")
+
+    async def supervise(self):
+        while not self._stopping:
+            code = await self.proc.wait()
+            if self._stopping:
+                return
+            logger.warning(f"{self.name} exited with {code}; restarting")
+            await asyncio.sleep(RESTART_DELAY_SEC)
+            if self._stopping:
+                return
+            self.restarts += 1
+            await self.start()
+
+    async def stop(self, timeout: float = 10.0):
+        self._stopping = True
+        if self.proc is None or self.proc.returncode is not None:
+            return
+        self.proc.terminate()
+        try:
+            await asyncio.wait_for(self.proc.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.proc.kill()
+            await self.proc.wait()
+
+
+class WorkerPool(WorkerProcess):
+    """All the workers as one bot/prefork.py process.
+
+    It loads the quiz data once and forks the workers from it (and forks
+    them again when they exit); the router restarts the pool as a whole
+    only if the pool itself exits.
+    """
+
+    def __init__(self, count: int, base_port: int, secret: str,
+                 env: dict = None, state_dir: Path = DATA_DIR):
+        super().__init__(0, count, base_port, secret, env, state_dir)
+        self.name = "Worker pool"
+        self.argv = [sys.executable, str(PREFORK_SCRIPT), "--workers", str(count),
+                     "--base-port", str(base_port), "--state-dir", str(state_dir)]
+
+
+class Router:
+    def __init__(
+        self,
+        token: str,
+        shard_count: int = SHARD_COUNT,
+        base_port: int = WORKER_BASE_PORT,
+        mode: str = BOT_MODE,
+        api_base_url: str = BOT_API_BASE_URL,
+        listen: str = WEBHOOK_LISTEN,
+        port: int = WEBHOOK_PORT,
+        path: str = WEBHOOK_PATH,
+        webhook_url: str = WEBHOOK_URL,
+        webhook_secret: str = WEBHOOK_SECRET,
+        max_backlog: int = ROUTER_MAX_BACKLOG,
+        worker_env: dict = None,
+        state_dir: Path = DATA_DIR,
+        preload: bool = PRELOAD_WORKERS,
+    ):
+        self.token = token
+        self.shard_count = shard_count
+        self.mode = mode
+        self.api_url = f"{api_base_url}{token}"
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret.encode()
+        # Router <-> worker traffic is authenticated with a per-run secret
+        internal_secret = secrets.token_urlsafe(24)
+        worker_env = {**(worker_env or {}), "TELEGRAM_BOT_TOKEN": token}
+        if preload:
+            self.workers = [WorkerPool(shard_count, base_port, internal_secret,
+                                       worker_env, state_dir)]
+        else:
+            self.workers = [
+                WorkerProcess(i, shard_count, base_port + i, internal_secret,
+                              worker_env, state_dir)
+                for i in range(shard_count)
+            ]
+        self.links = [
+            WorkerLink(i, f"http://127.0.0.1:{base_port + i}{WORKER_PATH}",
+                       internal_secret, max_backlog)
+            for i in range(shard_count)
+        ]
+        self.http = HttpServer(listen, port)
+        self.http.route("POST", path, self._receive)
+        self.routed = 0
+        self._client: httpx.AsyncClient | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    def dispatch(self, body: bytes, update: dict) -> bool:
+        """Queue one raw update for its worker; False if that backlog is full."""
+        link = self.links[shard_of(update_routing_key(update), self.shard_count)]
+        if link.full:
+            return False
+        link.put(update.get("update_id"), body)
+        self.routed += 1
+        return True
+
+    async def _receive(self, req: Request) -> Response:
+        if self.webhook_secret:
+            given = req.headers.get(SECRET_HEADER, "").encode()
+            if not hmac.compare_digest(given, self.webhook_secret):
+                return Response(403)
+        try:
+            update = req.json()
+        except ValueError:
+            return Response(400)
+        if not isinstance(update, dict):
+            return Response(400)
+        return Response(200 if self.dispatch(req.body, update) else 503)
+
+    async def _api(self, method: str, **params):
+        r = await self._client.post(f"{self.api_url}/{method}", json=params,
+                                    timeout=httpx.Timeout(60.0))
+        body = r.json()
+        if not body.get("ok"):
+            raise RuntimeError(f"{method} failed: {body.get('description')}")
+        return body["result"]
+
+    async def _poll(self):
+        offset = None
+        while True:
+            if any(link.full for link in self.links):
+                # Leave updates with Telegram until the backlog drains
+                await asyncio.sleep(0.5)
+                continue
+            try:
+                updates = await self._api("getUpdates", offset=offset, timeout=30)
+            except (httpx.HTTPError, RuntimeError, ValueError) as e:
+                logger.warning(f"getUpdates failed: {e}")
+                await asyncio.sleep(2)
+                continue
+            for update in updates:
+                body = json.dumps(update, separators=(",", ":")).encode()
+                if not self.dispatch(body, update):
+                    break  # its shard is full; re-fetch from here later
+                offset = update["update_id"] + 1
+
+    async def start(self):
+        self._client = httpx.AsyncClient(timeout=httpx.Timeout(10.0))
+        for worker in self.workers:
+            await worker.start()
+            self._tasks.append(asyncio.create_task(worker.supervise()))
+        for link in self.links:
+            self._tasks.append(asyncio.create_task(link.run(self._client)))
+
+        if self.mode == "webhook":
+            await self.http.start()
+            if self.webhook_url:
+                await self._api(
+                    "setWebhook", url=self.webhook_url,
+                    secret_token=self.webhook_secret.decode() or None,
+                    max_connections=WEBHOOK_MAX_CONNECTIONS,
+                )
+                logger.info(f"Webhook registered: {self.webhook_url}")
+        else:
+            await self._api("deleteWebhook")
+            self._tasks.append(asyncio.create_task(self._poll()))
+        logger.info(f"Routing updates to {self.shard_count} worker(s) ({self.mode})")
+
+    async def drain(self, timeout: float = 10.0):
+        """Wait until every queued update was processed by its worker."""
+        deadline = time.monotonic() + timeout
+        while any(link.pending for link in self.links) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+    async def stop(self):
+        await self.http.stop()
+        await self.drain()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.gather(*(w.stop() for w in self.workers))
+        await self._client.aclose()
+        lost = sum(link.pending for link in self.links)
+        if lost:
+            logger.warning(f"{lost} update(s) still queued or unprocessed at shutdown")
+
+    def stats(self) -> dict:
+        return {
+            "routed": self.routed,
+            "delivered": [link.delivered for link in self.links],
+            "backlog": [len(link.backlog) for link in self.links],
+            "inflight": [len(link.inflight) for link in self.links],
+            "retries": [link.retries for link in self.links],
+            "redelivered": [link.redelivered for link in self.links],
+            "restarts": [w.restarts for w in self.workers],
+        }
+
+
+def main():
+    setup_logging_from_config()
+    if not TELEGRAM_BOT_TOKEN:
+        logger.error("TELEGRAM_BOT_TOKEN not set!")
+        return
+
+    async def _serve():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        router = Router(TELEGRAM_BOT_TOKEN)
+        await router.start()
+        try:
+            await stop.wait()
+        finally:
+            await router.stop()
+            logger.info(f"Router stopped: {router.stats()}")
+
+    asyncio.run(_serve())
+
+
+if __name__ == "__main__":
+    main()
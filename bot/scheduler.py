@@ -0,0 +1,286 @@
+"""Priority scheduling of outgoing Bot API calls.
+
+Installed as the application's rate limiter, so every request the bot
+makes (replies, edits, charts, broadcasts) passes through one queue that
+draws from the shared TokenBucket. When a token frees up, the waiting
+request of the most urgent class goes first:
+
+    CALLBACK  answerCallbackQuery — the spinner on the user's button
+    COMMAND   replies and edits in response to a user
+    CHART     photos (range charts)
+    BROADCAST auto-quiz fan-out (callers pass rate_limit_args=BROADCAST)
+
+so a 10k-subscriber broadcast only ever fills the gaps between
+interactive traffic. Requests to the same chat are sent one at a time in
+the order they were made; a chat's queue runs at the priority of its most
+urgent request, so an urgent reply is never stuck behind the chat's own
+broadcast message. Queue depth and wait time are tracked per class.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Optional
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+import tracing
+from metrics import API_CALLS, API_SECONDS, API_QUEUE_DEPTH, API_QUEUE_WAIT_P99
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    CALLBACK = 0
+    COMMAND = 1
+    CHART = 2
+    BROADCAST = 3
+
+
+# Not chat traffic and not subject to the message budget
+UNSCHEDULED = frozenset({
+    "getMe", "getUpdates", "setWebhook", "deleteWebhook", "getWebhookInfo",
+    "setMyCommands", "deleteMyCommands", "logOut", "close",
+})
+MEDIA_ENDPOINTS = frozenset({
+    "sendPhoto", "sendDocument", "sendMediaGroup", "sendAnimation", "sendVideo",
+})
+# Recent wait times kept per class for percentiles
+WAIT_SAMPLES = 4096
+
+
+def classify(endpoint: str, rate_limit_args: Any = None) -> Optional[Priority]:
+    """Priority class of a request; None if it bypasses the scheduler."""
+    if endpoint in UNSCHEDULED:
+        return None
+    if rate_limit_args is not None:
+        return Priority(rate_limit_args)
+    if endpoint == "answerCallbackQuery":
+        return Priority.CALLBACK
+    if endpoint in MEDIA_ENDPOINTS:
+        return Priority.CHART
+    return Priority.COMMAND
+
+
+@dataclass
+class _Job:
+    priority: Priority
+    seq: int
+    call: Any                  # zero-argument coroutine function
+    endpoint: str
+    future: asyncio.Future
+    enqueued: float
+    started: float = 0.0       # last time the dispatcher sent it
+    attempts: int = 0
+
+
+@dataclass
+class ClassStats:
+    depth: int = 0
+    sent: int = 0
+    waits: deque = field(default_factory=lambda: deque(maxlen=WAIT_SAMPLES))
+
+    def percentile(self, p: float) -> float:
+        values = sorted(self.waits)
+        return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+async def _timed_call(endpoint: str, call):
+    """Await one Bot API request, counting it by outcome and timing it."""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        return await call
+    except RetryAfter:
+        outcome = "retry_after"
+        raise
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        API_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+        API_CALLS.labels(endpoint, outcome).inc()
+
+
+class OutboundScheduler(BaseRateLimiter):
+    """Rate limiter that orders requests by priority, FIFO within a chat.
+
+    `max_retries` is how often a request answered with 429 RetryAfter is
+    requeued (at the head of its chat) after pausing the limiter.
+    """
+
+    def __init__(self, limiter: TokenBucket, max_retries: int = 3):
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.classes = {p: ClassStats() for p in Priority}
+        self._queues: dict[Any, deque[_Job]] = {}
+        self._busy: set = set()
+        self._ready: list[tuple] = []            # (priority, seq, key) heap
+        self._ready_prio: dict[Any, int] = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: set[asyncio.Task] = set()
+        for p, stats in self.classes.items():
+            API_QUEUE_DEPTH.labels(p.name.lower()).set_function(lambda s=stats: s.depth)
+            API_QUEUE_WAIT_P99.labels(p.name.lower()).set_function(
+                lambda s=stats: s.percentile(0.99))
+
+    def queue_stats(self) -> dict:
+        """Queued requests per priority, chats with a queue, calls in flight."""
+        return {"depth": {p.name.lower(): s.depth for p, s in self.classes.items()},
+                "chats": len(self._queues), "inflight": len(self._inflight)}
+
+    async def initialize(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._dispatch())
+
+    async def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for queue in self._queues.values():
+            for job in queue:
+                if not job.future.done():
+                    job.future.cancel()
+        self._queues.clear()
+        self._busy.clear()
+        self._ready.clear()
+        self._ready_prio.clear()
+        for stats in self.classes.values():
+            stats.depth = 0
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        priority = classify(endpoint, rate_limit_args)
+        with tracing.span(tracing.api_span_name(endpoint)) as span:
+            if priority is None:
+                return await _timed_call(endpoint, callback(*args, **kwargs))
+            seq = next(self._seq)
+            # answerCallbackQuery carries no chat: it is ordered against nothing
+            key = data.get("chat_id")
+            if key is None:
+                key = ("unordered", seq)
+            job = _Job(priority, seq, lambda: callback(*args, **kwargs), endpoint,
+                       asyncio.get_running_loop().create_future(), time.monotonic())
+            self._submit(key, job)
+            try:
+                return await job.future
+            finally:
+                # The call itself runs on the dispatcher; split off the queueing
+                span.set("priority", priority.name.lower())
+                if job.started:
+                    span.set("queue_ms", round((job.started - job.enqueued) * 1000, 3))
+                if job.attempts:
+                    span.set("retries", job.attempts)
+
+    # -- queueing -------------------------------------------------------
+
+    def _submit(self, key, job: _Job):
+        self._queues.setdefault(key, deque()).append(job)
+        self.classes[job.priority].depth += 1
+        if key not in self._busy and job.priority < self._ready_prio.get(key, len(Priority)):
+            self._push_ready(key)
+
+    def _push_ready(self, key):
+        queue = self._queues[key]
+        priority = min(job.priority for job in queue)
+        self._ready_prio[key] = priority
+        heapq.heappush(self._ready, (priority, queue[0].seq, key))
+        self._wakeup.set()
+
+    def _peek_ready(self):
+        """Drop stale heap entries; the best ready chat key, or None."""
+        while self._ready:
+            priority, _, key = self._ready[0]
+            if key not in self._busy and self._ready_prio.get(key) == priority:
+                return key
+            heapq.heappop(self._ready)
+        return None
+
+    async def _dispatch(self):
+        while True:
+            if self._peek_ready() is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            await self.limiter.acquire()
+            key = self._peek_ready()
+            if key is None:
+                continue
+            heapq.heappop(self._ready)
+            del self._ready_prio[key]
+            job = self._queues[key].popleft()
+            stats = self.classes[job.priority]
+            stats.depth -= 1
+            if job.future.done():          # caller gave up while queued
+                self._release(key)
+                continue
+            stats.sent += 1
+            job.started = time.monotonic()
+            stats.waits.append(job.started - job.enqueued)
+            self._busy.add(key)
+            task = asyncio.create_task(self._run(key, job))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _run(self, key, job: _Job):
+        try:
+            result = await _timed_call(job.endpoint, job.call())
+        except RetryAfter as e:
+            delay = e.retry_after
+            delay = delay.total_seconds() if hasattr(delay, "total_seconds") else float(delay)
+            self.limiter.pause(delay)
+            if job.attempts < self.max_retries and not job.future.done():
+                job.attempts += 1
+                self._queues[key].appendleft(job)
+                self.classes[job.priority].depth += 1
+                logger.debug(f"429 for {key}: retry in {delay:.1f}s")
+            elif not job.future.done():
+                job.future.set_exception(e)
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._busy.discard(key)
+            self._release(key)
+
+    def _release(self, key):
+        if self._queues.get(key):
+            self._push_ready(key)
+        else:
+            self._queues.pop(key, None)
+
+    # -- metrics --------------------------------------------------------
+
+    def stats(self) -> dict:
+        """Per class: queued requests, sent count and wait-time percentiles (s)."""
+        return {
+            p.name.lower(): {
+                "depth": s.depth,
+                "sent": s.sent,
+                "wait_p50": s.percentile(0.5),
+                "wait_p99": s.percentile(0.99),
+                "wait_max": max(s.waits, default=0.0),
+            }
+            for p, s in self.classes.items()
+        }
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{name} depth={s['depth']} sent={s['sent']} p99={s['wait_p99'] * 1000:.0f}ms"
+            for name, s in self.stats().items()
+        )
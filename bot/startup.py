@@ -0,0 +1,53 @@
+"""Startup phase timings.
+
+main.py marks each phase as it finishes; post_init logs them as one line
+once the bot is about to take updates:
+
+    Startup: imports 231 ms, quiz data 2 ms, bankroll db 4 ms, ... = 268 ms
+    (+41 ms interpreter start)
+
+The interpreter start (from process creation to this module's import) is
+read from /proc where available.
+"""
+import os
+import time
+
+
+def _process_age() -> float:
+    """Seconds since this process was created (0 if unknown)."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22, after the parenthesised command name
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.before = _process_age()
+        self.start = self._last = time.perf_counter()
+        self.phases: list[tuple[str, float]] = []
+
+    def mark(self, name: str):
+        """Close the phase running since the previous mark."""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    @property
+    def elapsed(self) -> float:
+        return self._last - self.start
+
+    def summary(self) -> str:
+        parts = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases)
+        line = f"Startup: {parts} = {self.elapsed * 1000:.0f} ms"
+        if self.before:
+            line += f" (+{self.before * 1000:.0f} ms interpreter start)"
+        return line
+
+
+STARTUP = PhaseTimer()
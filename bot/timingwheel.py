@@ -0,0 +1,92 @@
+"""Hashed timing wheel: O(1) schedule/cancel, O(due) per tick.
+
+Time is cut into ticks of `tick_sec`; a key due at time t sits in slot
+floor(t / tick_sec) % slots. Advancing the wheel visits only the slots
+for the ticks that passed, so as long as nothing is scheduled further
+out than one revolution (slots * tick_sec), every key a tick touches is
+actually due. Keys further out stay in their slot until their round
+comes (correct, just not free).
+"""
+from typing import Hashable, Iterator
+
+
+class TimingWheel:
+    def __init__(self, tick_sec: float, slots: int, now: float):
+        self.tick_sec = tick_sec
+        self._slots: list[dict | None] = [None] * slots
+        self._where: dict[Hashable, int] = {}     # key -> slot index, or -1 (overdue)
+        self._overdue: dict[Hashable, float] = {}
+        self._tick = int(now // tick_sec)          # last tick advanced past
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, key) -> bool:
+        return key in self._where
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._where)
+
+    def schedule(self, key, due: float):
+        """(Re)schedule `key` at time `due`. Past times fire on the next advance."""
+        self.cancel(key)
+        tick = int(due // self.tick_sec)
+        if tick <= self._tick:
+            self._overdue[key] = due
+            self._where[key] = -1
+            return
+        index = tick % len(self._slots)
+        bucket = self._slots[index]
+        if bucket is None:
+            bucket = self._slots[index] = {}
+        bucket[key] = due
+        self._where[key] = index
+
+    def cancel(self, key) -> bool:
+        index = self._where.pop(key, None)
+        if index is None:
+            return False
+        if index < 0:
+            del self._overdue[key]
+        else:
+            bucket = self._slots[index]
+            del bucket[key]
+            if not bucket:
+                self._slots[index] = None
+        return True
+
+    def due_time(self, key) -> float | None:
+        index = self._where.get(key)
+        if index is None:
+            return None
+        return self._overdue[key] if index < 0 else self._slots[index][key]
+
+    def advance(self, now: float) -> list:
+        """Remove and return every key due up to the end of `now`'s tick.
+
+        Keys fire at tick granularity: up to `tick_sec` early, never late.
+        """
+        out = list(self._overdue)
+        for key in out:
+            del self._where[key]
+        self._overdue.clear()
+
+        target = int(now // self.tick_sec)
+        horizon = (target + 1) * self.tick_sec
+        n = len(self._slots)
+        # After a stall longer than a revolution, every slot is in play once
+        ticks = range(self._tick + 1, target + 1) if target - self._tick < n else range(n)
+        for tick in ticks:
+            index = tick % n
+            bucket = self._slots[index]
+            if bucket is None:
+                continue
+            fired = [key for key, due in bucket.items() if due < horizon]
+            for key in fired:
+                del bucket[key]
+                del self._where[key]
+            if not bucket:
+                self._slots[index] = None
+            out.extend(fired)
+        self._tick = max(self._tick, target)
+        return out
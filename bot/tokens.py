@@ -0,0 +1,89 @@
+"""Signed, stateless question tokens carried in callback_data.
+
+An answer button says everything needed to score it, so any worker can
+verify and score an answer without server-side pending state:
+
+    q:<base64url(kind | snapshot | ref | hand | action | seq | mac)>
+
+- kind      1 byte   RFI or narrative scenario
+- snapshot  4 bytes  prefix of the quiz data snapshot_version the
+                     question was drawn from (stale data → rejected)
+- ref       2 bytes  format/position slot or scenario index
+- hand      1 byte   index into ALL_HANDS_169
+- action    1 byte   which button
+- seq       6 bytes  issue time in ms; answers must be newer than the
+                     user's last answered seq (replay protection)
+- mac       8 bytes  truncated HMAC-SHA256 over the chat id, the user
+                     the question was issued to (ANY_USER for a group
+                     round) + the above
+
+33 bytes in total, well under Telegram's 64-byte callback_data limit.
+"""
+import base64
+import hmac
+import struct
+from dataclasses import dataclass
+from hashlib import sha256
+
+TOKEN_PREFIX = "q:"
+KIND_RFI = 1
+KIND_SCENARIO = 2
+# Recipient of a group round's buttons: any member may answer
+ANY_USER = 0
+
+MAC_BYTES = 8
+SEQ_BYTES = 6
+_HEADER = struct.Struct(">B4sHBB")
+_BODY_LEN = _HEADER.size + SEQ_BYTES
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class QuestionToken:
+    kind: int
+    snapshot: bytes     # 4 bytes, see snapshot_id()
+    ref: int
+    hand: int
+    action: int
+    seq: int
+
+
+def snapshot_id(snapshot_version: str) -> bytes:
+    """4-byte id of a quiz data snapshot (its hex version string)."""
+    return bytes.fromhex(snapshot_version[:8])
+
+
+class TokenSigner:
+    def __init__(self, secret: bytes):
+        self._secret = secret
+
+    def _mac(self, chat_id: int, user_id: int, body: bytes) -> bytes:
+        msg = chat_id.to_bytes(8, "big", signed=True) + user_id.to_bytes(8, "big") + body
+        return hmac.new(self._secret, msg, sha256).digest()[:MAC_BYTES]
+
+    def sign(self, chat_id: int, user_id: int, token: QuestionToken) -> str:
+        body = _HEADER.pack(token.kind, token.snapshot, token.ref, token.hand, token.action)
+        body += token.seq.to_bytes(SEQ_BYTES, "big")
+        raw = body + self._mac(chat_id, user_id, body)
+        return TOKEN_PREFIX + base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def verify(self, chat_id: int, user_id: int, data: str) -> QuestionToken:
+        """Decode a token issued to `user_id` in `chat_id`; raises InvalidToken."""
+        if not data.startswith(TOKEN_PREFIX):
+            raise InvalidToken("not a question token")
+        encoded = data[len(TOKEN_PREFIX):]
+        try:
+            raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+        except (ValueError, TypeError):
+            raise InvalidToken("bad encoding")
+        if len(raw) != _BODY_LEN + MAC_BYTES:
+            raise InvalidToken("bad length")
+        body, mac = raw[:_BODY_LEN], raw[_BODY_LEN:]
+        if not hmac.compare_digest(mac, self._mac(chat_id, user_id, body)):
+            raise InvalidToken("bad signature")
+        kind, snapshot, ref, hand, action = _HEADER.unpack(body[:_HEADER.size])
+        seq = int.from_bytes(body[_HEADER.size:], "big")
+        return QuestionToken(kind, snapshot, ref, hand, action, seq)
@@ -0,0 +1,229 @@
+"""Per-update tracing: span trees with head-based sampling, exported as JSONL.
+
+Every update handled by the bot is one trace. Whether it is recorded is
+decided once, when its root span opens (TRACE_SAMPLE_RATE); code below
+just opens spans, which cost a context-variable lookup when the trace is
+not sampled:
+
+    with tracing.span("db.record_answer"):
+        ...
+
+    @tracing.traced("render.chart")
+    def generate_open_range_chart(...): ...
+
+Spans nest through a ContextVar, so they follow the update across awaits
+and into tasks it creates. Timings are perf_counter based, relative to
+the trace start. A finished sampled trace is one JSON line:
+
+    {"trace": "5f1c...", "ts": 1700000000.123, "root": "update",
+     "duration_ms": 412.0, "spans": [
+        {"id": 0, "parent": null, "name": "update", "start_ms": 0.0,
+         "duration_ms": 412.0, "attrs": {"type": "callback_query"}}, ...]}
+
+handed to a QueueHandler; a QueueListener thread writes it to a rotating
+file, so exporting never blocks the event loop. scripts/trace_summary.py
+reads the files back.
+"""
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import re
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+_export_logger = logging.getLogger("bot.trace")
+_export_logger.propagate = False
+_listener: Optional[QueueListener] = None
+_sample_rate = 0.0
+
+# Marks "inside an update that is not sampled": nested spans stay no-ops
+_UNSAMPLED = object()
+_current: ContextVar = ContextVar("trace_span", default=None)
+
+
+class _Trace:
+    __slots__ = ("id", "ts", "start", "spans")
+
+    def __init__(self):
+        self.id = os.urandom(8).hex()
+        self.ts = time.time()
+        self.start = time.perf_counter()
+        self.spans: list[_Span] = []
+
+
+class _Span:
+    __slots__ = ("trace", "id", "parent", "name", "start", "end", "attrs")
+
+    def __init__(self, trace: _Trace, parent: Optional["_Span"], name: str, attrs: dict):
+        self.trace = trace
+        self.id = len(trace.spans)
+        self.parent = parent.id if parent is not None else None
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end = None
+        trace.spans.append(self)
+
+
+class span:
+    """Context manager: a child of the current span, or a new (sampled?) root."""
+    __slots__ = ("name", "attrs", "_span", "_token")
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        parent = _current.get()
+        if parent is _UNSAMPLED:
+            self._span = None
+            self._token = None
+            return self
+        if parent is None:
+            if not _sample_rate or random.random() >= _sample_rate:
+                self._span = None
+                self._token = _current.set(_UNSAMPLED)
+                return self
+            self._span = _Span(_Trace(), None, self.name, self.attrs)
+        else:
+            self._span = _Span(parent.trace, parent, self.name, self.attrs)
+        self._token = _current.set(self._span)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        s = self._span
+        if self._token is not None:
+            _current.reset(self._token)
+        if s is None:
+            return
+        s.end = time.perf_counter()
+        if exc_type is not None:
+            s.attrs["error"] = exc_type.__name__
+        if s.parent is None:
+            _export(s.trace)
+
+    def set(self, key: str, value):
+        """Attach an attribute (only kept if the trace is sampled)."""
+        if self._span is not None:
+            self._span.attrs[key] = value
+
+
+def set_attr(key: str, value):
+    """Attach an attribute to the current span, if it is being recorded."""
+    current = _current.get()
+    if current is not None and current is not _UNSAMPLED:
+        current.attrs[key] = value
+
+
+def traced(name: str):
+    """Decorator: run the function (sync or async) inside `span(name)`."""
+    def decorate(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+_CAMEL = re.compile(r"(?<!^)(?=[A-Z])")
+
+
+def api_span_name(endpoint: str) -> str:
+    """sendPhoto -> api.send_photo"""
+    return "api." + _CAMEL.sub("_", endpoint).lower()
+
+
+def _export(trace: _Trace):
+    def ms(t):
+        return round((t - trace.start) * 1000, 3)
+
+    root = trace.spans[0]
+    record = {
+        "trace": trace.id,
+        "ts": round(trace.ts, 3),
+        "root": root.name,
+        "duration_ms": round((root.end - root.start) * 1000, 3),
+        "spans": [
+            {"id": s.id, "parent": s.parent, "name": s.name, "start_ms": ms(s.start),
+             # Spans still open when the root closed (detached tasks) end with it
+             "duration_ms": round(((s.end or root.end) - s.start) * 1000, 3),
+             # Copied: a detached span can still set_attr while the writer
+             # thread serializes this record
+             "attrs": dict(s.attrs)}
+            for s in trace.spans
+        ],
+    }
+    # _Enqueue: the line is formatted and written on the listener thread
+    _export_logger.info("%s", _Json(record))
+
+
+class _Json:
+    """Serialized lazily, on the writer thread (once: the rotation check
+    formats the record too)."""
+    __slots__ = ("record", "_line")
+
+    def __init__(self, record: dict):
+        self.record = record
+        self._line = None
+
+    def __str__(self) -> str:
+        if self._line is None:
+            self._line = json.dumps(self.record, separators=(",", ":"), default=str)
+        return self._line
+
+
+class _Enqueue(QueueHandler):
+    """QueueHandler that queues the record as is; QueueHandler.prepare
+    would format it (run the json.dumps) on the logging thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure(sample_rate: float, path, max_bytes: int = 10 << 20, backups: int = 5):
+    """Start exporting `sample_rate` of traces to `path` (rotated by size)."""
+    global _listener, _sample_rate
+    shutdown()
+    _sample_rate = max(0.0, min(1.0, sample_rate))
+    if not _sample_rate:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    file_handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                       encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter("%(message)s"))
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    _export_logger.handlers[:] = [_Enqueue(records)]
+    _export_logger.setLevel(logging.INFO)
+    _listener = QueueListener(records, file_handler)
+    _listener.start()
+
+
+def queue_depth() -> int:
+    """Traces waiting for the writer thread."""
+    return _listener.queue.qsize() if _listener is not None else 0
+
+
+def shutdown():
+    """Stop sampling and flush whatever is still queued to the file."""
+    global _listener, _sample_rate
+    _sample_rate = 0.0
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    _export_logger.handlers[:] = []
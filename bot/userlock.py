@@ -0,0 +1,103 @@
+"""Per-user serialization of update handling.
+
+With CONCURRENT_UPDATES > 1, PTB runs handlers for different updates at
+the same time — including two taps from the same user, which then race
+through the same awaits (an answer's result edit against the Next quiz,
+double taps on one button). UserSerialProcessor keeps the concurrency
+across users but runs each user's updates one at a time, in arrival
+order:
+
+- KeyedLock hands out one asyncio.Lock per key, created on first use and
+  dropped once nobody holds or waits for it, so idle users cost nothing
+- the concurrency limit is taken inside the user's lock, so a user
+  hammering a button queues behind their own updates without holding
+  any of the shared slots
+
+Each update is also the root span of its trace (see tracing.py); the time
+spent waiting for the user's lock and a slot is recorded on it.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Hashable, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+import tracing
+
+# Updates in flight (running or waiting for their user) before PTB itself
+# holds new ones back
+MAX_PENDING_UPDATES = 10_000
+
+
+class KeyedLock:
+    def __init__(self):
+        self._locks: dict[Hashable, list] = {}     # key -> [lock, holders + waiters]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+
+def update_user_key(update: Any) -> Optional[int]:
+    """The user an update is serialized on (the chat if there is no user)."""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user is not None:
+        return update.effective_user.id
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    return None
+
+
+def update_type(update: Any) -> str:
+    """'message', 'callback_query', ... for trace attributes."""
+    if isinstance(update, Update):
+        for kind in ("callback_query", "message", "edited_message", "my_chat_member"):
+            if getattr(update, kind) is not None:
+                return kind
+    return type(update).__name__
+
+
+class UserSerialProcessor(BaseUpdateProcessor):
+    """At most `max_concurrent` handlers at once, never two for one user."""
+
+    def __init__(self, max_concurrent: int):
+        super().__init__(MAX_PENDING_UPDATES)
+        self.max_concurrent = max_concurrent
+        self.locks = KeyedLock()
+        self._slots = asyncio.Semaphore(max_concurrent)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = update_user_key(update)
+        with tracing.span("update", type=update_type(update)) as root:
+            start = time.perf_counter()
+            if key is None:
+                async with self._slots:
+                    root.set("wait_ms", round((time.perf_counter() - start) * 1000, 3))
+                    await coroutine
+                return
+            async with self.locks.hold(key):
+                async with self._slots:
+                    root.set("wait_ms", round((time.perf_counter() - start) * 1000, 3))
+                    await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -0,0 +1,110 @@
+"""Bounded in-memory per-user quiz state.
+
+Each user who talks to the bot gets a UserState: recent RFI hands, recent
+scenario hands and the seq of the last question issued. Only recently
+active users stay resident:
+
+- every touch pushes the user's expiry to now + ttl on a TimingWheel;
+  `sweep(now)` evicts whoever expired, O(expired users) per call
+- past `max_users` residents the least recently used one is evicted
+  straight away (an OrderedDict in LRU order)
+- changes are written back, not through: touched users are marked dirty
+  and `spill_dirty()` hands them to the StateStore before its flush; an
+  evicted user is spilled on the way out, so the next touch reads the
+  same state back with StateStore.load_session()
+
+Whether a question is still open (blocks the next auto-quiz) is decided
+by its expiry, `open_until()`: the seq is the issue time in ms, so a
+question nobody answered stops counting after `pending_ttl` seconds.
+"""
+from collections import OrderedDict, deque
+
+from persistence import StateStore
+from timingwheel import TimingWheel
+
+
+class UserState:
+    __slots__ = ("recent", "recent_scenarios", "issued_seq")
+
+    def __init__(self, recent: deque, recent_scenarios: deque, issued_seq: int):
+        self.recent = recent                      # (position, hand)
+        self.recent_scenarios = recent_scenarios  # (scenario_id, hand)
+        self.issued_seq = issued_seq              # seq of the last question sent
+
+
+class UserStateCache:
+    def __init__(self, store: StateStore, ttl_sec: float, max_users: int, now: float,
+                 recent_limit: int = 50, pending_ttl_sec: float = 86400):
+        self.store = store
+        self.ttl_sec = ttl_sec
+        self.max_users = max(1, max_users)
+        self.recent_limit = recent_limit
+        self.pending_ttl_sec = pending_ttl_sec
+        self._users: OrderedDict[int, UserState] = OrderedDict()
+        self._dirty: set[int] = set()
+        # ~1000 slots whatever the TTL; eviction is up to one tick early
+        tick = max(1.0, ttl_sec / 1000)
+        self.wheel = TimingWheel(tick, int(ttl_sec / tick) + 2, now)
+        self.loads = self.expired = self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._users
+
+    def get(self, user_id: int, now: float) -> UserState:
+        """The user's state, read back from the store if not resident."""
+        state = self._users.get(user_id)
+        if state is None:
+            session = self.store.load_session(user_id)
+            state = UserState(deque(session.recent, maxlen=self.recent_limit),
+                              deque(session.recent_scenarios, maxlen=self.recent_limit),
+                              session.issued_seq)
+            self._users[user_id] = state
+            self.loads += 1
+            while len(self._users) > self.max_users:
+                self._evict(next(iter(self._users)))
+                self.evicted += 1
+        else:
+            self._users.move_to_end(user_id)
+        self.wheel.schedule(user_id, now + self.ttl_sec)
+        return state
+
+    def stats(self) -> dict:
+        return {"resident": len(self._users), "max": self.max_users, "dirty": len(self._dirty),
+                "ttl_sec": self.ttl_sec, "loads": self.loads, "expired": self.expired,
+                "evicted": self.evicted}
+
+    def mark_dirty(self, user_id: int):
+        self._dirty.add(user_id)
+
+    def open_until(self, state: UserState) -> float:
+        """When the last question issued stops blocking the next one (unix time)."""
+        return state.issued_seq / 1000 + self.pending_ttl_sec
+
+    def sweep(self, now: float) -> int:
+        """Evict users idle past the TTL; returns how many."""
+        expired = self.wheel.advance(now)
+        for user_id in expired:
+            self._evict(user_id)
+        self.expired += len(expired)
+        return len(expired)
+
+    def spill_dirty(self) -> int:
+        """Hand changed users to the store (written on its next flush)."""
+        dirty, self._dirty = self._dirty, set()
+        for user_id in dirty:
+            self._spill(user_id, self._users[user_id])
+        return len(dirty)
+
+    def _spill(self, user_id: int, state: UserState):
+        self.store.set_recent(user_id, list(state.recent), list(state.recent_scenarios))
+        self.store.set_issued(user_id, state.issued_seq)
+
+    def _evict(self, user_id: int):
+        state = self._users.pop(user_id)
+        self.wheel.cancel(user_id)
+        if user_id in self._dirty:
+            self._dirty.discard(user_id)
+            self._spill(user_id, state)
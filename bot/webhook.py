@@ -0,0 +1,183 @@
+"""Webhook serving mode.
+
+Telegram POSTs each update to an embedded HTTP server instead of the bot
+long-polling getUpdates. The receiver checks the secret token, decodes
+the update and puts it on the application's update queue, answering 200
+right away; handlers then run with the application's
+concurrent_updates setting, exactly as they do under polling.
+
+Several instances can sit behind one load balancer: set WEBHOOK_URL on
+one of them only (or register the webhook by hand) and leave it empty on
+the rest.
+
+bot/router.py's workers are fed with an extra header, BOOT_HEADER: the
+boot id of the worker the router last talked to, random per process.
+Each answer to it carries this process's boot id and the update ids
+processed (all handlers done) since the previous answer; a GET on the
+path returns just that. The router keeps every update until it is listed
+there, and a request naming another boot id gets 409, so after a crash
+the router knows to resend what the old process never finished.
+"""
+import asyncio
+import hmac
+import logging
+import secrets
+import signal
+
+from telegram import Update
+from telegram.ext import Application
+
+from httpserver import HttpServer, Request, Response, json_response
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+BOOT_HEADER = "x-worker-boot"
+
+
+class WebhookReceiver:
+    """HTTP handler turning Telegram webhook POSTs into queued updates."""
+
+    def __init__(self, application: Application, secret_token: str = ""):
+        self.application = application
+        self.secret_token = secret_token.encode()
+        self.boot = secrets.token_hex(8)
+        self.received = 0
+        self.rejected = 0
+        self._processed: list[int] = []
+
+    def _authorized(self, req: Request) -> bool:
+        if self.secret_token:
+            given = req.headers.get(SECRET_HEADER, "").encode()
+            if not hmac.compare_digest(given, self.secret_token):
+                self.rejected += 1
+                return False
+        return True
+
+    def _ack(self, status: int = 200) -> Response:
+        processed, self._processed = self._processed, []
+        return json_response({"boot": self.boot, "processed": processed}, status)
+
+    async def _process(self, update: Update):
+        app = self.application
+        await app.update_processor.process_update(update, app.process_update(update))
+        self._processed.append(update.update_id)
+
+    async def __call__(self, req: Request) -> Response:
+        if not self._authorized(req):
+            return Response(403)
+        boot = req.headers.get(BOOT_HEADER)
+        if boot is not None:
+            if boot and boot != self.boot:
+                return self._ack(409)
+            if not self.application.running:
+                return self._ack(503)
+        try:
+            update = Update.de_json(req.json(), self.application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            self.rejected += 1
+            logger.warning(f"Dropping malformed webhook update: {e}")
+            return Response(400)
+        if update is None:
+            self.rejected += 1
+            return Response(400)
+        self.received += 1
+        if boot is None:
+            await self.application.update_queue.put(update)
+            return Response(200)
+        # Router-fed: run it here, so it can be listed once processed
+        self.application.create_task(self._process(update), update=update)
+        return self._ack()
+
+    async def acks(self, req: Request) -> Response:
+        """GET: the router asking what got processed while it had nothing to send."""
+        if not self._authorized(req):
+            return Response(403)
+        return self._ack()
+
+
+class WebhookServer:
+    """Runs an Application fed by webhook POSTs instead of getUpdates.
+
+    start()/stop() mirror what run_polling does around the updater:
+    initialize, post_init, start ... stop, post_stop, shutdown,
+    post_shutdown.
+    """
+
+    def __init__(
+        self,
+        application: Application,
+        listen: str = "0.0.0.0",
+        port: int = 8080,
+        path: str = "/telegram",
+        secret_token: str = "",
+        webhook_url: str = "",
+        max_connections: int = 40,
+        allowed_updates: list[str] = None,
+        drop_pending_updates: bool = False,
+    ):
+        self.application = application
+        self.path = path
+        self.secret_token = secret_token
+        self.webhook_url = webhook_url
+        self.max_connections = max_connections
+        self.allowed_updates = allowed_updates
+        self.drop_pending_updates = drop_pending_updates
+        self.receiver = WebhookReceiver(application, secret_token)
+        self.http = HttpServer(listen, port)
+        self.http.route("POST", path, self.receiver)
+        self.http.route("GET", path, self.receiver.acks)
+
+    @property
+    def port(self) -> int:
+        return self.http.port
+
+    async def start(self):
+        app = self.application
+        await app.initialize()
+        if app.post_init:
+            await app.post_init(app)
+        await self.http.start()
+        if self.webhook_url:
+            await app.bot.set_webhook(
+                url=self.webhook_url,
+                secret_token=self.secret_token or None,
+                max_connections=self.max_connections,
+                allowed_updates=self.allowed_updates,
+                drop_pending_updates=self.drop_pending_updates,
+            )
+            logger.info(f"Webhook registered: {self.webhook_url}")
+        else:
+            logger.info("WEBHOOK_URL not set — not calling setWebhook")
+        if not self.secret_token:
+            logger.warning("Webhook secret token not set — any POST to the path is accepted")
+        await app.start()
+
+    async def stop(self):
+        app = self.application
+        await self.http.stop()
+        if app.running:
+            await app.stop()
+        if app.post_stop:
+            await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+
+
+def run_webhook(application: Application, **kwargs):
+    """Blocking entry point: serve webhooks until SIGINT/SIGTERM."""
+
+    async def _serve():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        server = WebhookServer(application, **kwargs)
+        await server.start()
+        try:
+            await stop.wait()
+        finally:
+            await server.stop()
+
+    asyncio.run(_serve())
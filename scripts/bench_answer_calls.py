@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Bot API calls and latency per answer.
+
+Runs the real bot application (all handlers, temp databases) against
+FakeTelegram with a fixed per-call latency, asks `--answers` quizzes per
+route and answers each one, then reports for the answer tap alone:
+
+- API calls per answer (every method the fake API saw)
+- handler latency (update in -> last call returned), which with a fixed
+  API latency is dominated by how many calls are made one after another
+
+Routes: "rfi" (result edit + range chart photo) and "scenario" (result
+edit only). Finally taps Fix and Next on an RFI chart photo to check both
+still work on a message that has no text.
+
+Usage: python scripts/bench_answer_calls.py [--answers 30] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+from fake_telegram import FakeTelegram, FakeRequest, ReplyTracker, UpdateFactory
+from testutil import use_temp_databases
+
+use_temp_databases("bench_answer_")
+# Measures request handling, not the Bot API budget
+os.environ.setdefault("BOT_API_RATE_PER_SEC", "100000")
+
+from telegram import Update
+
+
+def _percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def run_route(app, fake, tracker, updates, name: str, command: str, n: int, base_uid: int):
+    calls, latencies = [], []
+    for i in range(n):
+        uid = base_uid + i
+        await app.process_update(Update.de_json(updates.command(uid, command), app.bot))
+        message, buttons = tracker.last_keyboard(uid)
+
+        before = sum(fake.calls.values())
+        t0 = time.perf_counter()
+        await app.process_update(Update.de_json(updates.callback(uid, message, buttons[0]), app.bot))
+        latencies.append(time.perf_counter() - t0)
+        calls.append(sum(fake.calls.values()) - before)
+    print(f"  {name:9s} {sum(calls) / n:4.2f} calls/answer   "
+          f"p50 {_percentile(latencies, 0.5) * 1000:6.1f} ms   "
+          f"p95 {_percentile(latencies, 0.95) * 1000:6.1f} ms")
+
+
+async def check_next_from_photo(app, tracker, updates, uid: int):
+    await app.process_update(Update.de_json(updates.command(uid, "/quiz btn"), app.bot))
+    message, buttons = tracker.last_keyboard(uid)
+    await app.process_update(Update.de_json(updates.callback(uid, message, buttons[0]), app.bot))
+    message, buttons = tracker.last_keyboard(uid)
+    assert buttons[0].startswith("next:") and buttons[1].startswith("fix:"), buttons
+    seen = len(tracker.replies[uid])
+    await app.process_update(Update.de_json(updates.callback(uid, message, buttons[1]), app.bot))
+    method, _, _ = tracker.replies[uid][seen]
+    assert method == "editMessageCaption", method
+    seen = len(tracker.replies[uid])
+    await app.process_update(Update.de_json(updates.callback(uid, message, buttons[0]), app.bot))
+    methods = sorted(method for method, _, _ in tracker.replies[uid][seen:])
+    assert methods == ["editMessageReplyMarkup", "sendMessage"], methods
+    _, buttons = tracker.last_keyboard(uid)
+    assert buttons[0].startswith("q:"), buttons
+    print("Fix on the chart edits its caption; Next sends a new quiz and clears the chart's buttons")
+
+
+async def main():
+    ap = argparse.ArgumentParser(description="API calls and latency per answer")
+    ap.add_argument("--answers", type=int, default=30, help="answers per route")
+    ap.add_argument("--latency", type=float, default=0.05, help="fake API latency (s)")
+    args = ap.parse_args()
+
+    import main as bot_main
+    logging.getLogger().setLevel(logging.ERROR)
+
+    fake = FakeTelegram(latency=args.latency, rate_limit=10**9, chat_interval=0)
+    tracker = ReplyTracker(fake)
+    updates = UpdateFactory()
+    app = bot_main.build_application("123:fake", request=FakeRequest(fake))
+    await app.initialize()
+    try:
+        print(f"{args.answers} answers per route, fake API latency {args.latency * 1000:.0f} ms")
+        await run_route(app, fake, tracker, updates, "rfi", "/quiz btn", args.answers, 1000)
+        bot_main.SCENARIO_RATIO = 1.0
+        await run_route(app, fake, tracker, updates, "scenario", "/quiz", args.answers, 2000)
+        bot_main.SCENARIO_RATIO = 0.0
+        await check_next_from_photo(app, tracker, updates, 3000)
+        from compose import answer_stats
+        print(f"Composer: {answer_stats.answers} answers, "
+              f"{answer_stats.calls_per_answer:.2f} calls/answer")
+    finally:
+        await app.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
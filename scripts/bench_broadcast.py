@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Benchmark broadcast fan-out against a fake Bot API that enforces limits.
+
+Compares the old one-at-a-time loop with the Broadcaster engine: both send
+one message per subscriber through a real telegram.Bot wired to
+FakeTelegram (per-request latency, 30 msg/s global and 1 msg/s per-chat
+limits answered with 429 RetryAfter, optional random 429s and blocked
+chats).
+
+Usage: python scripts/bench_broadcast.py [--subs 300] [--latency 0.15]
+           [--inject-429 0.02] [--blocked 5] [--skip-baseline]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "bot"))
+
+from telegram import Bot
+
+from broadcast import Broadcaster
+from ratelimit import TokenBucket
+from fake_telegram import FakeTelegram, FakeRequest
+
+
+async def baseline(bot: Bot, chats: list[int]) -> tuple[int, int, float]:
+    """The pre-engine loop: await each send, log and drop failures."""
+    sent = failed = 0
+    t0 = time.perf_counter()
+    for chat_id in chats:
+        try:
+            await bot.send_message(chat_id=chat_id, text="quiz")
+            sent += 1
+        except Exception:
+            failed += 1
+    return sent, failed, time.perf_counter() - t0
+
+
+async def engine(bot: Bot, chats: list[int], rate: float, concurrency: int):
+    from functools import partial
+    broadcaster = Broadcaster(TokenBucket(rate), concurrency=concurrency)
+    jobs = [(c, partial(bot.send_message, chat_id=c, text="quiz")) for c in chats]
+    return await broadcaster.run(jobs)
+
+
+async def main():
+    ap = argparse.ArgumentParser(description="Broadcast fan-out benchmark")
+    ap.add_argument("--subs", type=int, default=300)
+    ap.add_argument("--latency", type=float, default=0.15, help="fake API latency (s)")
+    ap.add_argument("--inject-429", type=float, default=0.02, help="random 429 probability")
+    ap.add_argument("--blocked", type=int, default=5, help="subscribers that blocked the bot")
+    ap.add_argument("--rate", type=float, default=30, help="engine token bucket rate")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--skip-baseline", action="store_true")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    chats = list(range(10_000, 10_000 + args.subs))
+    blocked = set(chats[:args.blocked])
+
+    def make_bot():
+        fake = FakeTelegram(latency=args.latency, inject_429=args.inject_429, blocked=blocked)
+        return fake, Bot("123:fake", request=FakeRequest(fake))
+
+    print(f"{args.subs} subscribers, {args.latency * 1000:.0f} ms API latency, "
+          f"{args.inject_429:.0%} random 429s, {len(blocked)} blocked\n")
+
+    if not args.skip_baseline:
+        fake, bot = make_bot()
+        sent, failed, elapsed = await baseline(bot, chats)
+        print(f"sequential: {sent}/{len(chats)} delivered, {failed} lost "
+              f"({fake.errors[429]}x 429) in {elapsed:.1f}s ({sent / elapsed:.1f} msg/s)")
+
+    fake, bot = make_bot()
+    report = await engine(bot, chats, args.rate, args.concurrency)
+    print(f"engine:     {report.summary()}")
+    print(f"            server saw {fake.errors[429]}x 429, {fake.errors[403]}x 403")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Auto-quiz send rate: one global tick vs per-subscriber cadence.
+
+Simulates `--hours` of auto-broadcast for `--subs` subscribers (default
+interval 1 h, a share of them on other intervals and with quiet hours)
+on a virtual clock, ticking the BroadcastPlanner every second. Reports
+sends per minute — the old global tick puts every subscriber in the
+same second — and how the cost of a tick scales with due vs total
+subscribers.
+
+Usage: python scripts/bench_cadence.py [--subs 10000] [--hours 3]
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "bot"))
+
+from cadence import BroadcastPlanner
+from persistence import StateStore
+
+T0 = 1_700_000_000.0
+
+
+def make_planner(n_subs: int, custom_share: float, interval: int = 3600, seed: int = 1):
+    rng = random.Random(seed)
+    store = StateStore(Path(tempfile.mkdtemp(prefix="bench_cadence_")) / "state.db")
+    for chat_id in range(1, n_subs + 1):
+        store.subscribe(chat_id)
+    planner = BroadcastPlanner(store, interval, T0, max_interval=max(interval, 86400))
+    for chat_id in range(1, n_subs + 1):
+        if rng.random() < custom_share:
+            planner.subscribe(chat_id, T0, rng.choice((15, 30, 120, 240)) * 60)
+            if rng.random() < 0.5:
+                planner.set_quiet(chat_id, T0, 23, 8, rng.choice((0, 540, -300)))
+    return store, planner
+
+
+def simulate(planner, hours: float) -> tuple[Counter, list[tuple[int, float]]]:
+    per_minute: Counter = Counter()
+    tick_costs = []
+    for second in range(int(hours * 3600)):
+        now = T0 + second
+        t = time.perf_counter()
+        due = planner.due(now)
+        tick_costs.append((len(due), time.perf_counter() - t))
+        per_minute[second // 60] += len(due)
+    return per_minute, tick_costs
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Global tick vs per-subscriber cadence")
+    ap.add_argument("--subs", type=int, default=10000)
+    ap.add_argument("--hours", type=float, default=3.0)
+    ap.add_argument("--custom-share", type=float, default=0.3,
+                    help="subscribers with their own interval / quiet hours")
+    args = ap.parse_args()
+
+    store, planner = make_planner(args.subs, args.custom_share)
+    per_minute, tick_costs = simulate(planner, args.hours)
+    minutes = [per_minute[m] for m in range(int(args.hours * 60))]
+    print(f"{args.subs} subscribers, {args.hours:.0f} h simulated, "
+          f"{args.custom_share:.0%} with custom interval/quiet hours\n")
+    print(f"global tick:  {args.subs} sends in one second every hour "
+          f"(~{args.subs / 30 / 60:.1f} min to drain at 30 msg/s)")
+    print(f"cadence:      {sum(minutes)} sends, per minute mean {statistics.mean(minutes):.0f}, "
+          f"max {max(minutes)}, stdev {statistics.pstdev(minutes):.1f}; "
+          f"peak second {max(n for n, _ in tick_costs)}")
+
+    busy = [c for n, c in tick_costs if n]
+    idle = [c for n, c in tick_costs if not n]
+    per_due = sum(c for n, c in tick_costs) / max(sum(n for n, _ in tick_costs), 1)
+    print(f"\ntick cost:    idle {statistics.mean(idle) * 1e6:.1f} µs, "
+          f"with due subscribers {statistics.mean(busy) * 1e6:.1f} µs "
+          f"({per_due * 1e6:.1f} µs per due subscriber)")
+
+    # Same due rate, 10x the subscribers on a 10x longer interval: tick cost
+    # must not grow with the total
+    store.close()
+    big_store, big = make_planner(args.subs * 10, 0.0, interval=10 * 3600)
+    _, big_costs = simulate(big, 0.25)
+    big_per_due = sum(c for _, c in big_costs) / max(sum(n for n, _ in big_costs), 1)
+    print(f"              {args.subs * 10} subscribers at 10 h interval (same due rate): "
+          f"{big_per_due * 1e6:.1f} µs per due subscriber, "
+          f"mean tick {statistics.mean(c for _, c in big_costs) * 1e6:.1f} µs")
+    big_store.close()
+
+
+if __name__ == "__main__":
+    main()
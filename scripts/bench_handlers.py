@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""Per-handler CPU, allocations and SQLite statements, in-process.
+
+Calls the bot's handlers directly, with no Application, update queue or
+HTTP. Updates are the UpdateFactory dicts turned into real
+Update/CallbackQuery objects, bound to a RecordingBot that keeps each Bot
+API call instead of sending it. Each handler runs `--iterations` times
+over a pool of `--users` users; whatever an iteration needs first (the
+quiz being answered) is set up outside the measurement:
+
+- quiz_command               /quiz scenario and /quiz <format> <position>
+                             of a verified slot, alternately
+- handle_open_range_answer   tap an answer on a fresh RFI quiz (incl. chart)
+- handle_scenario_answer     tap an answer on a fresh scenario quiz
+- handle_next_quiz           Next on a result, with and without an RFI hint
+- handle_fix_apply           Fix a random hand of a verified slot (writes
+                             corrections.json in a temp dir, not data/)
+- ranking_command            /ranking with every user seen so far on the board
+
+Per call it reports:
+
+- CPU time of the calling thread (thread_time), so the log and trace
+  writer threads do not count; mean and p95
+- allocations by tracemalloc, in a second pass of `--alloc-iterations`:
+  peak above the starting point, and what is still held afterwards
+- SQL statements on the bankroll and state databases (sqlite3 trace
+  callback)
+- Bot API calls the handler made
+
+`--save FILE` writes the results as JSON. `--compare FILE` checks them
+against a saved run: CPU or peak allocations more than `--max-ratio` of
+the baseline, or more than `--max-extra-statements` extra statements per
+call, fail the run.
+
+The RFI answer renders its range chart on every call and takes most of
+the run; `--handlers` picks a subset.
+
+Usage: python scripts/bench_handlers.py [--iterations 1000] [--users 500]
+           [--save out.json] [--compare baseline.json] [--max-ratio 1.25]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import shutil
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+from fake_telegram import BOT_USER, UpdateFactory
+from testutil import use_temp_databases
+
+_tmp = use_temp_databases("bench_handlers_")
+
+from telegram import Message, Update
+
+HANDLERS = ["quiz_command", "handle_open_range_answer", "handle_scenario_answer",
+            "handle_next_quiz", "handle_fix_apply", "ranking_command"]
+
+
+class RecordingBot:
+    """Stands in for context.bot / Message.get_bot(): records every call.
+
+    Sends return a Message, everything else True. The last inline
+    keyboard each chat was shown is kept with the message carrying it,
+    so the next iteration can tap one of its buttons.
+    """
+    defaults = None
+
+    def __init__(self):
+        self.calls: Counter = Counter()
+        self.keyboards: dict[int, tuple[dict, list[str]]] = {}
+        self._message_id = 0
+
+    def _message(self, chat_id: int, **extra) -> dict:
+        self._message_id += 1
+        return {"message_id": self._message_id, "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "from": BOT_USER, **extra}
+
+    def _record(self, method: str, kwargs: dict, message: dict = None):
+        self.calls[method] += 1
+        markup = kwargs.get("reply_markup")
+        if markup is not None and message is not None:
+            buttons = [b.callback_data for row in markup.inline_keyboard for b in row]
+            self.keyboards[message["chat"]["id"]] = (message, buttons)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        message = self._message(chat_id, text=text)
+        self._record("sendMessage", kwargs, message)
+        return Message.de_json(message, self)
+
+    async def send_photo(self, chat_id, photo, **kwargs):
+        message = self._message(chat_id, photo=[{"file_id": "p", "file_unique_id": "p",
+                                                 "width": 1, "height": 1}],
+                                caption=kwargs.get("caption"))
+        self._record("sendPhoto", kwargs, message)
+        return Message.de_json(message, self)
+
+    async def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        self._record("editMessageText", kwargs, self._edited(chat_id, message_id, text=text))
+        return True
+
+    async def edit_message_caption(self, chat_id=None, message_id=None, **kwargs):
+        self._record("editMessageCaption", kwargs, self._edited(chat_id, message_id))
+        return True
+
+    async def edit_message_reply_markup(self, chat_id=None, message_id=None, **kwargs):
+        self._record("editMessageReplyMarkup", kwargs, self._edited(chat_id, message_id))
+        return True
+
+    async def answer_callback_query(self, callback_query_id, **kwargs):
+        self._record("answerCallbackQuery", kwargs)
+        return True
+
+    @staticmethod
+    def _edited(chat_id, message_id, **extra) -> dict:
+        return {"message_id": message_id, "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "from": BOT_USER, **extra}
+
+
+class HandlerContext:
+    """The part of CallbackContext the private-chat handlers use."""
+
+    def __init__(self, bot: RecordingBot, args: list[str] = None):
+        self.bot = bot
+        self.args = args or []
+
+
+class StatementCounter:
+    def __init__(self, *conns):
+        self.count = 0
+        for conn in conns:
+            conn.set_trace_callback(self._on_statement)
+
+    def _on_statement(self, statement: str):
+        self.count += 1
+
+
+class Scenario:
+    """Builds each iteration's (handler, update, context), setup included."""
+
+    def __init__(self, bot_main, bot: RecordingBot, users: int):
+        self.main = bot_main
+        self.bot = bot
+        self.updates = UpdateFactory()
+        self.uids = [10_000 + i for i in range(users)]
+
+    def _uid(self, i: int) -> int:
+        return self.uids[i % len(self.uids)]
+
+    def _command(self, uid: int, text: str):
+        update = Update.de_json(self.updates.command(uid, text), self.bot)
+        return update, HandlerContext(self.bot, text.split()[1:])
+
+    def _callback(self, uid: int, message: dict, data: str):
+        return Update.de_json(self.updates.callback(uid, message, data), self.bot), HandlerContext(self.bot)
+
+    async def _quiz(self, uid: int, route: str) -> tuple[dict, list[str]]:
+        await self.main.quiz_command(*self._command(uid, f"/quiz {route}"))
+        return self.bot.keyboards[uid]
+
+    def _rfi_route(self) -> str:
+        return " ".join(random.choice(self.main.VERIFIED_SLOTS))
+
+    async def quiz_command(self, i: int):
+        route = "scenario" if i % 2 else self._rfi_route()
+        return (self.main.quiz_command, *self._command(self._uid(i), f"/quiz {route}"))
+
+    async def _answer(self, i: int, route: str):
+        uid = self._uid(i)
+        message, buttons = await self._quiz(uid, route)
+        answers = [b for b in buttons if b.startswith("q:")]
+        return (self.main.handle_answer, *self._callback(uid, message, random.choice(answers)))
+
+    async def handle_open_range_answer(self, i: int):
+        return await self._answer(i, self._rfi_route())
+
+    async def handle_scenario_answer(self, i: int):
+        return await self._answer(i, "scenario")
+
+    async def handle_next_quiz(self, i: int):
+        uid = self._uid(i)
+        fmt, pos = random.choice(self.main.VERIFIED_SLOTS)
+        message = self.bot._message(uid, text="result")
+        data = f"next:{fmt}:{pos}" if i % 2 else "next:"
+        return (self.main.handle_next_quiz, *self._callback(uid, message, data))
+
+    async def handle_fix_apply(self, i: int):
+        uid = self._uid(i)
+        fmt, pos = random.choice(self.main.VERIFIED_SLOTS)
+        hand = random.choice(self.main.ALL_HANDS_169)
+        in_raise = hand in (self.main.open_range_quiz.range_data(fmt, pos) or {}).get("raise", ())
+        message = self.bot._message(uid, text="fix")
+        data = f"fixdo:{fmt}:{pos}:{hand}:{'F' if in_raise else 'R'}"
+        return (self.main.handle_fix_apply, *self._callback(uid, message, data))
+
+    async def ranking_command(self, i: int):
+        return (self.main.ranking_command, *self._command(self._uid(i), "/ranking"))
+
+
+def _percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def run_handler(scenario: Scenario, name: str, iterations: int, alloc_iterations: int,
+                      statements: StatementCounter) -> dict:
+    bot = scenario.bot
+    build = getattr(scenario, name)
+    cpu, sql, api = [], 0, 0
+    for i in range(iterations):
+        handler, update, context = await build(i)
+        sql0, api0 = statements.count, sum(bot.calls.values())
+        t0 = time.thread_time_ns()
+        await handler(update, context)
+        cpu.append(time.thread_time_ns() - t0)
+        sql += statements.count - sql0
+        api += sum(bot.calls.values()) - api0
+
+    peak = held = 0
+    tracemalloc.start()
+    for i in range(iterations, iterations + alloc_iterations):
+        handler, update, context = await build(i)
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        await handler(update, context)
+        current, top = tracemalloc.get_traced_memory()
+        peak += top - before
+        held += current - before
+    tracemalloc.stop()
+
+    return {
+        "cpu_us": sum(cpu) / iterations / 1000,
+        "cpu_p95_us": _percentile(cpu, 0.95) / 1000,
+        "alloc_peak_kb": peak / alloc_iterations / 1024,
+        "alloc_held_b": held / alloc_iterations,
+        "sql_statements": sql / iterations,
+        "api_calls": api / iterations,
+    }
+
+
+def report(results: dict):
+    print(f"{'handler':26s} {'CPU µs':>9s} {'p95 µs':>9s} {'peak KB':>8s} "
+          f"{'held B':>8s} {'SQL':>6s} {'API':>5s}")
+    for name, r in results.items():
+        print(f"{name:26s} {r['cpu_us']:9.1f} {r['cpu_p95_us']:9.1f} {r['alloc_peak_kb']:8.1f} "
+              f"{r['alloc_held_b']:8.0f} {r['sql_statements']:6.2f} {r['api_calls']:5.2f}")
+
+
+def compare(results: dict, baseline: dict, max_ratio: float, max_extra_statements: float) -> list[str]:
+    print(f"\nAgainst baseline ({baseline.get('revision') or 'unknown revision'}):")
+    failures = []
+    for name, r in results.items():
+        base = baseline["handlers"].get(name)
+        if base is None:
+            print(f"  {name:26s} not in baseline")
+            continue
+        cpu = r["cpu_us"] / max(base["cpu_us"], 1e-9)
+        peak = r["alloc_peak_kb"] / max(base["alloc_peak_kb"], 1e-9)
+        extra = r["sql_statements"] - base["sql_statements"]
+        print(f"  {name:26s} CPU x{cpu:4.2f}   peak alloc x{peak:4.2f}   SQL {extra:+.2f}/call")
+        if cpu > max_ratio:
+            failures.append(f"{name}: CPU {r['cpu_us']:.1f} µs vs {base['cpu_us']:.1f} µs")
+        if peak > max_ratio:
+            failures.append(f"{name}: peak alloc {r['alloc_peak_kb']:.1f} KB vs {base['alloc_peak_kb']:.1f} KB")
+        if extra > max_extra_statements:
+            failures.append(f"{name}: {r['sql_statements']:.2f} SQL statements/call "
+                            f"vs {base['sql_statements']:.2f}")
+    return failures
+
+
+def _revision() -> str:
+    out = subprocess.run(["git", "-C", str(ROOT), "rev-parse", "--short", "HEAD"],
+                         capture_output=True, text=True)
+    return out.stdout.strip()
+
+
+async def main():
+    ap = argparse.ArgumentParser(description="Per-handler CPU, allocations and SQL statements")
+    ap.add_argument("--iterations", type=int, default=1000, help="timed calls per handler")
+    ap.add_argument("--alloc-iterations", type=int, default=200,
+                    help="calls per handler traced by tracemalloc")
+    ap.add_argument("--users", type=int, default=500, help="distinct users the calls cycle through")
+    ap.add_argument("--handlers", nargs="+", choices=HANDLERS, default=HANDLERS)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--save", metavar="FILE", help="write the results as JSON")
+    ap.add_argument("--compare", metavar="FILE", help="check against results saved with --save")
+    ap.add_argument("--max-ratio", type=float, default=1.25,
+                    help="with --compare: CPU / peak allocation ratio to pass")
+    ap.add_argument("--max-extra-statements", type=float, default=0.5,
+                    help="with --compare: extra SQL statements per call to pass")
+    args = ap.parse_args()
+
+    random.seed(args.seed)
+    import main as bot_main
+    logging.getLogger().setLevel(logging.ERROR)
+
+    # Fix writes corrections.json next to the quiz data; keep data/ untouched
+    import quiz
+    corrections = quiz.DATA_DIR / "corrections.json"
+    if corrections.exists():
+        shutil.copy(corrections, _tmp)
+    quiz.DATA_DIR = _tmp
+
+    bot = RecordingBot()
+    scenario = Scenario(bot_main, bot, args.users)
+    statements = StatementCounter(bot_main.bankroll_manager.conn, bot_main.state_store.conn)
+    # Warm-up: lazily built ranges, EV tables, chart fonts and crops
+    for name in args.handlers:
+        await run_handler(scenario, name, 20, 1, statements)
+
+    print(f"{args.iterations} calls per handler ({args.alloc_iterations} traced), "
+          f"{args.users} users")
+    results = {}
+    for name in args.handlers:
+        results[name] = await run_handler(scenario, name, args.iterations,
+                                          args.alloc_iterations, statements)
+    report(results)
+
+    if args.save:
+        Path(args.save).write_text(json.dumps({
+            "revision": _revision(), "iterations": args.iterations,
+            "python": sys.version.split()[0], "handlers": results,
+        }, indent=2))
+        print(f"\nSaved to {args.save}")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        failures = compare(results, baseline, args.max_ratio, args.max_extra_statements)
+        assert not failures, "Regressions:\n  " + "\n  ".join(failures)
+    print("Handler bench passed!")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Logging: cost on the logging thread, and what reaches the file.
+
+1. Per-record CPU time of the logging thread (time.thread_time, so the
+   writer thread's share of a single core is not charged to it) for
+   `--records` INFO lines written to a file: synchronously (the old
+   basicConfig setup: format + write + flush on the event loop thread)
+   against logsetup's queue, where the caller only builds the record and
+   enqueues it. Must be at least `--min-speedup` times cheaper.
+2. Replays a polling-bot log shape: an httpx "HTTP Request: POST
+   .../bot<token>/getUpdates" line every poll, apscheduler job lines and a
+   few bot lines, then checks the rotated file set: no token anywhere, the
+   noisy loggers held to their per-minute budget with a suppressed count,
+   every bot line kept, no file over LOG_MAX_BYTES.
+
+Usage: python scripts/bench_logging.py [--records 20000] [--min-speedup 2]
+"""
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "bot"))
+
+from logsetup import setup_logging, stop_logging, FORMAT, REDACTED
+
+TOKEN = "7997880872:AAEXPmbL_cLursscD32lmCVhbSkJXHK91-s"
+
+
+def _reset_root():
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+
+def time_records(n: int) -> float:
+    log = logging.getLogger("main")
+    start = time.thread_time()
+    for i in range(n):
+        log.info(f"User {10_000 + i} answered q:{i} correct=True bankroll=1234.5")
+    return (time.thread_time() - start) / n * 1e6
+
+
+def bench_cost(tmp: Path, n: int, min_speedup: float):
+    _reset_root()
+    logging.basicConfig(filename=tmp / "sync.log", format=FORMAT, level=logging.INFO)
+    sync_us = time_records(n)
+    _reset_root()
+
+    saved = (logging.logThreads, logging._srcfile)
+    setup_logging("INFO", tmp / "queued.log", console=False)
+    queued_us = time_records(n)
+    start = time.perf_counter()
+    stop_logging()                                  # drain the writer thread
+    drain_s = time.perf_counter() - start
+    assert (logging.logThreads, logging._srcfile) == saved, "logging globals not restored"
+    lines = (tmp / "queued.log").read_text().count("\n")
+    _reset_root()
+
+    print(f"Per-record CPU on the logging thread ({n} records to a file):")
+    print(f"  synchronous FileHandler   {sync_us:6.2f} µs")
+    print(f"  queue -> writer thread    {queued_us:6.2f} µs  ({sync_us / queued_us:.1f}x less; "
+          f"writer drained the rest in {drain_s * 1000:.0f} ms)")
+    assert lines == n, f"{lines} of {n} records written"
+    assert sync_us / queued_us >= min_speedup, f"only {sync_us / queued_us:.1f}x cheaper"
+
+
+def bench_noise(tmp: Path):
+    path = tmp / "bot.log"
+    max_bytes = 1024
+    setup_logging("INFO", path, max_bytes=max_bytes, backups=3, console=False,
+                  rate_limits={"httpx": 1, "apscheduler": 1}, secrets=("webhook-secret-value",))
+    httpx_log = logging.getLogger("httpx")
+    jobs = logging.getLogger("apscheduler.executors.default")
+    bot = logging.getLogger("main")
+    polls = 500
+    for i in range(polls):
+        httpx_log.info(f'HTTP Request: POST https://api.telegram.org/bot{TOKEN}/getUpdates '
+                       f'"HTTP/1.1 200 OK"')
+        jobs.info('Running job "broadcast_tick" (scheduled at ...)')
+        if i % 50 == 0:
+            bot.info(f"Answer recorded for user {i}")
+    httpx_log.warning(f"HTTP Request failed: https://api.telegram.org/bot{TOKEN}/sendMessage")
+    bot.info("Webhook secret is webhook-secret-value")
+    rate_filter = logging.getLogger().handlers[0].filters[0]
+    suppressed = rate_filter.suppressed_total
+    stop_logging()
+    _reset_root()
+
+    files = sorted(tmp.glob("bot.log*"))
+    text = "".join(f.read_text() for f in files)
+    httpx_lines = [l for l in text.splitlines() if " - httpx - " in l]
+    print(f"\n{polls} polls: {len(text.splitlines())} lines kept in {len(files)} file(s), "
+          f"{suppressed} suppressed")
+    for line in httpx_lines:
+        print(f"  {line[:120]}")
+    assert TOKEN not in text and "webhook-secret-value" not in text and REDACTED in text
+    assert len(httpx_lines) == 2, "httpx INFO should be one line (plus the warning)"
+    assert any("WARNING" in l for l in httpx_lines), "warnings must not be rate limited"
+    assert text.count("Answer recorded") == polls // 50
+    assert all(f.stat().st_size <= max_bytes for f in files)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Queued logging cost and noise control")
+    ap.add_argument("--records", type=int, default=20_000)
+    ap.add_argument("--min-speedup", type=float, default=2.0)
+    args = ap.parse_args()
+    bench_cost(Path(tempfile.mkdtemp(prefix="log_cost_")), args.records, args.min_speedup)
+    bench_noise(Path(tempfile.mkdtemp(prefix="log_noise_")))
+    print("Logging bench passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Memory held by questions: bytes per question and RSS at 100k users.
+
+Each measurement runs in a fresh interpreter that loads the quiz data,
+asks one question from every RFI slot and scenario (so data shared by a
+slot's questions is already built), then holds one question per simulated
+user in a dict, half RFI and half scenario, the way a per-user pending
+map would:
+
+- RSS growth (VmRSS from /proc) for `--users` held questions
+- bytes per question by tracemalloc, RFI and scenario separately, not
+  counting the dict that holds them
+
+With `--against REV` the same is measured for the bot as of git revision
+REV (checked out into a temporary worktree) and RSS growth must shrink to
+at most `--max-ratio` of it.
+
+Usage: python scripts/bench_memory.py [--users 100000] [--against REV] [--max-ratio 0.5]
+"""
+import argparse
+import gc
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+
+def _rss_kb() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def _traced(build, n: int) -> float:
+    """tracemalloc bytes per item for a dict of n built items, minus the dict."""
+    gc.collect()
+    tracemalloc.start()
+    empty = {uid: None for uid in range(n)}
+    base = tracemalloc.get_traced_memory()[0]
+    held = {uid: build(uid) for uid in range(n)}
+    used = tracemalloc.get_traced_memory()[0] - base - (sys.getsizeof(held) - sys.getsizeof(empty))
+    tracemalloc.stop()
+    del held, empty
+    return used / n
+
+
+def child(bot_dir: Path, users: int):
+    sys.path.insert(0, str(bot_dir))
+    from config import ALL_HANDS_169
+    from quiz import QuizManager, OpenRangeQuizManager, OPEN_RANGE_POSITIONS
+
+    qm = QuizManager()
+    rfi = OpenRangeQuizManager(qm.ev_tables)
+    slots = [(f, p) for f in rfi.get_available_formats() for p in OPEN_RANGE_POSITIONS
+             if rfi.build_question(f, p, "AA")]
+    scenarios = [(sid, list(qm.get_scenario_hands(sid))) for sid in qm.get_available_scenarios()]
+    for sid, hands in scenarios:
+        qm.build_question(sid, hands[0])
+    rng = random.Random(1)
+    rfi_refs = [(*rng.choice(slots), rng.choice(ALL_HANDS_169)) for _ in range(users)]
+    sc_refs = []
+    for _ in range(users):
+        sid, hands = rng.choice(scenarios)
+        sc_refs.append((sid, rng.choice(hands)))
+
+    def build(uid):
+        if uid % 2:
+            return rfi.build_question(*rfi_refs[uid])
+        return qm.build_question(*sc_refs[uid])
+
+    gc.collect()
+    before = _rss_kb()
+    pending = {uid: build(uid) for uid in range(users)}
+    rss_kb = _rss_kb() - before
+    sample = (pending[1], pending[0])
+    del pending
+    print(json.dumps({
+        "rss_kb": rss_kb,
+        "rfi_bytes": _traced(lambda uid: rfi.build_question(*rfi_refs[uid]), users // 2),
+        "scenario_bytes": _traced(lambda uid: qm.build_question(*sc_refs[uid]), users // 2),
+        "rfi_getsizeof": sys.getsizeof(sample[0]),
+        "scenario_getsizeof": sys.getsizeof(sample[1]),
+    }))
+
+
+def measure(bot_dir: Path, users: int) -> dict:
+    out = subprocess.run([sys.executable, __file__, "--child", str(bot_dir), "--users", str(users)],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def measure_revision(rev: str, users: int) -> dict:
+    worktree = Path(tempfile.mkdtemp(prefix="bench_memory_rev_")) / "tree"
+    subprocess.run(["git", "-C", str(ROOT), "worktree", "add", "-q", "--detach",
+                    str(worktree), rev], check=True)
+    try:
+        return measure(worktree / "bot", users)
+    finally:
+        subprocess.run(["git", "-C", str(ROOT), "worktree", "remove", "--force",
+                        str(worktree)], check=True)
+
+
+def report(name: str, r: dict, users: int):
+    print(f"{name:>8s}: RFI {r['rfi_bytes']:7.0f} B/question (object {r['rfi_getsizeof']} B), "
+          f"scenario {r['scenario_bytes']:5.0f} B/question (object {r['scenario_getsizeof']} B), "
+          f"RSS +{r['rss_kb'] / 1024:6.1f} MB for {users:,} users")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Question memory per pending user")
+    ap.add_argument("--users", type=int, default=100_000)
+    ap.add_argument("--against", metavar="REV", help="also measure the bot at this git revision")
+    ap.add_argument("--max-ratio", type=float, default=0.5,
+                    help="with --against: RSS growth ratio to pass")
+    ap.add_argument("--child", metavar="BOT_DIR", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        child(Path(args.child), args.users)
+        return
+    if args.against:
+        before = measure_revision(args.against, args.users)
+        report(args.against, before, args.users)
+    after = measure(ROOT / "bot", args.users)
+    report("now", after, args.users)
+    if args.against:
+        ratio = after["rss_kb"] / max(before["rss_kb"], 1)
+        print(f"\nRSS growth now/{args.against}: {ratio:.2f}")
+        assert ratio <= args.max_ratio, f"RSS growth is {ratio:.2f} of {args.against} (max {args.max_ratio})"
+    print("Memory bench passed!")
+
+
+if __name__ == "__main__":
+    main()
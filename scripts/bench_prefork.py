@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""Worker memory: preloaded and forked vs started one by one.
+
+Runs bot/router.py's Router with `--workers` workers against a fake Bot
+API served over HTTP, in two modes:
+
+- spawn:   every worker is its own bot/main.py (with LAZY_STARTUP=0, so
+           both modes hold the same data)
+- preload: bot/prefork.py loads the quiz data once and forks the workers
+
+Each worker answers a /start, then `--users` users play `--rounds` RFI
+quizzes each, on consecutive slots so the traffic covers every slot
+with a PDF crop (the answer chart is rendered with it). Each worker's
+/proc/<pid>/smaps_rollup is read after the /start and again after that
+traffic, and each row reports:
+
+- RSS and PSS: shared pages count in full in RSS, pro rata in PSS
+- USS: pages this worker alone holds
+- shared: RSS - USS
+
+Summed PSS, including the pool process in preload mode, is what the
+deployment actually uses. The run passes when preload's total PSS is at
+most `--max-ratio` of spawn's, and each forked worker still shares at
+least `--min-shared` of what it shared before the traffic. There are
+more slots with crops than the crop cache holds, so workers evict some
+preloaded crops and reuse their pages; that is most of what stops being
+shared.
+
+First, since a full collection may not happen during the run: the data
+is preloaded in a child process with and without gc.freeze(), a process
+forked from it runs gc.collect(), and the bytes that copied are compared.
+
+Usage: python scripts/bench_prefork.py [--workers 4] [--users 64] [--rounds 4]
+           [--max-ratio 0.75] [--min-shared 0.7]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from fake_telegram import FakeTelegram, FakeTelegramServer, ReplyTracker, UpdateFactory
+
+import httpx
+
+from config import DATA_DIR
+from health import memory_stats
+from quiz import OpenRangeQuizManager, OPEN_RANGE_POSITIONS
+from router import Router
+
+TOKEN = "123:fake"
+PATH = "/telegram"
+MB = 1 << 20
+# RFI slots with a PDF crop, as "/quiz <format> <position>" arguments
+SLOTS = [f"{fmt} {pos}" for fmt in OpenRangeQuizManager.FORMATS for pos in OPEN_RANGE_POSITIONS
+         if (DATA_DIR / "crops" / f"{fmt}_rfi_{pos}.png").exists()]
+
+
+async def user_session(tracker, updates, client, url, uid: int, first: int, rounds: int):
+    """RFI quizzes on consecutive slots from `first`, each answered."""
+    seen = len(tracker.replies[uid])
+
+    async def send(update, replies):
+        nonlocal seen
+        r = await client.post(url, json=update)
+        assert r.status_code == 200, r.status_code
+        seen += replies
+        await tracker.wait(uid, seen, timeout=120)
+
+    for k in range(rounds):
+        await send(updates.command(uid, f"/quiz {SLOTS[(first + k) % len(SLOTS)]}"), 1)
+        message, buttons = tracker.last_keyboard(uid)
+        # edit + range chart photo (carrying Next/Fix)
+        await send(updates.callback(uid, message, buttons[0]), 2)
+
+
+def gc_child(freeze: bool):
+    """Preload as bot/prefork.py does (with or without gc.freeze), fork, and
+    print how much a full collection in the child un-shares."""
+    import prefork
+    if freeze:
+        gc.disable()
+    prefork.preload()
+    if freeze:
+        gc.freeze()
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        gc.enable()
+        before = memory_stats()["uss_bytes"]
+        gc.collect()
+        os.write(w, json.dumps([before, memory_stats()["uss_bytes"]]).encode())
+        os._exit(0)
+    os.waitpid(pid, 0)
+    print(os.read(r, 1024).decode())
+
+
+def check_gc() -> tuple[int, int]:
+    """Bytes a worker's first full collection copies, without and with gc.freeze()."""
+    dirtied = []
+    for freeze in ("0", "1"):
+        out = subprocess.run([sys.executable, __file__, "--gc-child", freeze],
+                             check=True, capture_output=True, text=True).stdout
+        before, after = json.loads(out.strip().splitlines()[-1])
+        dirtied.append(after - before)
+    return dirtied[0], dirtied[1]
+
+
+def _children(pid: int) -> list[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def _rss(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def snapshot(pids: dict[str, int]) -> dict[str, dict]:
+    return {name: {"rss_bytes": _rss(pid), **memory_stats(pid)} for name, pid in pids.items()}
+
+
+def report(mode: str, phase: str, mem: dict[str, dict]):
+    print(f"  {mode} {phase}:")
+    for name, m in mem.items():
+        print(f"    {name:10s} RSS {m['rss_bytes'] / MB:6.1f} MB   PSS {m['pss_bytes'] / MB:6.1f} MB   "
+              f"USS {m['uss_bytes'] / MB:6.1f} MB   shared {m['shared_bytes'] / MB:6.1f} MB")
+    print(f"    {'total':10s} PSS {sum(m['pss_bytes'] for m in mem.values()) / MB:6.1f} MB")
+
+
+async def run(mode: str, args, fake_server, tracker, updates, tmp: Path) -> tuple[dict, dict]:
+    state_dir = tmp / mode
+    state_dir.mkdir()
+    router = Router(
+        TOKEN, shard_count=args.workers, base_port=args.base_port, mode="webhook",
+        api_base_url=fake_server.base_url, listen="127.0.0.1", port=0, path=PATH,
+        webhook_url="", webhook_secret="", state_dir=state_dir,
+        preload=mode == "preload",
+        worker_env={
+            "BOT_API_BASE_URL": fake_server.base_url,
+            "BANKROLL_DB_PATH": str(state_dir / "bankroll.db"),
+            "BOT_API_RATE_PER_SEC": "100000",
+            "LAZY_STARTUP": "0",
+        },
+    )
+    await router.start()
+    url = f"http://127.0.0.1:{router.http.port}{PATH}"
+    base_uid = (1 if mode == "spawn" else 2) * 100_000
+    try:
+        async with httpx.AsyncClient(timeout=30) as client:
+            warm = [base_uid + i for i in range(args.workers)]
+            await asyncio.gather(*(client.post(url, json=updates.command(uid, "/start"))
+                                   for uid in warm))
+            for uid in warm:
+                await tracker.wait(uid, 1, timeout=120)
+
+            if mode == "preload":
+                pool = router.workers[0].proc.pid
+                pids = {"pool": pool}
+                pids.update({f"worker {i}": pid for i, pid in enumerate(_children(pool))})
+            else:
+                pids = {f"worker {i}": w.proc.pid for i, w in enumerate(router.workers)}
+            before = snapshot(pids)
+            await asyncio.gather(*(
+                user_session(tracker, updates, client, url, base_uid + 1000 + i,
+                             i * args.rounds, args.rounds)
+                for i in range(args.users)
+            ))
+            after = snapshot(pids)
+    finally:
+        await router.stop()
+    report(mode, "after /start", before)
+    report(mode, f"after {args.users * args.rounds} answers", after)
+    return before, after
+
+
+async def main():
+    ap = argparse.ArgumentParser(description="Preloaded vs separately started worker memory")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--users", type=int, default=64)
+    ap.add_argument("--rounds", type=int, default=4)
+    ap.add_argument("--base-port", type=int, default=18300)
+    ap.add_argument("--max-ratio", type=float, default=0.75,
+                    help="preload total PSS / spawn total PSS to pass")
+    ap.add_argument("--min-shared", type=float, default=0.7,
+                    help="share of a forked worker's shared bytes kept after the traffic")
+    ap.add_argument("--gc-child", choices=("0", "1"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.gc_child:
+        gc_child(args.gc_child == "1")
+        return
+    logging.basicConfig(level=logging.WARNING)
+
+    unfrozen, frozen = check_gc()
+    print(f"Full collection in a forked worker copies {unfrozen / MB:.1f} MB of preloaded "
+          f"pages, {frozen / MB:.1f} MB with gc.freeze()")
+    assert frozen * 2 < unfrozen, "gc.freeze() does not keep the collector off the preloaded pages"
+
+    fake = FakeTelegram(latency=0.0, rate_limit=10**9, chat_interval=0)
+    tracker = ReplyTracker(fake)
+    updates = UpdateFactory()
+    fake_server = FakeTelegramServer(fake)
+    await fake_server.start()
+    tmp = Path(tempfile.mkdtemp(prefix="bench_prefork_"))
+    print(f"{args.workers} workers, {args.users} users x {args.rounds} RFI answers\n")
+    try:
+        _, spawn = await run("spawn", args, fake_server, tracker, updates, tmp)
+        before, preload = await run("preload", args, fake_server, tracker, updates, tmp)
+    finally:
+        await fake_server.stop()
+
+    spawn_pss = sum(m["pss_bytes"] for m in spawn.values())
+    preload_pss = sum(m["pss_bytes"] for m in preload.values())
+    ratio = preload_pss / spawn_pss
+    print(f"\nTotal PSS: spawn {spawn_pss / MB:.1f} MB, preload {preload_pss / MB:.1f} MB "
+          f"(x{ratio:.2f})")
+    assert ratio <= args.max_ratio, f"preload uses x{ratio:.2f} of spawn's memory (max {args.max_ratio})"
+    for name, m in preload.items():
+        if name == "pool":
+            continue
+        kept = m["shared_bytes"] / max(before[name]["shared_bytes"], 1)
+        print(f"  {name}: {m['shared_bytes'] / MB:.1f} MB still shared after the traffic ({kept:.0%})")
+        assert kept >= args.min_shared, f"{name} kept only {kept:.0%} of its shared pages"
+    print("Prefork bench passed!")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
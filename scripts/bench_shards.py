@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Throughput of the sharded deployment (router + N worker processes).
+
+Runs bot/router.py's Router with real worker processes against a fake
+Bot API served over HTTP, and drives the CPU-bound path: each simulated
+user asks for an RFI quiz and answers it (range chart rendered and sent
+as a photo), `--rounds` times. Reports answers/s for every shard count.
+
+With `--restart`, worker 0 is killed (SIGKILL) mid-run; the router
+restarts it, and every update it had taken but not yet processed, or
+that was queued for it meanwhile, must still be answered.
+
+Usage: python scripts/bench_shards.py [--shards 1,2,4] [--users 40]
+           [--rounds 3] [--restart]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import tempfile
+import time
+from pathlib import Path
+
+from fake_telegram import FakeTelegram, FakeTelegramServer, ReplyTracker, UpdateFactory
+
+import httpx
+
+from router import Router
+
+TOKEN = "123:fake"
+PATH = "/telegram"
+
+
+async def user_session(tracker, updates, client, url, uid, rounds):
+    seen = len(tracker.replies[uid])
+
+    async def send(update, replies):
+        nonlocal seen
+        r = await client.post(url, json=update)
+        assert r.status_code == 200, r.status_code
+        seen += replies
+        await tracker.wait(uid, seen, timeout=120)
+
+    for _ in range(rounds):
+        await send(updates.command(uid, "/quiz btn"), 1)
+        message, buttons = tracker.last_keyboard(uid)
+        # edit + range chart photo (carrying Next/Fix)
+        await send(updates.callback(uid, message, buttons[0]), 2)
+
+
+async def run(shards: int, args, fake_server: FakeTelegramServer, tracker, updates, tmp: Path):
+    state_dir = tmp / f"state{shards}"
+    state_dir.mkdir()
+    router = Router(
+        TOKEN, shard_count=shards, base_port=args.base_port, mode="webhook",
+        api_base_url=fake_server.base_url, listen="127.0.0.1", port=0, path=PATH,
+        webhook_url="", webhook_secret="", state_dir=state_dir,
+        worker_env={
+            "BOT_API_BASE_URL": fake_server.base_url,
+            "BANKROLL_DB_PATH": str(tmp / "bankroll.db"),
+            "CONCURRENT_UPDATES": str(args.concurrency),
+            "BOT_API_RATE_PER_SEC": "100000",
+        },
+    )
+    await router.start()
+    url = f"http://127.0.0.1:{router.http.port}{PATH}"
+    base_uid = shards * 100_000
+    try:
+        async with httpx.AsyncClient(timeout=30) as client:
+            # Warm-up: wait until every worker answers
+            warm = [base_uid + i for i in range(shards)]
+            await asyncio.gather(*(
+                client.post(url, json=updates.command(uid, "/start")) for uid in warm
+            ))
+            for uid in warm:
+                await tracker.wait(uid, 1, timeout=120)
+
+            restart = None
+            if args.restart:
+                async def restart_worker():
+                    await asyncio.sleep(1.0)
+                    router.workers[0].proc.send_signal(signal.SIGKILL)
+                restart = asyncio.create_task(restart_worker())
+
+            t0 = time.perf_counter()
+            await asyncio.gather(*(
+                user_session(tracker, updates, client, url, base_uid + i, args.rounds)
+                for i in range(args.users)
+            ))
+            elapsed = time.perf_counter() - t0
+            if restart:
+                await restart
+    finally:
+        await router.stop()
+    answers = args.users * args.rounds
+    stats = router.stats()
+    print(f"{shards} worker(s): {answers} answers in {elapsed:.2f}s "
+          f"({answers / elapsed:.1f} answers/s)  delivered={stats['delivered']} "
+          f"retries={stats['retries']} restarts={stats['restarts']} "
+          f"redelivered={stats['redelivered']}")
+    return answers / elapsed
+
+
+async def main():
+    ap = argparse.ArgumentParser(description="Sharded router throughput benchmark")
+    ap.add_argument("--shards", default="1,2,4", help="comma-separated worker counts")
+    ap.add_argument("--users", type=int, default=40)
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--concurrency", type=int, default=4, help="CONCURRENT_UPDATES per worker")
+    ap.add_argument("--latency", type=float, default=0.01, help="fake API latency (s)")
+    ap.add_argument("--base-port", type=int, default=18100)
+    ap.add_argument("--restart", action="store_true", help="SIGKILL worker 0 mid-run")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    fake = FakeTelegram(latency=args.latency, rate_limit=10**9, chat_interval=0)
+    tracker = ReplyTracker(fake)
+    updates = UpdateFactory()
+    fake_server = FakeTelegramServer(fake)
+    await fake_server.start()
+    print(f"{os.cpu_count()} CPU(s), {args.users} users x {args.rounds} RFI answers\n")
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_shards_"))
+    results = {}
+    try:
+        for n in (int(x) for x in args.shards.split(",")):
+            results[n] = await run(n, args, fake_server, tracker, updates, tmp)
+    finally:
+        await fake_server.stop()
+    base = results[min(results)]
+    print("\nspeedup: " + ", ".join(f"{n}x workers {r / base:.2f}" for n, r in results.items()))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Cold start: time from spawning bot/main.py to its first reply.
+
+Starts FakeTelegramServer with a /quiz already waiting in getUpdates,
+spawns the bot (polling, temp databases) and times, from the spawn:
+
+- first reply: the quiz message for the waiting /quiz
+- first chart: an RFI quiz is then asked and answered, so the answer's
+  range chart is the first render (and, with lazy startup, the first
+  Pillow import)
+
+The bot's own "Startup:" log line (per-phase breakdown) is shown for the
+last run. Each mode runs `--runs` times in fresh processes; medians are
+reported. With `--compare` the eager mode (LAZY_STARTUP=0: every format's
+ranges and weights, all EV tables and Pillow loaded before polling) runs
+too; with `--against REV` so does the bot as of git revision REV (checked
+out into a temporary worktree), and lazy must reach its first reply in at
+most `--max-ratio` of that time.
+
+Usage: python scripts/bench_startup.py [--runs 5] [--compare] [--against REV] [--max-ratio 0.75]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "bot"))
+
+from fake_telegram import FakeTelegram, FakeTelegramServer, ReplyTracker, UpdateFactory
+
+ROOT = Path(__file__).parent.parent
+BOT_SCRIPT = ROOT / "bot" / "main.py"
+UID = 4242
+
+
+async def one_run(lazy: bool, script: Path = BOT_SCRIPT) -> tuple[float, float, str]:
+    fake = FakeTelegram(latency=0.0, rate_limit=10**9, chat_interval=0)
+    tracker = ReplyTracker(fake)
+    updates = UpdateFactory()
+    server = FakeTelegramServer(fake)
+    await server.start()
+    tmp = Path(tempfile.mkdtemp(prefix="bench_startup_"))
+    env = {
+        **os.environ,
+        "TELEGRAM_BOT_TOKEN": "123:fake",
+        "BOT_API_BASE_URL": server.base_url,
+        "BOT_MODE": "polling",
+        "BANKROLL_DB_PATH": str(tmp / "bankroll.db"),
+        "STATE_DB_PATH": str(tmp / "bot_state.db"),
+        "BOT_API_RATE_PER_SEC": "100000",
+        "LAZY_STARTUP": "1" if lazy else "0",
+        "LOG_RATE_LIMITS": "",
+    }
+    fake.push_update(updates.command(UID, "/quiz"))
+    start = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, str(script), env=env,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+    )
+    log_lines: list[str] = []
+
+    async def read_log():
+        async for line in proc.stderr:
+            log_lines.append(line.decode(errors="replace").rstrip())
+    reader = asyncio.create_task(read_log())
+    try:
+        await tracker.wait(UID, 1, timeout=60)
+        first_reply = time.perf_counter() - start
+        fake.push_update(updates.command(UID, "/quiz 6max_100bb BTN"))
+        message, buttons = await tracker.wait_keyboard(UID, "q:", after=1, timeout=60)
+        fake.push_update(updates.callback(UID, message, buttons[0]))
+        deadline = time.monotonic() + 60
+        while not fake.calls["sendPhoto"]:
+            if time.monotonic() > deadline:
+                raise TimeoutError("no chart sent")
+            await asyncio.sleep(0.005)
+        first_chart = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        await proc.wait()
+        reader.cancel()
+        await server.stop()
+    startup = next((l.split(" - INFO - ", 1)[1] for l in log_lines if "Startup:" in l), "")
+    return first_reply, first_chart, startup
+
+
+async def bench(lazy: bool, runs: int, script: Path = BOT_SCRIPT, name: str = "") -> float:
+    results = [await one_run(lazy, script) for _ in range(runs)]
+    reply = statistics.median(r[0] for r in results)
+    chart = statistics.median(r[1] for r in results)
+    name = name or ("lazy" if lazy else "eager")
+    print(f"{name:5s}: first reply {reply * 1000:6.0f} ms, first chart {chart * 1000:6.0f} ms "
+          f"(median of {runs})")
+    if results[-1][2]:
+        print(f"       {results[-1][2]}")
+    return reply
+
+
+async def bench_revision(rev: str, runs: int) -> float:
+    worktree = Path(tempfile.mkdtemp(prefix="bench_startup_rev_")) / "tree"
+    subprocess.run(["git", "-C", str(ROOT), "worktree", "add", "-q", "--detach",
+                    str(worktree), rev], check=True)
+    try:
+        return await bench(False, runs, worktree / "bot" / "main.py", rev)
+    finally:
+        subprocess.run(["git", "-C", str(ROOT), "worktree", "remove", "--force",
+                        str(worktree)], check=True)
+
+
+async def main():
+    ap = argparse.ArgumentParser(description="Bot cold start: spawn to first reply")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--compare", action="store_true", help="also run LAZY_STARTUP=0")
+    ap.add_argument("--eager", action="store_true", help="only run LAZY_STARTUP=0")
+    ap.add_argument("--against", metavar="REV", help="also run the bot at this git revision")
+    ap.add_argument("--max-ratio", type=float, default=0.75,
+                    help="with --against: lazy/REV first-reply ratio to pass")
+    args = ap.parse_args()
+
+    if args.eager:
+        await bench(False, args.runs)
+        return
+    if args.against:
+        before = await bench_revision(args.against, args.runs)
+    if args.compare:
+        eager = await bench(False, args.runs)
+    lazy = await bench(True, args.runs)
+    if args.compare:
+        print(f"\nlazy/eager time to first reply: {lazy / eager:.2f}")
+    if args.against:
+        ratio = lazy / before
+        print(f"lazy/{args.against} time to first reply: {ratio:.2f}")
+        assert ratio <= args.max_ratio, f"lazy start is {ratio:.2f} of {args.against} (max {args.max_ratio})"
+    print("Startup bench passed!")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
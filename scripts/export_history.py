@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""Export answer_history to date-partitioned columnar files.
+
+Streams the table in fixed-size id-ordered chunks (keyset pagination, one
+short read per chunk) from a read-only connection, so memory stays
+constant and the live bot's writers are never held up. Output layout:
+
+    <out>/date=YYYY-MM-DD/part-<first_id>-<last_id>.parquet   (pyarrow)
+    <out>/date=YYYY-MM-DD/part-<first_id>-<last_id>.arrow     (--format arrow)
+    <out>/date=YYYY-MM-DD/part-<first_id>-<last_id>.csv.gz    (fallback)
+
+Exports are incremental: the highest exported id is stored in
+<out>/_state.json after every chunk and the next run resumes after it.
+
+Usage:
+    python scripts/export_history.py [--out exports/answer_history]
+        [--chunk 50000] [--format auto|parquet|arrow|csv] [--full]
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "bot"))
+
+from config import DB_PATH, PROJECT_ROOT
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+COLUMNS = [
+    "id", "user_id", "scenario_id", "hand", "chosen_action", "chosen_ev",
+    "best_action", "ev_vs_best", "bankroll_after", "was_correct", "timestamp",
+]
+DEFAULT_OUT = PROJECT_ROOT / "exports" / "answer_history"
+STATE_NAME = "_state.json"
+
+
+def _arrow_schema():
+    return pa.schema([
+        ("id", pa.int64()), ("user_id", pa.int64()),
+        ("scenario_id", pa.string()), ("hand", pa.string()),
+        ("chosen_action", pa.string()), ("chosen_ev", pa.float64()),
+        ("best_action", pa.string()), ("ev_vs_best", pa.float64()),
+        ("bankroll_after", pa.float64()), ("was_correct", pa.bool_()),
+        ("timestamp", pa.string()),
+    ])
+
+
+def load_hwm(out_dir: Path) -> int:
+    path = out_dir / STATE_NAME
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            return int(json.load(f).get("last_id", 0))
+    return 0
+
+
+def save_hwm(out_dir: Path, last_id: int):
+    """Atomic replace so a crash never leaves a half-written state file."""
+    path = out_dir / STATE_NAME
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"last_id": last_id, "updated_at": time.time()}, f)
+    os.replace(tmp, path)
+
+
+def iter_chunks(conn: sqlite3.Connection, after_id: int, chunk: int):
+    """Yield lists of rows with id > after_id, `chunk` rows at a time."""
+    sql = (f"SELECT {', '.join(COLUMNS)} FROM answer_history "
+           "WHERE id > ? ORDER BY id LIMIT ?")
+    last_id = after_id
+    while True:
+        rows = conn.execute(sql, (last_id, chunk)).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def _write_csv_gz(path: Path, rows: list):
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(COLUMNS)
+        w.writerows(rows)
+
+
+def _write_arrow(path: Path, rows: list, fmt: str):
+    cols = list(zip(*rows))
+    data = {name: list(col) for name, col in zip(COLUMNS, cols)}
+    data["was_correct"] = [bool(v) for v in data["was_correct"]]
+    table = pa.Table.from_pydict(data, schema=_arrow_schema())
+    if fmt == "parquet":
+        pq.write_table(table, path, compression="zstd")
+    else:
+        with pa.OSFile(str(path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+
+EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv.gz"}
+
+
+def write_partition(out_dir: Path, date: str, rows: list, fmt: str) -> Path:
+    part_dir = out_dir / f"date={date}"
+    part_dir.mkdir(parents=True, exist_ok=True)
+    name = f"part-{rows[0][0]:012d}-{rows[-1][0]:012d}{EXTENSIONS[fmt]}"
+    path = part_dir / name
+    tmp = path.with_name(name + ".tmp")
+    if fmt == "csv":
+        _write_csv_gz(tmp, rows)
+    else:
+        _write_arrow(tmp, rows, fmt)
+    os.replace(tmp, path)
+    return path
+
+
+def export(db_path: Path, out_dir: Path, chunk: int = 50_000,
+           fmt: str = "auto", full: bool = False) -> dict:
+    if fmt == "auto":
+        fmt = "parquet" if pa is not None else "csv"
+    if fmt in ("parquet", "arrow") and pa is None:
+        raise SystemExit(f"--format {fmt} needs pyarrow (pip install pyarrow)")
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    after_id = 0 if full else load_hwm(out_dir)
+
+    # Read-only: never takes a write lock; in WAL mode readers don't block the bot
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    t0 = time.perf_counter()
+    n_rows = n_files = 0
+    last_id = after_id
+    try:
+        for rows in iter_chunks(conn, after_id, chunk):
+            by_date = defaultdict(list)
+            for r in rows:
+                by_date[(r[10] or "unknown")[:10]].append(r)
+            for date, date_rows in sorted(by_date.items()):
+                write_partition(out_dir, date, date_rows, fmt)
+                n_files += 1
+            n_rows += len(rows)
+            last_id = rows[-1][0]
+            save_hwm(out_dir, last_id)
+    finally:
+        conn.close()
+
+    return {
+        "format": fmt, "rows": n_rows, "files": n_files,
+        "from_id": after_id, "last_id": last_id,
+        "seconds": time.perf_counter() - t0,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Export answer_history to columnar files")
+    ap.add_argument("--db", type=Path, default=DB_PATH)
+    ap.add_argument("--out", type=Path, default=DEFAULT_OUT)
+    ap.add_argument("--chunk", type=int, default=50_000, help="rows per read")
+    ap.add_argument("--format", choices=["auto", "parquet", "arrow", "csv"], default="auto")
+    ap.add_argument("--full", action="store_true", help="ignore the stored high-water mark")
+    args = ap.parse_args()
+
+    if not args.db.exists():
+        print(f"Database not found: {args.db}")
+        sys.exit(1)
+
+    r = export(args.db, args.out, args.chunk, args.format, args.full)
+    rate = r["rows"] / r["seconds"] if r["seconds"] else 0
+    print(f"Exported {r['rows']} rows (id {r['from_id']}→{r['last_id']}) "
+          f"into {r['files']} {r['format']} file(s) in {r['seconds']:.2f}s ({rate:.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+"""In-process stand-in for the Telegram Bot API, for benchmarks.
+
+FakeTelegram answers the subset of Bot API methods the bot uses, with
+configurable latency (per method if needed) and Telegram-style limits:
+more than `rate_limit` sends in any second, or more than one send per
+chat per `chat_interval`, gets a 429 with retry_after — plus optional
+random 429 injection and chats that answer 403 (blocked the bot).
+
+Updates fed in with push_update() reach the bot the way Telegram would
+deliver them: long-polled through getUpdates, or — once the bot calls
+setWebhook — POSTed to its webhook URL with the secret token header.
+
+FakeRequest plugs it into python-telegram-bot as a BaseRequest, so a
+real telegram.Bot / Application talks to it without any network:
+
+    fake = FakeTelegram(latency=0.05)
+    bot = Bot("123:fake", request=FakeRequest(fake))
+
+FakeTelegramServer serves it over HTTP instead, for bot processes started
+with BOT_API_BASE_URL pointing at it. UpdateFactory and ReplyTracker build
+synthetic updates and wait for the bot's replies to them.
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter, defaultdict, deque
+from email.parser import BytesParser
+from email.policy import HTTP
+from pathlib import Path
+from urllib.parse import parse_qsl
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "bot"))
+
+import httpx
+from telegram.request import BaseRequest
+
+from httpserver import HttpServer, Request, json_response
+
+SEND_METHODS = {"sendMessage", "sendPhoto", "editMessageText", "editMessageMedia",
+                "editMessageCaption", "editMessageReplyMarkup"}
+
+BOT_USER = {"id": 123, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+
+
+class FakeTelegram:
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        rate_limit: int = 30,
+        chat_interval: float = 1.0,
+        inject_429: float = 0.0,
+        blocked: set = None,
+        method_latency: dict = None,
+    ):
+        self.latency = latency
+        self.method_latency = dict(method_latency or {})
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.chat_interval = chat_interval
+        self.inject_429 = inject_429
+        self.blocked = set(blocked or ())
+        self.calls: Counter = Counter()       # method -> accepted calls
+        self.errors: Counter = Counter()      # status code -> count
+        self.log: list[tuple[float, str, dict]] = []
+        self._recent_sends: deque = deque()
+        self._chat_last: dict[int, float] = {}
+        self._message_id = 0
+        # Optional hook called as on_call(method, params, result) after each accepted call
+        self.on_call = None
+        # Update delivery: getUpdates queue, or webhook pushers once set
+        self._pending: deque = deque()
+        self._arrived = asyncio.Event()
+        self.webhook: dict | None = None
+        self._webhook_queue: asyncio.Queue | None = None
+        self._pushers: list[asyncio.Task] = []
+        self._pusher_client: httpx.AsyncClient | None = None
+        self.delivered = 0
+
+    def _message(self, chat_id, message_id: int = None, **extra) -> dict:
+        if message_id is None:
+            self._message_id += 1
+            message_id = self._message_id
+        return {
+            "message_id": message_id, "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if int(chat_id) > 0 else "group"},
+            "from": BOT_USER, **extra,
+        }
+
+    def _error(self, code: int, description: str, retry_after: int = None):
+        self.errors[code] += 1
+        body = {"ok": False, "error_code": code, "description": description}
+        if retry_after:
+            body["parameters"] = {"retry_after": retry_after}
+        return code, body
+
+    def _check_limits(self, method: str, chat_id) -> tuple[int, dict] | None:
+        if method not in SEND_METHODS or chat_id is None:
+            return None
+        if chat_id in self.blocked:
+            return self._error(403, "Forbidden: bot was blocked by the user")
+        now = time.monotonic()
+        while self._recent_sends and now - self._recent_sends[0] > 1.0:
+            self._recent_sends.popleft()
+        if len(self._recent_sends) >= self.rate_limit:
+            return self._error(429, "Too Many Requests: retry after 1", 1)
+        if now - self._chat_last.get(chat_id, -1e9) < self.chat_interval:
+            return self._error(429, "Too Many Requests: retry after 1", 1)
+        if self.inject_429 and random.random() < self.inject_429:
+            return self._error(429, "Too Many Requests: retry after 1", 1)
+        self._recent_sends.append(now)
+        self._chat_last[chat_id] = now
+        return None
+
+    # ─── Update delivery ─────────────────────────────────────────────────
+
+    def push_update(self, update: dict):
+        """Queue an update for the bot (getUpdates or webhook, as configured)."""
+        if self._webhook_queue is not None:
+            self._webhook_queue.put_nowait(update)
+        else:
+            self._pending.append(update)
+            self._arrived.set()
+
+    async def _get_updates(self, params: dict) -> list[dict]:
+        offset = int(params.get("offset") or 0)
+        while self._pending and self._pending[0]["update_id"] < offset:
+            self._pending.popleft()     # confirmed by the offset
+        if not self._pending:
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get("limit") or 100)
+        updates = list(self._pending)[:limit]
+        self.delivered += len(updates)
+        return updates
+
+    async def _push(self, client: httpx.AsyncClient):
+        while True:
+            update = await self._webhook_queue.get()
+            headers = {}
+            if self.webhook.get("secret_token"):
+                headers["X-Telegram-Bot-Api-Secret-Token"] = self.webhook["secret_token"]
+            while True:
+                try:
+                    r = await client.post(self.webhook["url"], json=update, headers=headers)
+                    if r.status_code == 200:
+                        self.delivered += 1
+                        break
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.5)   # Telegram retries failed deliveries too
+
+    def _set_webhook(self, params: dict):
+        self._stop_pushers()
+        self.webhook = {"url": params["url"], "secret_token": params.get("secret_token")}
+        self._webhook_queue = asyncio.Queue()
+        if params.get("drop_pending_updates") in (True, "true", "True"):
+            self._pending.clear()
+        while self._pending:
+            self._webhook_queue.put_nowait(self._pending.popleft())
+        if self._pusher_client is None:
+            self._pusher_client = httpx.AsyncClient(timeout=30)
+        n = int(params.get("max_connections") or 40)
+        self._pushers = [asyncio.create_task(self._push(self._pusher_client)) for _ in range(n)]
+
+    def _stop_pushers(self):
+        for task in self._pushers:
+            task.cancel()
+        self._pushers = []
+        if self._webhook_queue is not None:
+            while not self._webhook_queue.empty():
+                self._pending.append(self._webhook_queue.get_nowait())
+        self._webhook_queue = None
+        self.webhook = None
+
+    async def close(self):
+        """Stop webhook delivery (pending updates stay queued)."""
+        self._stop_pushers()
+        if self._pusher_client is not None:
+            await self._pusher_client.aclose()
+            self._pusher_client = None
+
+    # ─── API ─────────────────────────────────────────────────────────────
+
+    async def handle(self, method: str, params: dict) -> tuple[int, dict]:
+        delay = self.method_latency.get(method, self.latency)
+        delay += random.random() * self.jitter if self.jitter else 0.0
+        if delay:
+            await asyncio.sleep(delay)
+
+        chat_id = params.get("chat_id")
+        if chat_id is not None:
+            chat_id = int(chat_id)
+        err = self._check_limits(method, chat_id)
+        if err:
+            return err
+
+        self.calls[method] += 1
+        self.log.append((time.monotonic(), method, params))
+
+        if method == "getMe":
+            result = BOT_USER
+        elif method == "sendMessage":
+            result = self._message(chat_id, text=params.get("text", ""))
+        elif method == "sendPhoto":
+            result = self._message(chat_id, photo=[{
+                "file_id": "p", "file_unique_id": "p", "width": 1, "height": 1,
+            }], caption=params.get("caption"))
+        elif method.startswith("editMessage"):
+            result = self._message(chat_id, int(params.get("message_id", 0)),
+                                   text=params.get("text", params.get("caption", "")))
+        elif method == "getUpdates":
+            if self.webhook is not None:
+                return self._error(409, "Conflict: can't use getUpdates method while webhook is active")
+            result = await self._get_updates(params)
+        elif method == "setWebhook":
+            self._set_webhook(params)
+            result = True
+        elif method == "deleteWebhook":
+            self._stop_pushers()
+            if params.get("drop_pending_updates") in (True, "true", "True"):
+                self._pending.clear()
+            result = True
+        elif method == "getWebhookInfo":
+            result = {
+                "url": (self.webhook or {}).get("url", ""),
+                "has_custom_certificate": False,
+                "pending_update_count": len(self._pending) + (
+                    self._webhook_queue.qsize() if self._webhook_queue else 0),
+            }
+        else:  # answerCallbackQuery, setMyCommands, ...
+            result = True
+        if self.on_call is not None:
+            self.on_call(method, params, result)
+        return 200, {"ok": True, "result": result}
+
+
+class FakeRequest(BaseRequest):
+    """python-telegram-bot transport that routes every call to a FakeTelegram."""
+
+    def __init__(self, fake: FakeTelegram):
+        self.fake = fake
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        code, body = await self.fake.handle(api_method, params)
+        return code, json.dumps(body).encode()
+
+
+def _decode_value(value: str):
+    # Bot API form fields carry objects (reply_markup, ...) as JSON strings
+    if value[:1] in "{[":
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _decode_params(req: Request) -> dict:
+    ctype = req.headers.get("content-type", "")
+    params = dict(req.query)
+    if not req.body:
+        return params
+    if ctype.startswith("application/json"):
+        params.update(req.json())
+    elif ctype.startswith("multipart/form-data"):
+        msg = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {ctype}\r\n\r\n".encode() + req.body
+        )
+        for part in msg.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            payload = part.get_payload(decode=True)
+            if part.get_filename():
+                params[name] = payload
+            else:
+                params[name] = _decode_value(payload.decode())
+    else:
+        params.update((k, _decode_value(v)) for k, v in parse_qsl(req.body.decode()))
+    return params
+
+
+class FakeTelegramServer:
+    """Serves a FakeTelegram at http://host:port/bot<token>/<method>."""
+
+    def __init__(self, fake: FakeTelegram, host: str = "127.0.0.1", port: int = 0):
+        self.fake = fake
+        self.http = HttpServer(host, port, max_body=50 << 20)
+        self.http.route_prefix("POST", "/bot", self._handle)
+        self.http.route_prefix("GET", "/bot", self._handle)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.http.host}:{self.http.port}/bot"
+
+    async def start(self):
+        await self.http.start()
+
+    async def stop(self):
+        await self.fake.close()
+        await self.http.stop()
+
+    async def _handle(self, req: Request):
+        code, body = await self.fake.handle(req.path.rsplit("/", 1)[-1], _decode_params(req))
+        return json_response(body, code)
+
+
+class UpdateFactory:
+    """Synthetic Telegram updates (as the JSON dicts Telegram would send)."""
+
+    def __init__(self):
+        self._next_id = 0
+
+    def _id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    @staticmethod
+    def user(uid: int) -> dict:
+        return {"id": uid, "is_bot": False, "first_name": f"user{uid}", "username": f"user{uid}"}
+
+    def command(self, uid: int, text: str, chat_id: int = None) -> dict:
+        command = text.split()[0]
+        chat_id = uid if chat_id is None else chat_id
+        return {
+            "update_id": self._id(),
+            "message": {
+                "message_id": self._id(), "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private" if chat_id == uid else "group"},
+                "from": self.user(uid), "text": text,
+                "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}],
+            },
+        }
+
+    def callback(self, uid: int, message: dict, data: str) -> dict:
+        return {
+            "update_id": self._id(),
+            "callback_query": {
+                "id": str(self._id()), "from": self.user(uid),
+                "chat_instance": str(message["chat"]["id"]),
+                "message": message, "data": data,
+            },
+        }
+
+
+class ReplyTracker:
+    """Records chat-directed API calls so a client can await the bot's replies."""
+
+    def __init__(self, fake: FakeTelegram):
+        self.replies: dict[int, list[tuple[str, dict, object]]] = defaultdict(list)
+        self._changed = asyncio.Condition()
+        fake.on_call = self._on_call
+
+    def _on_call(self, method, params, result):
+        chat_id = params.get("chat_id")
+        if chat_id is None:
+            return
+        self.replies[int(chat_id)].append((method, params, result))
+
+        async def notify():
+            async with self._changed:
+                self._changed.notify_all()
+        asyncio.get_running_loop().create_task(notify())
+
+    async def wait(self, chat_id: int, count: int, timeout: float = 30.0):
+        """Wait until `chat_id` has received at least `count` replies in total."""
+        async with self._changed:
+            await asyncio.wait_for(
+                self._changed.wait_for(lambda: len(self.replies[chat_id]) >= count), timeout
+            )
+
+    def last_keyboard(self, chat_id: int) -> tuple[dict, list[str]]:
+        """(message, callback_data list) of the latest reply that had buttons."""
+        for method, params, result in reversed(self.replies[chat_id]):
+            markup = params.get("reply_markup")
+            if isinstance(markup, str):
+                markup = json.loads(markup)
+            if markup and "inline_keyboard" in markup:
+                data = [b["callback_data"] for row in markup["inline_keyboard"] for b in row]
+                return result, data
+        raise LookupError(f"no keyboard sent to {chat_id}")
+
+    def _keyboard_after(self, chat_id: int, prefix: str, after: int):
+        for method, params, result in self.replies[chat_id][after:]:
+            markup = params.get("reply_markup")
+            if isinstance(markup, str):
+                markup = json.loads(markup)
+            if markup and "inline_keyboard" in markup:
+                data = [b["callback_data"] for row in markup["inline_keyboard"] for b in row]
+                if data and data[0].startswith(prefix):
+                    return result, data
+        return None
+
+    async def wait_keyboard(self, chat_id: int, prefix: str, after: int = 0,
+                            timeout: float = 30.0) -> tuple[dict, list[str]]:
+        """Wait for a reply (from index `after` on) whose buttons start with `prefix`."""
+        found = None
+
+        def check():
+            nonlocal found
+            found = self._keyboard_after(chat_id, prefix, after)
+            return found is not None
+
+        async with self._changed:
+            await asyncio.wait_for(self._changed.wait_for(check), timeout)
+        return found
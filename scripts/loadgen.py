@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""Synthetic load against a real bot process and a local fake Bot API.
+
+Starts FakeTelegramServer, then bot/main.py as a subprocess pointed at it
+(BOT_API_BASE_URL) in polling or webhook mode, with temp databases. N
+simulated users loop /quiz -> answer -> Next -> answer -> ... with a
+think time between taps; each step is timed from the update being
+queued at the fake API to the bot's reply carrying the next keyboard.
+
+Reports, every `--sample` seconds and overall:
+
+- throughput (completed steps/s) and Bot API calls/s
+- per-handler latency percentiles (quiz, answer, next)
+- SQLite commits per database (counted inside the bot process)
+- bot process RSS
+
+    python scripts/loadgen.py --users 100 --duration 30 --mode webhook
+    python scripts/loadgen.py --users 50 --latency 0.1 --inject-429 0.02
+
+`--json PATH` also writes the samples and summary for comparing runs.
+`--profile SEC` sends the bot SIGUSR2 once the load is running, which
+samples it for SEC seconds (bot/profiler.py), and prints the top of the
+resulting summary; the flame-graph stacks are left next to it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Optional
+
+BOT_SCRIPT = Path(__file__).parent.parent / "bot" / "main.py"
+TOKEN = "123:fake"
+WEBHOOK_PATH = "/telegram"
+WEBHOOK_SECRET = "loadgen-secret"
+# Child -> parent stats lines on stdout start with this
+STATS_PREFIX = "LOADGEN "
+
+
+def _percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+# ─── Bot side (--child) ──────────────────────────────────────────────────
+
+def child_main(interval: float):
+    """Run bot/main.py with SQLite commit counters reported on stdout."""
+    sys.path.insert(0, str(BOT_SCRIPT.parent))
+    sys.argv = [str(BOT_SCRIPT)]
+    import main as bot_main
+
+    commits: Counter = Counter()
+
+    def tracer(name: str):
+        def on_statement(sql: str):
+            if sql.startswith("COMMIT"):
+                commits[name] += 1
+        return on_statement
+
+    bot_main.bankroll_manager.conn.set_trace_callback(tracer("bankroll"))
+    bot_main.state_store.conn.set_trace_callback(tracer("state"))
+
+    def report():
+        never = threading.Event()       # waits show up as idle in --profile
+        while True:
+            print(STATS_PREFIX + json.dumps({"commits": dict(commits)}), flush=True)
+            never.wait(interval)
+
+    threading.Thread(target=report, daemon=True).start()
+    bot_main.main()
+
+
+# ─── Telegram side ───────────────────────────────────────────────────────
+
+class Stats:
+    def __init__(self):
+        self.latency: dict[str, list[float]] = defaultdict(list)
+        self.timeouts = 0
+        self.commits: dict = {}
+
+    @property
+    def steps(self) -> int:
+        return sum(len(v) for v in self.latency.values())
+
+
+async def user_loop(fake, tracker, updates, uid: int, args, stats: Stats, stop: asyncio.Event):
+    await asyncio.sleep(random.uniform(0, args.think * 2))   # stagger starts
+
+    async def step(name: str, update: dict, expect_prefix: str):
+        seen = len(tracker.replies[uid])
+        t0 = time.perf_counter()
+        fake.push_update(update)
+        try:
+            found = await tracker.wait_keyboard(uid, expect_prefix, after=seen, timeout=args.timeout)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            return None
+        stats.latency[name].append(time.perf_counter() - t0)
+        return found
+
+    while not stop.is_set():
+        quiz = await step("quiz", updates.command(uid, "/quiz"), "q:")
+        while quiz is not None and not stop.is_set():
+            await asyncio.sleep(random.expovariate(1 / args.think))
+            message, buttons = quiz
+            result = await step("answer", updates.callback(uid, message, random.choice(buttons)), "next:")
+            if result is None or stop.is_set():
+                break
+            await asyncio.sleep(random.expovariate(1 / args.think))
+            message, buttons = result
+            quiz = await step("next", updates.callback(uid, message, buttons[0]), "q:")
+
+
+async def sample_loop(proc, fake, stats: Stats, args, samples: list, t0: float):
+    last_steps, last_calls = 0, 0
+    while True:
+        await asyncio.sleep(args.sample)
+        calls = sum(fake.calls.values())
+        sample = {
+            "t": round(time.perf_counter() - t0, 1),
+            "steps_per_s": (stats.steps - last_steps) / args.sample,
+            "api_calls_per_s": (calls - last_calls) / args.sample,
+            "rss_mb": round(_rss_mb(proc.pid), 1),
+            "commits": dict(stats.commits),
+        }
+        last_steps, last_calls = stats.steps, calls
+        samples.append(sample)
+        print(f"  t={sample['t']:5.1f}s  {sample['steps_per_s']:6.1f} steps/s  "
+              f"{sample['api_calls_per_s']:6.1f} calls/s  RSS {sample['rss_mb']:6.1f} MB  "
+              f"commits {sum(stats.commits.values())}")
+
+
+async def read_child_stats(proc, stats: Stats):
+    while True:
+        line = await proc.stdout.readline()
+        if not line:
+            return
+        line = line.decode(errors="replace").rstrip()
+        if line.startswith(STATS_PREFIX):
+            stats.commits = json.loads(line[len(STATS_PREFIX):])["commits"]
+        else:
+            print(line)
+
+
+async def _wait_profile(tmp: Path, seconds: float) -> Optional[Path]:
+    """The bot's profile summary, once the SIGUSR2 session has written it."""
+    deadline = time.monotonic() + seconds + 30
+    while time.monotonic() < deadline:
+        reports = sorted(tmp.glob("profile-*.txt"))
+        if reports:
+            return reports[-1]
+        await asyncio.sleep(0.2)
+    print("No profile written (SIGUSR2 unsupported here?)")
+    return None
+
+
+async def run(args):
+    from fake_telegram import FakeTelegram, FakeTelegramServer, ReplyTracker, UpdateFactory
+
+    fake = FakeTelegram(
+        latency=args.latency, jitter=args.jitter, rate_limit=args.rate_limit,
+        chat_interval=args.chat_interval, inject_429=args.inject_429,
+    )
+    tracker = ReplyTracker(fake)
+    updates = UpdateFactory()
+    server = FakeTelegramServer(fake)
+    await server.start()
+
+    tmp = Path(tempfile.mkdtemp(prefix="loadgen_"))
+    port = _free_port()
+    env = {
+        **os.environ,
+        "TELEGRAM_BOT_TOKEN": TOKEN,
+        "BOT_API_BASE_URL": server.base_url,
+        "BOT_MODE": args.mode,
+        "BANKROLL_DB_PATH": str(tmp / "bankroll.db"),
+        "STATE_DB_PATH": str(tmp / "bot_state.db"),
+        "BOT_API_RATE_PER_SEC": str(args.bot_rate),
+        "CONCURRENT_UPDATES": str(args.concurrency),
+        "WEBHOOK_LISTEN": "127.0.0.1",
+        "WEBHOOK_PORT": str(port),
+        "WEBHOOK_PATH": WEBHOOK_PATH,
+        "WEBHOOK_URL": f"http://127.0.0.1:{port}{WEBHOOK_PATH}",
+        "WEBHOOK_SECRET": WEBHOOK_SECRET,
+        "PROFILE_DIR": str(tmp),
+        "PROFILE_SIGNAL_SEC": str(args.profile),
+    }
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, __file__, "--child", "--sample", str(args.sample),
+        env=env, stdout=asyncio.subprocess.PIPE,
+    )
+    stats = Stats()
+    samples: list[dict] = []
+    reader = asyncio.create_task(read_child_stats(proc, stats))
+    try:
+        # Ready once the bot is fetching updates / has registered its webhook
+        ready = "setWebhook" if args.mode == "webhook" else "getUpdates"
+        deadline = time.monotonic() + 60
+        while not fake.calls[ready]:
+            if proc.returncode is not None or time.monotonic() > deadline:
+                raise RuntimeError("bot process did not come up")
+            await asyncio.sleep(0.1)
+        idle_rss = _rss_mb(proc.pid)
+        print(f"{args.users} users, {args.mode}, {args.duration:.0f}s, think {args.think}s, "
+              f"fake API latency {args.latency * 1000:.0f} ms, bot idle RSS {idle_rss:.1f} MB\n")
+
+        stop = asyncio.Event()
+        t0 = time.perf_counter()
+        sampler = asyncio.create_task(sample_loop(proc, fake, stats, args, samples, t0))
+        users = [
+            asyncio.create_task(user_loop(fake, tracker, updates, 10_000 + i, args, stats, stop))
+            for i in range(args.users)
+        ]
+        if args.profile:
+            await asyncio.sleep(1.0)            # past the first-request warmup
+            proc.send_signal(signal.SIGUSR2)
+            await asyncio.sleep(args.duration - 1.0)
+        else:
+            await asyncio.sleep(args.duration)
+        stop.set()
+        await asyncio.gather(*users)
+        elapsed = time.perf_counter() - t0
+        await asyncio.sleep(args.sample)        # last commit counts
+        sampler.cancel()
+        profile_report = await _wait_profile(tmp, args.profile) if args.profile else None
+    finally:
+        if proc.returncode is None:
+            proc.terminate()
+            await proc.wait()
+        reader.cancel()
+        await server.stop()
+
+    summary = {
+        "users": args.users, "mode": args.mode, "elapsed": round(elapsed, 2),
+        "steps": stats.steps, "steps_per_s": round(stats.steps / elapsed, 2),
+        "timeouts": stats.timeouts,
+        "api_calls": dict(fake.calls), "api_errors": {str(k): v for k, v in fake.errors.items()},
+        "commits": stats.commits,
+        "commits_per_step": round(sum(stats.commits.values()) / max(stats.steps, 1), 2),
+        "idle_rss_mb": round(idle_rss, 1),
+        "peak_rss_mb": max((s["rss_mb"] for s in samples), default=0.0),
+        "latency_ms": {
+            name: {p: round(_percentile(v, q) * 1000, 1)
+                   for p, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+            for name, v in stats.latency.items()
+        },
+    }
+    print(f"\n{stats.steps} steps in {elapsed:.1f}s ({summary['steps_per_s']} steps/s), "
+          f"{stats.timeouts} timed out")
+    for name, p in summary["latency_ms"].items():
+        print(f"  {name:7s} n={len(stats.latency[name]):5d}  p50 {p['p50']:7.1f} ms  "
+              f"p95 {p['p95']:7.1f} ms  p99 {p['p99']:7.1f} ms")
+    print(f"API calls: {dict(fake.calls)}  errors: {dict(fake.errors)}")
+    print(f"DB commits: {stats.commits} ({summary['commits_per_step']}/step)")
+    print(f"RSS: idle {idle_rss:.1f} MB, peak {summary['peak_rss_mb']:.1f} MB")
+    if profile_report is not None:
+        print(f"\nProfile ({profile_report}):")
+        print("".join(profile_report.read_text().splitlines(keepends=True)[:40]), end="")
+        print(f"Flame graph stacks: {profile_report.with_suffix('.collapsed')}")
+    if args.json:
+        Path(args.json).write_text(json.dumps({"summary": summary, "samples": samples}, indent=2))
+        print(f"Wrote {args.json}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Load generator: fake Bot API + simulated users")
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds of load")
+    ap.add_argument("--think", type=float, default=1.0, help="mean think time between taps (s)")
+    ap.add_argument("--mode", choices=("polling", "webhook"), default="polling")
+    ap.add_argument("--latency", type=float, default=0.05, help="fake API latency (s)")
+    ap.add_argument("--jitter", type=float, default=0.0, help="extra random latency (s)")
+    ap.add_argument("--inject-429", type=float, default=0.0, help="random 429 probability")
+    ap.add_argument("--rate-limit", type=int, default=30, help="fake API sends/s before 429")
+    ap.add_argument("--chat-interval", type=float, default=0.0, help="fake per-chat spacing (s)")
+    ap.add_argument("--bot-rate", type=float, default=30, help="bot's BOT_API_RATE_PER_SEC")
+    ap.add_argument("--concurrency", type=int, default=8, help="bot's CONCURRENT_UPDATES")
+    ap.add_argument("--timeout", type=float, default=30.0, help="per-step reply timeout (s)")
+    ap.add_argument("--sample", type=float, default=2.0, help="sampling interval (s)")
+    ap.add_argument("--json", help="write samples + summary here")
+    ap.add_argument("--profile", type=float, default=0.0,
+                    help="sample the bot with its profiler for this many seconds")
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        child_main(args.sample)
+        return
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Replay answer_history and audit users' bankroll stats against it.
+
+Usage:
+    python scripts/replay_ledger.py              # report drift
+    python scripts/replay_ledger.py --apply      # report and fix
+    python scripts/replay_ledger.py --scale 2    # rescore: every EV x2, then compare
+    python scripts/replay_ledger.py --scale 2 --apply
+                                                 # rescore for good: ledger and users
+"""
+import argparse
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "bot"))
+
+from config import DB_PATH, DB_BUSY_TIMEOUT_SEC
+from ledger import audit, apply_fixes, rescore
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Bankroll ledger replay / audit")
+    ap.add_argument("--db", type=Path, default=DB_PATH)
+    ap.add_argument("--scale", type=float, default=1.0,
+                    help="multiply every recorded EV (after changing BB_MIN/BB_MAX)")
+    ap.add_argument("--apply", action="store_true", help="write replayed values back")
+    ap.add_argument("--show", type=int, default=20, help="drifted users to print")
+    args = ap.parse_args()
+
+    if not args.db.exists():
+        print(f"Database not found: {args.db}")
+        sys.exit(1)
+
+    conn = sqlite3.connect(str(args.db), timeout=DB_BUSY_TIMEOUT_SEC, isolation_level=None)
+    n_rows = conn.execute("SELECT COUNT(*) FROM answer_history").fetchone()[0]
+
+    t0 = time.perf_counter()
+    conn.execute("BEGIN")  # one snapshot for history + users
+    drifts = list(audit(conn, scale=args.scale))
+    conn.execute("COMMIT")
+    elapsed = time.perf_counter() - t0
+    print(f"Replayed {n_rows} answers in {elapsed:.2f}s — {len(drifts)} user(s) drifted")
+
+    for d in drifts[:args.show]:
+        r = d.replayed
+        if d.stored is None:
+            print(f"  user {d.user_id}: missing from users table")
+            continue
+        diffs = ", ".join(
+            f"{f} {d.stored[f]:g}→{getattr(r, f):g}" for f in d.fields
+        )
+        print(f"  user {d.user_id}: {diffs}")
+    if len(drifts) > args.show:
+        print(f"  ... {len(drifts) - args.show} more")
+
+    if args.apply and args.scale != 1.0:
+        # The ledger is rescaled too, or the next plain audit would undo this
+        answers, users = rescore(conn, args.scale)
+        print(f"Rescored {answers} answers and {users} user(s) by x{args.scale:g}")
+    elif args.apply and drifts:
+        n = apply_fixes(conn, drifts)
+        print(f"Applied {n} fix(es)" + (
+            f"; {len(drifts) - n} skipped (answered since audit, re-run)"
+            if n < len(drifts) else ""))
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
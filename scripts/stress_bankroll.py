@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Multi-process stress test for BankrollManager.
+
+Runs N worker processes that record answers for the same few users at
+the same time against one SQLite file, then checks that no update was
+lost: every user's bankroll, question count and correct count must equal
+the exact sum of what the workers wrote.
+
+Usage: python scripts/stress_bankroll.py [--procs 8] [--answers 300] [--users 4]
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "bot"))
+
+from bankroll import BankrollManager
+from config import STARTING_BANKROLL
+
+
+def _change(worker: int, i: int) -> tuple[float, bool]:
+    """Deterministic answer outcome. Multiples of 0.5 sum exactly in floats."""
+    was_correct = (worker + i) % 3 != 0
+    bb = 0.5 * (1 + (worker * 7 + i) % 10)
+    return (bb if was_correct else -bb), was_correct
+
+
+def _worker(db_path: str, worker: int, answers: int, users: int, start):
+    bm = BankrollManager(Path(db_path))
+    start.wait()
+    for i in range(answers):
+        user_id = 1000 + (i % users)
+        bb, was_correct = _change(worker, i)
+        bm.record_answer(
+            user_id=user_id, username=f"user{user_id}",
+            scenario_id="stress", hand="AKs",
+            chosen_action="Raise", chosen_ev_normalized=bb,
+            best_action="Raise", ev_vs_best=0.0 if was_correct else bb,
+            was_correct=was_correct,
+        )
+    bm.conn.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--procs", type=int, default=8)
+    ap.add_argument("--answers", type=int, default=300, help="answers per process")
+    ap.add_argument("--users", type=int, default=4)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "stress.db")
+        BankrollManager(Path(db_path)).conn.close()  # create schema up front
+
+        start = mp.Event()
+        procs = [
+            mp.Process(target=_worker, args=(db_path, w, args.answers, args.users, start))
+            for w in range(args.procs)
+        ]
+        for p in procs:
+            p.start()
+        t0 = time.perf_counter()
+        start.set()
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - t0
+        assert all(p.exitcode == 0 for p in procs), "worker process failed"
+
+        expected = {}
+        for w in range(args.procs):
+            for i in range(args.answers):
+                uid = 1000 + (i % args.users)
+                bb, was_correct = _change(w, i)
+                e = expected.setdefault(uid, [STARTING_BANKROLL, 0, 0])
+                e[0] += bb
+                e[1] += 1
+                e[2] += 1 if was_correct else 0
+
+        bm = BankrollManager(Path(db_path))
+        for uid, (bankroll, total, correct) in sorted(expected.items()):
+            stats = bm.get_user_stats(uid)
+            print(f"user {uid}: bankroll={stats['bankroll']:.1f} (expected {bankroll:.1f}), "
+                  f"questions={stats['total_questions']} (expected {total})")
+            assert stats["bankroll"] == bankroll, f"lost bankroll update for {uid}"
+            assert stats["total_questions"] == total
+            assert stats["correct_count"] == correct
+            assert stats["best_bankroll"] >= stats["bankroll"]
+
+        n_hist = bm.conn.execute("SELECT COUNT(*) FROM answer_history").fetchone()[0]
+        total_answers = args.procs * args.answers
+        assert n_hist == total_answers, f"history rows {n_hist} != {total_answers}"
+        bm.conn.close()
+
+    print(f"\n{total_answers} answers from {args.procs} processes in {elapsed:.2f}s "
+          f"({total_answers / elapsed:.0f}/s)")
+    print("All stress checks passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -79,6 +79,55 @@ try:
     print(f"Recent history: {len(hist)} entries")
     assert len(hist) == 2
 
+    # Replay guard: an answer only counts if its question seq is newer
+    kw = dict(user_id=12345, username="testuser", scenario_id=q.scenario.id, hand=q.hand,
+              chosen_action=q.best_action, chosen_ev_normalized=1.0,
+              best_action=q.best_action, ev_vs_best=0.0, was_correct=True)
+    assert bm.record_answer(**kw, seq=1000) is not None
+    assert bm.record_answer(**kw, seq=1000) is None, "replayed answer was scored"
+    assert bm.record_answer(**kw, seq=999) is None, "superseded answer was scored"
+    assert bm.record_answer(**kw, seq=1001)["total_questions"] == 4
+    print("Replay guard: duplicate and stale answers rejected")
+
+    # Group round close: every vote scored in one transaction
+    batch = [dict(kw, user_id=uid, username=f"u{uid}") for uid in (1, 2, 3)]
+    batch.append(dict(kw, seq=1001))   # replayed: left out
+    scored = bm.record_answers(batch)
+    assert sorted(scored) == [1, 2, 3] and scored[2]["total_questions"] == 1
+    print("Batch scoring: 3 answers in one transaction, replay left out")
+
+    # Idempotency key: the same answer is never scored twice
+    assert bm.record_answer(**dict(kw, user_id=4), answer_key="-100:7:4") is not None
+    assert bm.record_answer(**dict(kw, user_id=4), answer_key="-100:7:4") is None
+    assert bm.record_answers([dict(kw, user_id=4, answer_key="-100:7:4")]) == {}
+    assert bm.get_user_stats(4)["total_questions"] == 1
+
+    # Ledger replay: a NULL chosen_ev counts as 0, rescaled or not
+    from ledger import replay
+    from config import STARTING_BANKROLL
+    bm.conn.execute("INSERT INTO answer_history (user_id, scenario_id, hand, chosen_action, "
+                    "chosen_ev, best_action, ev_vs_best, was_correct) "
+                    "VALUES (5, 's', 'AA', 'R', NULL, 'R', 0, 1)")
+    for kwargs in ({}, {"scale": 2.0}, {"ev_map": lambda ev, ok: ev + 1.0}):
+        totals = next(t for t in replay(bm.conn, **kwargs) if t.user_id == 5)
+        assert totals.total_questions == 1, totals
+    assert totals.bankroll == STARTING_BANKROLL + 1.0, totals
+    print("Ledger replay: NULL EV rows replay as 0")
+
+    # Rescore: ledger and users scaled together, so a plain audit still adds up
+    from ledger import audit, rescore
+    before = bm.get_user_stats(12345)["bankroll"]
+    answers, _ = rescore(bm.conn, 2.0)
+    assert answers == bm.conn.execute("SELECT COUNT(*) FROM answer_history").fetchone()[0]
+    after = bm.get_user_stats(12345)["bankroll"]
+    assert abs(after - (STARTING_BANKROLL + 2 * (before - STARTING_BANKROLL))) < 1e-6, (before, after)
+    last = bm.conn.execute("SELECT bankroll_after FROM answer_history WHERE user_id = 12345 "
+                           "ORDER BY id DESC LIMIT 1").fetchone()[0]
+    assert abs(last - after) < 1e-6, (last, after)
+    drifts = list(audit(bm.conn))
+    assert drifts == [], f"plain audit after a rescore: {drifts}"
+    print(f"Ledger rescore x2: {answers} answers rescaled, no drift on a plain audit")
+
     # Test chart generation
     from chart import generate_range_chart
     scenario_hands = qm.get_scenario_hands(q.scenario.id)
@@ -94,5 +143,260 @@ try:
 finally:
     os.unlink(db_path)
 
+# Signed question tokens
+from tokens import TokenSigner, QuestionToken, InvalidToken, KIND_SCENARIO, ANY_USER, snapshot_id
+signer = TokenSigner(b"test-secret")
+token = QuestionToken(KIND_SCENARIO, snapshot_id(qm.snapshot_version), 19, 168, 3, 1_700_000_000_000)
+data = signer.sign(-1001234567890, 7, token)
+print(f"Token: {data} ({len(data.encode())} bytes)")
+assert len(data.encode()) <= 64
+assert signer.verify(-1001234567890, 7, data) == token
+anyone = signer.sign(-1001234567890, ANY_USER, token)
+assert signer.verify(-1001234567890, ANY_USER, anyone) == token
+for bad_chat, bad_user, bad_data in [(42, 7, data), (-1001234567890, 8, data),
+                                     (-1001234567890, ANY_USER, data),
+                                     (-1001234567890, 7, data[:-2] + "AA")]:
+    try:
+        signer.verify(bad_chat, bad_user, bad_data)
+        raise AssertionError("forged token accepted")
+    except InvalidToken:
+        pass
+
+# Auto-quiz cadence: timing wheel + quiet hours, persisted next-due times
+from timingwheel import TimingWheel
+from persistence import StateStore
+from cadence import BroadcastPlanner, quiet_until
+wheel = TimingWheel(1.0, 60, now=1000.0)
+wheel.schedule("a", 1000.5)         # this tick: fires on the next advance
+wheel.schedule("b", 1010.2)
+wheel.schedule("c", 1130.0)         # two revolutions out
+assert wheel.advance(1001.0) == ["a"]
+assert wheel.advance(1009.0) == []
+assert wheel.advance(1070.9) == ["b"] and "c" in wheel
+assert wheel.advance(1130.0) == ["c"] and len(wheel) == 0
+
+state_path = Path(tempfile.mkdtemp()) / "state.db"
+store = StateStore(state_path)
+t0 = 1_700_000_000.0                # 22:13 UTC
+for chat_id in range(1, 101):
+    store.subscribe(chat_id)
+planner = BroadcastPlanner(store, 3600, t0)
+dues = sorted(store.schedules[c].next_due - t0 for c in range(1, 101))
+assert 0 <= dues[0] and dues[-1] < 3600 and dues[49] > 600, "first sends not spread"
+planner.set_quiet(1, t0, 22, 7, 0)  # 22:00-07:00 UTC
+quiet = store.schedules[1]
+assert quiet_until(quiet.next_due, quiet) is None and quiet.next_due > t0 + 8 * 3600
+sent = [c for c in planner.due(t0 + 3600) if c != 1]
+assert len(sent) == 99 and 1 not in sent
+assert all(store.schedules[c].next_due > t0 + 3600 for c in sent)
+store.close()
+store = StateStore(state_path)      # next-due times survive a restart
+assert len(store.schedules) == 100 and store.schedules[1].quiet_start == 22
+store.close()
+print("Cadence: spread first sends, quiet hours deferred, schedule persisted")
+
+# Group quiz: one vote per member, group updates routed by chat
+from groupquiz import GroupRound
+from router import update_routing_key
+group_round = GroupRound(-100, 1, None, "", None, {0: "Fold", 1: "Call"}, deadline=0)
+assert group_round.vote(7, "a", 1) and not group_round.vote(7, "a", 0)
+assert not group_round.vote(8, "b", 5), "unknown action counted"
+assert group_round.tallies == {1: 1}
+group_update = {"update_id": 1, "callback_query": {
+    "from": {"id": 7}, "message": {"chat": {"id": -100, "type": "supergroup"}}}}
+assert update_routing_key(group_update) == -100
+print("Group round: first tap counts, group updates keyed by chat")
+
+# Metrics exposition: cumulative histogram buckets, escaped labels
+from metrics import Registry, Counter, Histogram
+registry = Registry()
+h = Histogram("t_seconds", "test", ("op",), buckets=(0.1, 1.0), registry=registry)
+for v in (0.05, 0.5, 5.0):
+    h.labels('a"b').observe(v)
+Counter("t_total", "test", registry=registry).inc(3)
+text = registry.render()
+assert 't_seconds_bucket{op="a\\"b",le="0.1"} 1' in text
+assert 't_seconds_bucket{op="a\\"b",le="+Inf"} 3' in text
+assert 't_seconds_count{op="a\\"b"} 3' in text and "t_total 3" in text
+print("Metrics: Prometheus text format")
+
+# Tracing: nested spans exported as one JSON line per sampled root
+import json
+import threading
+import tracing
+trace_path = Path(tempfile.mkdtemp()) / "traces.jsonl"
+serialized_on = []
+_json_str = tracing._Json.__str__
+tracing._Json.__str__ = lambda self: serialized_on.append(threading.current_thread()) or _json_str(self)
+tracing.configure(1.0, trace_path)
+with tracing.span("update", type="message"):
+    with tracing.span("db.record_answer"):
+        pass
+    try:
+        with tracing.span("api.send_photo"):
+            raise TimeoutError
+    except TimeoutError:
+        pass
+tracing.shutdown()                  # flushes the writer thread
+tracing._Json.__str__ = _json_str
+assert serialized_on and threading.main_thread() not in serialized_on, serialized_on
+with tracing.span("update"):        # sampling off: nothing recorded
+    tracing.set_attr("ignored", 1)
+lines = trace_path.read_text().splitlines()
+assert len(lines) == 1, lines
+exported = json.loads(lines[0])
+names = [(s["name"], s["parent"]) for s in exported["spans"]]
+assert names == [("update", None), ("db.record_answer", 0), ("api.send_photo", 0)], names
+assert exported["spans"][2]["attrs"] == {"error": "TimeoutError"}
+assert tracing.api_span_name("answerCallbackQuery") == "api.answer_callback_query"
+print("Tracing: span tree exported once (serialized off the loop), nothing when unsampled")
+
+# Logging: tokens redacted, noisy loggers rate limited, warnings kept
+import logging
+from logsetup import RedactingFormatter, RateLimitFilter, parse_rate_limits
+fmt = RedactingFormatter("%(message)s", secrets=("s3cret",))
+leak = logging.makeLogRecord({"msg": "POST /bot123456:AAEXPmbL_cLursscD32lmCVhbSkJXHK91-s/getMe s3cret"})
+assert fmt.format(leak) == "POST /bot[REDACTED]/getMe [REDACTED]", fmt.format(leak)
+noise = RateLimitFilter(parse_rate_limits("httpx=1"))
+passed = [noise.filter(logging.makeLogRecord({"name": "httpx._client", "levelno": logging.INFO, "msg": "poll"}))
+          for _ in range(5)]
+assert passed == [True, False, False, False, False] and noise.suppressed_total == 4
+assert noise.filter(logging.makeLogRecord({"name": "httpx", "levelno": logging.WARNING}))
+assert noise.filter(logging.makeLogRecord({"name": "main", "levelno": logging.INFO}))
+print("Logging: secrets redacted, httpx polls rate limited")
+
+# Profiler: executor-thread work shows up, idle waits do not
+import asyncio
+import time
+import profiler
+
+
+def _spin(until: float):
+    while time.monotonic() < until:
+        pass
+
+
+async def _profile_spin():
+    spin = asyncio.to_thread(_spin, time.monotonic() + 0.3)
+    result, _ = await asyncio.gather(profiler.profile(0.3, Path(tempfile.mkdtemp()), 0.005), spin)
+    return result
+
+result = asyncio.run(_profile_spin())
+own, inclusive = result.profiler.top_functions(5)
+assert own[0][0].startswith("_spin "), own
+stacks = result.collapsed_path.read_text().splitlines()
+assert any(line.startswith("asyncio;") and "_spin (" in line for line in stacks), "workers not folded"
+assert "busy samples" in result.summary_path.read_text()
+print(f"Profiler: {result.profiler.busy} busy samples, top {own[0][0]}")
+
+# Lazy startup: same snapshots and data as loading everything up front
+from quiz import OpenRangeQuizManager
+eager_rfi = OpenRangeQuizManager(qm.ev_tables)
+lazy_qm = QuizManager(lazy=True)
+lazy_rfi = OpenRangeQuizManager(lazy_qm.ev_tables, lazy=True)
+assert lazy_qm.snapshot_version == qm.snapshot_version
+assert lazy_rfi.snapshot_version == eager_rfi.snapshot_version
+assert lazy_qm.get_available_scenarios() == available and not lazy_qm.ev_tables
+assert lazy_rfi.get_available_formats() == eager_rfi.get_available_formats() and not lazy_rfi.ranges
+assert lazy_rfi.range_data("6max_100bb", "BTN") == eager_rfi.ranges["6max_100bb"]["BTN"]
+assert list(lazy_rfi.ranges) == ["6max_100bb"], "only the used format is built"
+assert lazy_rfi.weights["6max_100bb"] == eager_rfi.weights["6max_100bb"]
+sid = available[0]
+assert lazy_qm.get_scenario_hands(sid) == qm.get_scenario_hands(sid) and list(lazy_qm.ev_tables) == [sid]
+assert lazy_rfi.range_data("nope", "BTN") is None
+print("Lazy startup: snapshots match, formats and EV tables built on first use")
+
+# Questions share their slot's sets; a range fix replaces the slot
+q1, q2 = eager_rfi.build_question("6max_100bb", "BTN", "AA"), eager_rfi.build_question("6max_100bb", "BTN", "72o")
+assert q1.slot is q2.slot and q1.correct_action == "Open" and q2.correct_action == "Fold"
+eager_rfi.set_range("6max_100bb", "BTN", {"raise": q1.raise_hands | {"72o"}, "call": frozenset(), "mixed": frozenset()})
+q3 = eager_rfi.build_question("6max_100bb", "BTN", "72o")
+assert q3.slot is not q1.slot and q3.correct_action == "Open"
+sq = qm.build_question(sid, next(iter(qm.get_scenario_hands(sid))))
+assert sq.ev_vs_best is qm.get_hand_data(sid, sq.hand)["ev_vs_best"], "scenario questions copy EV data"
+print("Questions: slots shared, fixes rebuild the slot, EV data not copied")
+
+# A correction changes the range but not the snapshot, so tokens already
+# sent stay valid after a Fix
+import quiz
+corr_dir = Path(tempfile.mkdtemp())
+(corr_dir / "corrections.json").write_text(json.dumps({"6max_100bb": {"BTN": {"raise_add": ["72o"]}}}))
+real_data_dir, quiz.DATA_DIR = quiz.DATA_DIR, corr_dir
+try:
+    fixed_rfi = OpenRangeQuizManager(qm.ev_tables)
+    assert not fixed_rfi.corrections_changed()
+    # Fixes from several workers at once: none of them lost
+    fix_hands = ["32o", "42o", "52o", "62o", "82o", "92o", "T2o", "J2o"]
+    writers = [threading.Thread(target=quiz.update_corrections, args=(
+        lambda c, h=h: c["6max_100bb"]["BTN"]["raise_add"].append(h),)) for h in fix_hands]
+    for t in writers:
+        t.start()
+    for t in writers:
+        t.join()
+    assert fixed_rfi.corrections_changed(), "another worker's Fix not noticed"
+    reloaded = OpenRangeQuizManager(qm.ev_tables, lazy=True)
+    saved = json.loads((corr_dir / "corrections.json").read_text())["6max_100bb"]["BTN"]["raise_add"]
+finally:
+    quiz.DATA_DIR = real_data_dir
+assert sorted(saved) == sorted(["72o"] + fix_hands), saved
+assert set(fix_hands) <= reloaded.range_data("6max_100bb", "BTN")["raise"]
+assert not list(corr_dir.glob("*.tmp"))
+assert "72o" in fixed_rfi.ranges["6max_100bb"]["BTN"]["raise"]
+assert "72o" not in OpenRangeQuizManager(qm.ev_tables).ranges["6max_100bb"]["BTN"]["raise"]
+assert fixed_rfi.snapshot_version == eager_rfi.snapshot_version, "corrections changed the snapshot"
+assert reloaded.snapshot_version == eager_rfi.snapshot_version
+print(f"Corrections: applied to the ranges, {len(fix_hands)} concurrent Fixes kept, snapshot unchanged")
+
+# User state: idle users expire on the wheel, the LRU cap holds, and
+# evicted state comes back from the store
+from persistence import StateStore
+from userstate import UserStateCache
+store = StateStore(Path(tempfile.mkdtemp()) / "state.db")
+users = UserStateCache(store, ttl_sec=60, max_users=2, now=1000.0, pending_ttl_sec=3600)
+users.get(1, 1000.0).recent.append(("BTN", "AA"))
+users.mark_dirty(1)
+users.get(2, 1010.0)
+users.get(3, 1020.0)                        # over the cap: user 1 (LRU) spilled
+assert 1 not in users and len(users) == 2 and users.evicted == 1
+assert list(users.get(1, 1030.0).recent) == [("BTN", "AA")], "evicted state lost"
+assert 2 not in users                       # re-admitting 1 pushed out 2
+assert users.sweep(1085.0) == 1 and 3 not in users and 1 in users
+state = users.get(1, 1100.0)
+state.issued_seq = 1_100_000
+assert users.open_until(state) == 1100.0 + 3600
+users.mark_dirty(1)
+users.spill_dirty()
+store.flush()
+assert store.load_session(1).issued_seq == 1_100_000
+store.close()
+print("User state: TTL sweep, LRU cap, spill and reload")
+
+# Prefork: a forked worker's own settings reach the modules the pool had
+# already imported (persistence here), while quiz keeps the preloaded data
+import argparse
+import prefork
+worker_dir = Path(tempfile.mkdtemp())
+read_end, write_end = os.pipe()
+pid = os.fork()
+if pid == 0:
+    try:
+        prefork._become_worker(3, argparse.Namespace(base_port=8100, state_dir=str(worker_dir)))
+        import config as worker_config
+        import persistence as worker_persistence
+        import router as worker_router
+        worker_store = worker_persistence.StateStore()
+        seen = [str(worker_store.db_path), worker_config.SHARD_INDEX,
+                worker_router.WEBHOOK_PORT, sys.modules["quiz"] is quiz]
+        worker_store.close()
+        os.write(write_end, json.dumps(seen).encode())
+    finally:
+        os._exit(0)
+os.close(write_end)
+with os.fdopen(read_end) as f:
+    seen = json.loads(f.read() or "null")
+os.waitpid(pid, 0)
+assert seen == [str(worker_dir / "bot_state.shard3.db"), 3, 8103, True], seen
+print("Prefork: worker settings reach persistence, preloaded quiz module kept")
+
 print()
 print("All E2E tests passed!")
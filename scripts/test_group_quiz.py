@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Group quiz round with hundreds of answerers.
+
+Runs the real bot application against FakeTelegram with Telegram's
+per-chat limit enforced (`chat_interval`: a second message or edit to the
+same chat within that time gets a 429). A group opens one /quiz round;
+`--members` users tap answers at random times inside the window, some of
+them twice. Checks that:
+
+- every member's first tap counts and repeats are turned away
+- the tally message is edited at most once per GROUP_EDIT_INTERVAL_SEC,
+  so there is not a single 429 however many taps arrive
+- at close, all votes are scored in one bankroll transaction and the
+  result edit shows the final tally
+- if that transaction fails, the round still closes: the result edit
+  removes the buttons and says the scores were not saved
+
+Usage: python scripts/test_group_quiz.py [--members 300] [--window 6] [--interval 1]
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import sqlite3
+import time
+
+from fake_telegram import FakeTelegram, FakeRequest, ReplyTracker, UpdateFactory
+from testutil import use_temp_databases
+
+use_temp_databases("group_quiz_test_")
+os.environ.setdefault("BOT_API_RATE_PER_SEC", "100000")
+
+from telegram import Update
+
+GROUP_CHAT = -1001
+OPENER = 500
+
+
+async def main():
+    ap = argparse.ArgumentParser(description="Group quiz round under many answerers")
+    ap.add_argument("--members", type=int, default=300)
+    ap.add_argument("--window", type=float, default=6.0, help="GROUP_QUIZ_WINDOW_SEC")
+    ap.add_argument("--interval", type=float, default=1.0, help="GROUP_EDIT_INTERVAL_SEC")
+    ap.add_argument("--repeat", type=float, default=0.2, help="share of members tapping twice")
+    args = ap.parse_args()
+    os.environ["GROUP_QUIZ_WINDOW_SEC"] = str(args.window)
+    os.environ["GROUP_EDIT_INTERVAL_SEC"] = str(args.interval)
+
+    import logging
+    import main as bot_main
+    logging.getLogger().setLevel(logging.WARNING)
+
+    commits = 0
+
+    def on_statement(sql: str):
+        nonlocal commits
+        if sql.startswith("COMMIT"):
+            commits += 1
+
+    fake = FakeTelegram(latency=0.02, rate_limit=10**9, chat_interval=args.interval)
+    tracker = ReplyTracker(fake)
+    updates = UpdateFactory()
+    app = bot_main.build_application("123:fake", request=FakeRequest(fake))
+    await app.initialize()
+    await app.start()
+    try:
+        await app.process_update(Update.de_json(
+            updates.command(OPENER, "/quiz", chat_id=GROUP_CHAT), app.bot))
+        message, buttons = tracker.last_keyboard(GROUP_CHAT)
+        assert GROUP_CHAT in bot_main.group_rounds, "/quiz in a group should open a round"
+        opened = time.monotonic()
+
+        # A second /quiz while the round is open does not start another
+        await asyncio.sleep(args.interval)
+        await app.process_update(Update.de_json(
+            updates.command(OPENER + 1, "/quiz", chat_id=GROUP_CHAT), app.bot))
+        assert fake.calls["sendMessage"] == 2
+        assert "still open" in tracker.replies[GROUP_CHAT][-1][1]["text"]
+        await asyncio.sleep(args.interval)      # that reply counts against the chat too
+
+        bot_main.bankroll_manager.conn.set_trace_callback(on_statement)
+
+        async def tap(uid: int, data: str):
+            await app.process_update(Update.de_json(updates.callback(uid, message, data), app.bot))
+
+        window_left = bot_main.group_rounds[GROUP_CHAT].deadline - time.time()
+
+        async def member(uid: int):
+            await asyncio.sleep(random.uniform(0, window_left * 0.8))
+            await tap(uid, random.choice(buttons))
+            if random.random() < args.repeat:
+                await asyncio.sleep(random.uniform(0, 0.5))
+                await tap(uid, random.choice(buttons))
+
+        members = [1000 + i for i in range(args.members)]
+        await asyncio.gather(*(member(uid) for uid in members))
+        taps = fake.calls["answerCallbackQuery"]
+
+        while GROUP_CHAT in bot_main.group_rounds:
+            await asyncio.sleep(0.05)
+        await bot_main.group_editor.drain()
+        elapsed = time.monotonic() - opened
+        edits = [params for method, params, _ in tracker.replies[GROUP_CHAT]
+                 if method == "editMessageText"]
+        bot_main.bankroll_manager.conn.set_trace_callback(None)
+
+        # A round whose scoring transaction fails still closes
+        def locked(answers):
+            raise sqlite3.OperationalError("database is locked")
+
+        await asyncio.sleep(args.interval)
+        await app.process_update(Update.de_json(
+            updates.command(OPENER, "/quiz", chat_id=GROUP_CHAT), app.bot))
+        message, buttons = tracker.last_keyboard(GROUP_CHAT)
+        record_answers = bot_main.bankroll_manager.record_answers
+        bot_main.bankroll_manager.record_answers = locked
+        try:
+            await asyncio.sleep(args.interval)
+            await tap(members[0], buttons[0])
+            while GROUP_CHAT in bot_main.group_rounds:
+                await asyncio.sleep(0.05)
+            await bot_main.group_editor.drain()
+        finally:
+            bot_main.bankroll_manager.record_answers = record_answers
+        failed_close = tracker.replies[GROUP_CHAT][-1]
+    finally:
+        await app.stop()
+        await app.shutdown()
+
+    allowed = math.ceil((args.window + 2 * args.interval) / args.interval) + 1
+    print(f"{args.members} members, {taps} taps over a {args.window:.0f}s window, "
+          f"edit interval {args.interval:.1f}s")
+    print(f"  edits: {len(edits)} (allowed {allowed}), "
+          f"{bot_main.group_editor.requested} requested")
+    print(f"  round closed and result shown {elapsed:.1f}s after opening")
+    print(f"  bankroll commits at close: {commits}")
+    print(f"  API errors: {dict(fake.errors)}")
+
+    assert not fake.errors, f"rate limit hit: {dict(fake.errors)}"
+    assert taps > args.members, "expected repeat taps"
+    assert len(edits) <= allowed, "tally edits were not debounced"
+    assert commits == 1, "votes should be scored in one transaction"
+    final = edits[-1]
+    assert f"{args.members} answered" in final["text"], final["text"]
+    assert "Closed" in final["text"] and not final.get("reply_markup")
+    for uid in random.sample(members, min(20, len(members))):
+        stats = bot_main.bankroll_manager.get_user_stats(uid)
+        assert stats["total_questions"] == 1, f"user {uid} scored {stats['total_questions']} times"
+    assert bot_main.bankroll_manager.get_user_stats(OPENER) is None or \
+        bot_main.bankroll_manager.get_user_stats(OPENER)["total_questions"] == 0
+    method, params, _ = failed_close
+    assert method == "editMessageText" and "Closed" in params["text"], failed_close
+    assert "could not be saved" in params["text"] and not params.get("reply_markup")
+    print("  failed scoring: round closed, buttons removed")
+    print("Group quiz test passed!")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
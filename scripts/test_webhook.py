@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Integration test for webhook mode.
+
+Starts the real bot application (all handlers, temp databases) behind the
+embedded webhook server, with the Bot API replaced by FakeTelegram, and
+POSTs synthetic updates over HTTP: /start, /quiz, then an answer to the
+quiz using the keyboard the bot actually sent. Checks secret-token and
+malformed-body rejection, that a replayed answer button is not scored
+twice and that an older question answered after a newer one is reported
+expired, and reports end-to-end latency (POST sent -> last reply call
+seen by the fake API) per step.
+
+Usage: python scripts/test_webhook.py [--users 50] [--concurrency 8]
+"""
+import argparse
+import asyncio
+import os
+import time
+from collections import defaultdict
+
+from fake_telegram import FakeTelegram, FakeRequest, ReplyTracker, UpdateFactory
+from testutil import use_temp_databases
+
+use_temp_databases("webhook_test_")
+# Measures request handling, not the Bot API budget
+os.environ.setdefault("BOT_API_RATE_PER_SEC", "100000")
+
+import httpx
+
+SECRET = "s3cret-token"
+PATH = "/telegram"
+
+
+def _percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def post(client: httpx.AsyncClient, url: str, update: dict, secret: str = SECRET) -> int:
+    r = await client.post(url, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": secret})
+    return r.status_code
+
+
+async def user_session(tracker, updates, client, url, uid, latencies):
+    async def step(name, update, expect_total):
+        t0 = time.perf_counter()
+        assert await post(client, url, update) == 200
+        await tracker.wait(uid, expect_total)
+        latencies[name].append(time.perf_counter() - t0)
+
+    await step("/start", updates.command(uid, "/start"), 1)
+    await step("/quiz", updates.command(uid, "/quiz"), 2)
+
+    message, buttons = tracker.last_keyboard(uid)
+    # Answer = edit of the quiz message, carrying the Next button
+    await step("answer", updates.callback(uid, message, buttons[0]), 3)
+    return message, buttons
+
+
+async def check_replay(fake, updates, client, url, uid, message, buttons):
+    """A second press of an answered button must not be scored again."""
+    assert await post(client, url, updates.callback(uid, message, buttons[-1])) == 200
+    for _ in range(100):
+        alerts = [p.get("text", "") for _, m, p in fake.log if m == "answerCallbackQuery"]
+        if any(t.startswith("Already answered") for t in alerts):
+            return
+        await asyncio.sleep(0.05)
+    raise AssertionError("replayed answer was not rejected")
+
+
+async def check_superseded(fake, tracker, updates, client, url, uid):
+    """Answering an older question after a newer one: expired, not "already answered"."""
+    assert await post(client, url, updates.command(uid, "/quiz")) == 200
+    await tracker.wait(uid, 4)
+    older, older_buttons = tracker.last_keyboard(uid)
+    assert await post(client, url, updates.command(uid, "/quiz")) == 200
+    await tracker.wait(uid, 5)
+    newer, buttons = tracker.last_keyboard(uid)
+    assert await post(client, url, updates.callback(uid, newer, buttons[0])) == 200
+    await tracker.wait(uid, 6)
+    assert await post(client, url, updates.callback(uid, older, older_buttons[0])) == 200
+    for _ in range(100):
+        alerts = [p.get("text", "") for _, m, p in fake.log if m == "answerCallbackQuery"]
+        if any(t.startswith("Quiz expired — you answered a newer question") for t in alerts):
+            return
+        await asyncio.sleep(0.05)
+    raise AssertionError("older question not reported as expired")
+
+
+async def main():
+    ap = argparse.ArgumentParser(description="Webhook mode integration test")
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--concurrency", type=int, default=8, help="CONCURRENT_UPDATES")
+    ap.add_argument("--latency", type=float, default=0.02, help="fake API latency (s)")
+    args = ap.parse_args()
+    os.environ["CONCURRENT_UPDATES"] = str(args.concurrency)
+
+    import logging
+    import main as bot_main
+    from webhook import WebhookServer
+    logging.getLogger().setLevel(logging.WARNING)
+    # Keep the scenario route: its answer flow is a fixed edit + send
+    bot_main.SCENARIO_RATIO = 1.0
+
+    fake = FakeTelegram(latency=args.latency, rate_limit=10**9, chat_interval=0)
+    tracker = ReplyTracker(fake)
+    updates = UpdateFactory()
+    app = bot_main.build_application("123:fake", request=FakeRequest(fake))
+    server = WebhookServer(
+        app, listen="127.0.0.1", port=0, path=PATH, secret_token=SECRET,
+        webhook_url="https://example.invalid" + PATH,
+    )
+    await server.start()
+    url = f"http://127.0.0.1:{server.port}{PATH}"
+    try:
+        assert fake.calls["setWebhook"] == 1, "setWebhook not called"
+
+        async with httpx.AsyncClient() as client:
+            # Rejections
+            assert await post(client, url, updates.command(1, "/start"), secret="wrong") == 403
+            r = await client.post(url, content=b"{not json",
+                                  headers={"X-Telegram-Bot-Api-Secret-Token": SECRET})
+            assert r.status_code == 400, r.status_code
+            r = await client.post(url.replace(PATH, "/other"), json={})
+            assert r.status_code == 404, r.status_code
+            print("Rejections: bad secret 403, malformed body 400, unknown path 404")
+
+            latencies: dict[str, list[float]] = defaultdict(list)
+            t0 = time.perf_counter()
+            sessions = await asyncio.gather(*(
+                user_session(tracker, updates, client, url, 1000 + i, latencies)
+                for i in range(args.users)
+            ))
+            elapsed = time.perf_counter() - t0
+
+            await check_replay(fake, updates, client, url, 1000, *sessions[0])
+            print("Replayed answer button rejected")
+            await check_superseded(fake, tracker, updates, client, url, 1001)
+            print("Older question answered after a newer one: reported expired")
+    finally:
+        await server.stop()
+
+    n_updates = server.receiver.received
+    print(f"{args.users} users, {n_updates} updates in {elapsed:.2f}s "
+          f"({n_updates / elapsed:.0f} updates/s), concurrent_updates={args.concurrency}, "
+          f"fake API latency {args.latency * 1000:.0f} ms")
+    for name, values in latencies.items():
+        print(f"  {name:7s} p50 {_percentile(values, 0.5) * 1000:6.1f} ms   "
+              f"p95 {_percentile(values, 0.95) * 1000:6.1f} ms   "
+              f"max {max(values) * 1000:6.1f} ms")
+    assert n_updates == args.users * 3 + 5, n_updates
+    assert server.receiver.rejected == 2
+    print("\nWebhook integration test passed!")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
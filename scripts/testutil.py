@@ -0,0 +1,18 @@
+"""Shared setup for the test and bench scripts that run the bot in-process."""
+import atexit
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+
+def use_temp_databases(prefix: str) -> Path:
+    """Point BANKROLL_DB_PATH and STATE_DB_PATH into a new temp dir, removed at exit.
+
+    Must run before the bot's config is imported; returns the dir.
+    """
+    tmp = Path(tempfile.mkdtemp(prefix=prefix))
+    atexit.register(shutil.rmtree, tmp, ignore_errors=True)
+    os.environ["BANKROLL_DB_PATH"] = str(tmp / "bankroll.db")
+    os.environ["STATE_DB_PATH"] = str(tmp / "bot_state.db")
+    return tmp
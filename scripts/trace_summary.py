@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Summarize sampled update traces (TRACE_SAMPLE_RATE, bot/tracing.py).
+
+Reads the JSONL trace file and its rotated backups and prints:
+
+- per phase (span name): count, p50 / p95 / max duration, and self time
+  (duration minus its children) as a share of all traced update time,
+  so "where did the time go" is answered without double counting
+- the slowest traces as indented span trees
+
+Usage:
+    python scripts/trace_summary.py                      # logs/traces.jsonl*
+    python scripts/trace_summary.py traces.jsonl --top 5 --root update
+"""
+import argparse
+import json
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "bot"))
+
+from config import TRACE_PATH
+
+
+def _percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def load(paths: list[Path]) -> list[dict]:
+    traces = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    traces.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue        # torn last line of a file being written
+    return traces
+
+
+def self_times(trace: dict) -> dict[int, float]:
+    """Span id -> duration not covered by its direct children."""
+    child_time: dict[int, float] = defaultdict(float)
+    for s in trace["spans"]:
+        if s["parent"] is not None:
+            child_time[s["parent"]] += s["duration_ms"]
+    # Concurrent children (gathered sends) can add up to more than the parent
+    return {s["id"]: max(0.0, s["duration_ms"] - child_time[s["id"]]) for s in trace["spans"]}
+
+
+def summarize(traces: list[dict]) -> list[tuple]:
+    durations: dict[str, list[float]] = defaultdict(list)
+    self_total: dict[str, float] = defaultdict(float)
+    for trace in traces:
+        own = self_times(trace)
+        for s in trace["spans"]:
+            durations[s["name"]].append(s["duration_ms"])
+            self_total[s["name"]] += own[s["id"]]
+    rows = [(name, len(values), _percentile(values, 0.5), _percentile(values, 0.95),
+             max(values), self_total[name])
+            for name, values in durations.items()]
+    rows.sort(key=lambda r: r[5], reverse=True)
+    return rows
+
+
+def print_tree(trace: dict):
+    children: dict = defaultdict(list)
+    for s in trace["spans"]:
+        children[s["parent"]].append(s)
+
+    def walk(parent, depth):
+        for s in sorted(children[parent], key=lambda s: s["start_ms"]):
+            attrs = " ".join(f"{k}={v}" for k, v in s["attrs"].items())
+            print(f"    {'  ' * depth}{s['name']:<{40 - 2 * depth}} "
+                  f"+{s['start_ms']:8.1f} {s['duration_ms']:8.1f} ms  {attrs}")
+            walk(s["id"], depth + 1)
+    walk(None, 0)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Slowest spans by phase from trace files")
+    ap.add_argument("paths", nargs="*", type=Path,
+                    help=f"trace files (default: {TRACE_PATH} and its backups)")
+    ap.add_argument("--root", help="only traces whose root span has this name")
+    ap.add_argument("--top", type=int, default=3, help="slowest traces to print")
+    args = ap.parse_args()
+
+    paths = args.paths or sorted(TRACE_PATH.parent.glob(TRACE_PATH.name + "*"))
+    traces = load(paths)
+    if args.root:
+        traces = [t for t in traces if t["root"] == args.root]
+    if not traces:
+        print("No traces found (is TRACE_SAMPLE_RATE set?)")
+        return
+
+    roots = [t["duration_ms"] for t in traces]
+    total = sum(roots)
+    print(f"{len(traces)} traces from {len(paths)} file(s): "
+          f"p50 {_percentile(roots, 0.5):.1f} ms, p95 {_percentile(roots, 0.95):.1f} ms, "
+          f"max {max(roots):.1f} ms\n")
+    print(f"  {'phase':<34} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'self %':>7}")
+    for name, count, p50, p95, worst, own in summarize(traces):
+        print(f"  {name:<34} {count:>6} {p50:>8.1f} {p95:>8.1f} {worst:>8.1f} "
+              f"{own / total * 100 if total else 0:>6.1f}%")
+
+    for trace in sorted(traces, key=lambda t: t["duration_ms"], reverse=True)[:args.top]:
+        print(f"\n  {trace['root']} {trace['trace']}  {trace['duration_ms']:.1f} ms")
+        print_tree(trace)
+
+
+if __name__ == "__main__":
+    main()